@@ -0,0 +1,187 @@
+###############################################################################
+# Author: agent
+# Project: Context-aware Query Suggestion
+# Date Created: 10/18/2026
+#
+# File Description: This script times short training runs of one of the two
+# models over a grid of batch sizes and thread counts, each in a fresh
+# process, and writes the fastest setting within a memory budget to a config
+# file that main.py reads with --tuned_config.
+###############################################################################
+
+import os, sys, json, time, platform, resource, tempfile, itertools
+import multiprocessing as mp
+import generate_sessions
+from argparse import ArgumentParser
+from run_benchmarks import ROOT, PACKAGES
+
+
+def get_args():
+    """Returns the arguments of the tuner and the remaining arguments, which are passed on to the model."""
+    parser = ArgumentParser(description='training_autotuner')
+    parser.add_argument('--model', type=str, default='seq2seq', choices=sorted(PACKAGES),
+                        help='model tuned, the attentive seq2seq model or the hierarchical encoder-decoder')
+    parser.add_argument('--data_dir', type=str, default='',
+                        help='directory of the session files (default: generated with the default generator settings)')
+    parser.add_argument('--batch_sizes', type=int, nargs='+', default=[16, 32, 64, 128, 256, 512, 1024],
+                        help='batch sizes tried')
+    parser.add_argument('--threads', type=int, nargs='+', default=None,
+                        help='numbers of intra-op threads tried (default: powers of two up to the available cores)')
+    parser.add_argument('--interop_threads', type=int, nargs='+', default=[1, 2],
+                        help='numbers of inter-op threads tried')
+    parser.add_argument('--memory_budget', type=float, default=0,
+                        help='peak resident memory in MB a setting may use (0 = no limit)')
+    parser.add_argument('--warmup_batches', type=int, default=2,
+                        help='number of batches trained on before the timed ones')
+    parser.add_argument('--num_batches', type=int, default=10,
+                        help='number of timed batches of every trial')
+    parser.add_argument('--output', type=str, default='tuned_config.json',
+                        help='config file the best setting is written to')
+    parser.add_argument('--results', type=str, default='autotune.json',
+                        help='file the results of every trial are written to')
+    return parser.parse_known_args()
+
+
+def default_threads():
+    """Returns the powers of two up to the number of available cores, and that number."""
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()
+    threads = [2 ** i for i in range(cores.bit_length()) if 2 ** i <= cores]
+    return threads if threads[-1] == cores else threads + [cores]
+
+
+def count_tokens(batch):
+    """Returns the number of query terms of the sessions or query pairs of a batch."""
+    if hasattr(batch[0], 'queries'):
+        return sum(len(query) for session in batch for query in session.queries)
+    return sum(len(instance.sentence1) + len(instance.sentence2) for instance in batch)
+
+
+def trial_worker(connection, config, batches, num_threads, num_interop_threads, warmup_batches):
+    """Trains on the batches with the given thread counts and sends the throughput and the peak memory."""
+    # the inter-op pool can only be sized before the first parallel operation of a process
+    torch.set_num_interop_threads(num_interop_threads)
+    torch.set_num_threads(num_threads)
+    torch.manual_seed(config.seed)
+    to_tensors = helper.queries_to_tensors if hasattr(batches[0][0], 'sentence1') else helper.session_to_tensor
+    # every word gets a random out of vocabulary embedding
+    model = Sequence2Sequence(dictionary, {}, config)
+    if config.cuda:
+        model = model.cuda()
+    optimizer = torch.optim.Adam(filter(lambda p: p.requires_grad, model.parameters()), config.lr)
+
+    num_tokens, elapsed = 0, 0
+    for batch_no, batch in enumerate(batches):
+        start = time.perf_counter()
+        batch_tensors = to_tensors(batch, dictionary)
+        if config.cuda:
+            batch_tensors = [tensor.cuda() for tensor in batch_tensors]
+        optimizer.zero_grad()
+        model(*batch_tensors).backward()
+        optimizer.step()
+        if config.cuda:
+            torch.cuda.synchronize()
+        if batch_no >= warmup_batches:
+            elapsed += time.perf_counter() - start
+            num_tokens += count_tokens(batch)
+
+    result = {'status': 'done', 'tokens_per_sec': num_tokens / elapsed,
+              'seconds_per_batch': elapsed / (len(batches) - warmup_batches),
+              # kilobytes on Linux
+              'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}
+    if config.cuda:
+        result['peak_cuda_mb'] = torch.cuda.max_memory_allocated() / 1024 / 1024
+    connection.send(result)
+    connection.close()
+
+
+def run_trial(context, config, batches, num_threads, num_interop_threads, warmup_batches):
+    """Runs a trial in a forked process, which starts with fresh thread pools and its own peak memory."""
+    reader, writer = context.Pipe(duplex=False)
+    process = context.Process(target=trial_worker, args=(writer, config, batches, num_threads, num_interop_threads,
+                                                         warmup_batches))
+    process.start()
+    writer.close()
+    try:
+        result = reader.recv()
+    except EOFError:
+        # the process died before it reported, e.g. killed when out of memory
+        result = {'status': 'failed'}
+    process.join()
+    return result
+
+
+def tune(args, config):
+    """Returns the results of every trial of the grid; a batch size that exceeds the memory budget ends the larger
+    batch sizes of the same thread counts."""
+    context = mp.get_context('fork')
+    results = []
+    for num_threads, num_interop_threads in itertools.product(args.threads or default_threads(),
+                                                              args.interop_threads):
+        over_budget = False
+        for batch_size in sorted(args.batch_sizes):
+            setting = {'batch_size': batch_size, 'num_threads': num_threads,
+                       'num_interop_threads': num_interop_threads}
+            batches = helper.batchify(corpus.data, batch_size)[:args.warmup_batches + args.num_batches]
+            if over_budget or len(batches) <= args.warmup_batches:
+                results.append(dict(setting, status='over budget' if over_budget else 'too few sessions'))
+                continue
+            config.batch_size = batch_size
+            result = run_trial(context, config, batches, num_threads, num_interop_threads, args.warmup_batches)
+            if result['status'] == 'done' and 0 < args.memory_budget < result['peak_rss_mb']:
+                result['status'] = 'over budget'
+            # a larger batch needs more memory, so it would exceed the budget or fail as well
+            over_budget = result['status'] != 'done'
+            results.append(dict(setting, **result))
+            summary = result['status']
+            if 'tokens_per_sec' in result:
+                summary = '%.0f tokens/sec, %.0f MB, %s' % (result['tokens_per_sec'], result['peak_rss_mb'], summary)
+            print('batch size %5d, %2d threads, %d inter-op threads: %s' % (batch_size, num_threads,
+                                                                            num_interop_threads, summary))
+    return results
+
+
+if __name__ == '__main__':
+    args, model_args = get_args()
+    # the modules of both models share their names, so only the tuned model is importable
+    sys.path.insert(0, os.path.join(ROOT, PACKAGES[args.model]))
+    sys.argv = sys.argv[:1] + model_args
+    import util, helper, data, torch
+    from seq2seq import Sequence2Sequence
+
+    config = util.get_args()
+    # generated sessions are removed once they are loaded
+    generated_dir = None
+    if args.data_dir:
+        config.data = args.data_dir
+    else:
+        generated_dir = tempfile.TemporaryDirectory()
+        config.data = generated_dir.name
+        generate_sessions.generate(generate_sessions.get_args(['--output_dir', config.data]))
+    try:
+        # loaded once, the trials are forked and inherit them
+        dictionary = data.Dictionary(config.normalizer)
+        corpus = data.Corpus(config.data, 'session_train.txt', dictionary, config.max_length,
+                             normalizer_cache_size=config.normalizer_cache_size)
+    finally:
+        if generated_dir:
+            generated_dir.cleanup()
+
+    trials = tune(args, config)
+    with open(args.results, 'w') as f:
+        json.dump({'model': args.model, 'created': time.time(),
+                   'platform': {'python': platform.python_version(), 'machine': platform.machine(),
+                                'torch': torch.__version__},
+                   'memory_budget_mb': args.memory_budget, 'trials': trials}, f, indent=2)
+
+    done = [trial for trial in trials if trial['status'] == 'done']
+    if not done:
+        print('no setting fits the memory budget')
+        sys.exit(1)
+    best = max(done, key=lambda trial: trial['tokens_per_sec'])
+    settings = {name: best[name] for name in ['batch_size', 'num_threads', 'num_interop_threads']}
+    with open(args.output, 'w') as f:
+        json.dump({'model': args.model, 'settings': settings, 'tokens_per_sec': best['tokens_per_sec'],
+                   'peak_rss_mb': best['peak_rss_mb']}, f, indent=2)
+    print('best: batch size %d, %d threads, %d inter-op threads, %.0f tokens/sec, %.0f MB, written to %s' % (
+        best['batch_size'], best['num_threads'], best['num_interop_threads'], best['tokens_per_sec'],
+        best['peak_rss_mb'], args.output))
@@ -0,0 +1,50 @@
+###############################################################################
+# Author: agent
+# Project: Context-aware Query Suggestion
+# Date Created: 10/18/2026
+#
+# File Description: This script compares benchmark results with a baseline
+# and flags the benchmarks whose median time grew beyond a threshold.
+###############################################################################
+
+import sys, json
+from argparse import ArgumentParser
+
+
+def load_results(filename):
+    with open(filename, 'r') as f:
+        return json.load(f)
+
+
+def compare(baseline, results, threshold):
+    """Prints the median times of the benchmarks of both results and returns the names of the regressed ones."""
+    regressions = []
+    print('%-40s %12s %12s %8s' % ('benchmark', 'baseline (s)', 'current (s)', 'change'))
+    for name, result in sorted(results['benchmarks'].items()):
+        if name not in baseline['benchmarks']:
+            print('%-40s %12s %12.4f %8s' % (name, '-', result['median'], 'new'))
+            continue
+        baseline_median = baseline['benchmarks'][name]['median']
+        change = result['median'] / baseline_median - 1 if baseline_median > 0 else 0
+        flag = ''
+        if change > threshold:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print('%-40s %12.4f %12.4f %+7.1f%%%s' % (name, baseline_median, result['median'], change * 100, flag))
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='benchmark_comparison')
+    parser.add_argument('baseline', type=str,
+                        help='JSON results of the baseline')
+    parser.add_argument('results', type=str,
+                        help='JSON results compared with the baseline')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='relative growth of the median time flagged as a regression')
+    args = parser.parse_args()
+
+    regressions = compare(load_results(args.baseline), load_results(args.results), args.threshold)
+    if regressions:
+        print('%d benchmark(s) regressed by more than %d%%' % (len(regressions), args.threshold * 100))
+        sys.exit(1)
@@ -0,0 +1,102 @@
+###############################################################################
+# Author: agent
+# Project: Context-aware Query Suggestion
+# Date Created: 10/18/2026
+#
+# File Description: This script generates synthetic session logs in the format
+# of the real data, one session per line with queries separated by ':::'. The
+# output only depends on the arguments, including the seed.
+###############################################################################
+
+import os, random, bisect
+from argparse import ArgumentParser
+
+
+def get_args(argv=None):
+    parser = ArgumentParser(description='synthetic_session_generator')
+    parser.add_argument('--output_dir', type=str, default='./synthetic_data/',
+                        help='directory where the session files are written')
+    parser.add_argument('--num_sessions', type=int, nargs=3, default=[20000, 2000, 2000],
+                        help='number of train, dev and test sessions')
+    parser.add_argument('--vocab_size', type=int, default=20000,
+                        help='number of distinct words')
+    parser.add_argument('--num_queries', type=int, default=50000,
+                        help='number of distinct queries sessions are drawn from')
+    parser.add_argument('--zipf', type=float, default=1.1,
+                        help='exponent of the Zipf distribution of the word and query frequencies')
+    parser.add_argument('--min_session_length', type=int, default=2,
+                        help='minimum number of queries of a session')
+    parser.add_argument('--mean_session_length', type=float, default=4.0,
+                        help='mean number of queries of a session')
+    parser.add_argument('--max_session_length', type=int, default=12,
+                        help='maximum number of queries of a session')
+    parser.add_argument('--mean_query_length', type=float, default=3.0,
+                        help='mean number of words of a query')
+    parser.add_argument('--max_query_length', type=int, default=12,
+                        help='maximum number of words of a query')
+    parser.add_argument('--seed', type=int, default=1111,
+                        help='random seed of the generator')
+    return parser.parse_args(argv)
+
+
+class ZipfSampler(object):
+    """Samples the indices 0 to n - 1, index i with a probability proportional to 1 / (i + 1) ^ exponent."""
+
+    def __init__(self, n, exponent):
+        self.cum_weights = []
+        total = 0
+        for i in range(n):
+            total += 1.0 / (i + 1) ** exponent
+            self.cum_weights.append(total)
+
+    def sample(self, rng):
+        return bisect.bisect(self.cum_weights, rng.random() * self.cum_weights[-1])
+
+
+def sample_length(rng, minimum, mean, maximum):
+    """Samples a length from a geometric distribution shifted to start at minimum and truncated at maximum."""
+    if mean <= minimum:
+        return minimum
+    stop = 1.0 / (mean - minimum + 1)
+    length = minimum
+    while length < maximum and rng.random() > stop:
+        length += 1
+    return length
+
+
+def generate_queries(config, rng):
+    """Returns num_queries distinct queries of Zipf distributed words, the most frequent words first."""
+    word_sampler = ZipfSampler(config.vocab_size, config.zipf)
+    queries, seen = [], set()
+    while len(queries) < config.num_queries:
+        length = sample_length(rng, 1, config.mean_query_length, config.max_query_length)
+        query = ' '.join('w%d' % word_sampler.sample(rng) for _ in range(length))
+        if query not in seen:
+            seen.add(query)
+            queries.append(query)
+    return queries
+
+
+def generate_sessions(filename, num_sessions, queries, config, rng):
+    """Writes num_sessions sessions of Zipf distributed queries to filename."""
+    query_sampler = ZipfSampler(len(queries), config.zipf)
+    with open(filename, 'w') as f:
+        for _ in range(num_sessions):
+            length = sample_length(rng, config.min_session_length, config.mean_session_length,
+                                   config.max_session_length)
+            f.write(':::'.join(queries[query_sampler.sample(rng)] for _ in range(length)) + '\n')
+
+
+def generate(config):
+    """Generates session_train.txt, session_dev.txt and session_test.txt under config.output_dir."""
+    if not os.path.isdir(config.output_dir):
+        os.makedirs(config.output_dir)
+    rng = random.Random(config.seed)
+    queries = generate_queries(config, rng)
+    for name, num_sessions in zip(['train', 'dev', 'test'], config.num_sessions):
+        generate_sessions(os.path.join(config.output_dir, 'session_%s.txt' % name), num_sessions, queries, config,
+                          rng)
+
+
+if __name__ == '__main__':
+    generate(get_args())
@@ -0,0 +1,97 @@
+###############################################################################
+# Author: agent
+# Project: Context-aware Query Suggestion
+# Date Created: 10/18/2026
+#
+# File Description: This script measures the cold import time of the modules
+# used by the inference workers, each in a fresh interpreter, and checks that
+# they do not load the plotting and tokenization libraries.
+###############################################################################
+
+import os, sys, json, time, platform, statistics, subprocess
+import compare
+from argparse import ArgumentParser
+from run_benchmarks import ROOT, PACKAGES
+
+INFERENCE_MODULES = {
+    'seq2seq': ['torch', 'helper', 'evaluate', 'query_index'],
+    'hred': ['torch', 'helper', 'cache', 'suggest', 'evaluate', 'query_index'],
+}
+HEAVY_MODULES = ['matplotlib', 'nltk']
+PROBE = """
+import sys, time, json
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'elapsed': elapsed, 'heavy': [name for name in {heavy} if name in sys.modules]}}))
+"""
+
+
+def get_args():
+    parser = ArgumentParser(description='import_time_benchmark')
+    parser.add_argument('--model', type=str, default='hred', choices=sorted(PACKAGES),
+                        help='model whose inference modules are imported')
+    parser.add_argument('--modules', type=str, nargs='+', default=None,
+                        help='modules imported (default: the inference modules of the model)')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='number of fresh interpreters every module is imported in')
+    parser.add_argument('--max_seconds', type=float, default=0,
+                        help='median import time no module may exceed (0 = no limit)')
+    parser.add_argument('--output', type=str, default='import_time.json',
+                        help='file the results are written to')
+    parser.add_argument('--baseline', type=str, default='',
+                        help='results of a previous run to compare with')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='relative growth of the median time flagged as a regression')
+    return parser.parse_args()
+
+
+def import_time(module, directory):
+    """Imports a module in a fresh interpreter and returns the import time and the heavy modules it loaded."""
+    output = subprocess.check_output([sys.executable, '-c', PROBE.format(module=module, heavy=HEAVY_MODULES)],
+                                     cwd=directory)
+    result = json.loads(output.decode('utf-8').strip().split('\n')[-1])
+    return result['elapsed'], result['heavy']
+
+
+if __name__ == '__main__':
+    args = get_args()
+    directory = os.path.join(ROOT, PACKAGES[args.model])
+    benchmarks, heavy_imports = {}, {}
+    for module in args.modules or INFERENCE_MODULES[args.model]:
+        times = []
+        for _ in range(args.repeat):
+            elapsed, heavy = import_time(module, directory)
+            times.append(elapsed)
+        benchmarks['import_' + module] = {'median': statistics.median(times), 'min': min(times),
+                                          'mean': statistics.mean(times), 'repeat': args.repeat}
+        if heavy:
+            heavy_imports[module] = heavy
+
+    results = {
+        'model': args.model,
+        'created': time.time(),
+        'platform': {'python': platform.python_version(), 'machine': platform.machine()},
+        'benchmarks': benchmarks,
+        'heavy_imports': heavy_imports,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    failures = []
+    for module, heavy in sorted(heavy_imports.items()):
+        failures.append('%s loads %s at import' % (module, ', '.join(heavy)))
+    if args.max_seconds > 0:
+        failures.extend('%s takes %.3f s to import' % (name, result['median'])
+                        for name, result in sorted(benchmarks.items()) if result['median'] > args.max_seconds)
+    if args.baseline:
+        regressions = compare.compare(compare.load_results(args.baseline), results, args.threshold)
+        failures.extend('%s regressed by more than %d%%' % (name, args.threshold * 100) for name in regressions)
+    else:
+        for name, result in sorted(benchmarks.items()):
+            print('%-40s %10.4f s' % (name, result['median']))
+
+    for failure in failures:
+        print(failure)
+    if failures:
+        sys.exit(1)
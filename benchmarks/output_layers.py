@@ -0,0 +1,132 @@
+###############################################################################
+# Author: agent
+# Project: Context-aware Query Suggestion
+# Date Created: 10/18/2026
+#
+# File Description: This script compares the layouts of the vocabulary
+# projection (full, tied to the input embeddings, factorized) of one of the
+# two models by parameter count, checkpoint size and training step time.
+###############################################################################
+
+import io, os, sys, copy, json, time, tempfile
+import generate_sessions
+from argparse import ArgumentParser
+from run_benchmarks import ROOT, PACKAGES, measure
+
+
+def get_args():
+    """Returns the arguments of the report and the remaining arguments, which are passed on to the model."""
+    parser = ArgumentParser(description='output_layer_report')
+    parser.add_argument('--model', type=str, default='seq2seq', choices=sorted(PACKAGES),
+                        help='model compared, the attentive seq2seq model or the hierarchical encoder-decoder')
+    parser.add_argument('--data_dir', type=str, default='',
+                        help='directory of the session files (default: generated with the default generator settings)')
+    parser.add_argument('--layouts', type=str, nargs='+', default=['full', 'tied', 'factorized'],
+                        help='layouts of the output layer compared')
+    parser.add_argument('--num_batches', type=int, default=10,
+                        help='number of batches trained on by a timed run')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='number of timed runs of every layout, after one warm up run')
+    parser.add_argument('--output', type=str, default='output_layers.json',
+                        help='file the results are written to')
+    return parser.parse_known_args()
+
+
+def count_parameters(parameters):
+    return sum(param.numel() for param in parameters)
+
+
+def compare_layouts(args, config):
+    """Returns the parameter counts, checkpoint size and step time of the model with every output layer layout."""
+    dictionary = data.Dictionary()
+    corpus = data.Corpus(config.data, 'session_train.txt', dictionary, config.max_length)
+    batches = helper.batchify(corpus.data, config.batch_size)[:args.num_batches]
+    to_tensors = helper.queries_to_tensors if args.model == 'seq2seq' else helper.session_to_tensor
+    tensors = [to_tensors(batch, dictionary) for batch in batches]
+
+    results = {}
+    for layout in args.layouts:
+        layout_config = copy.copy(config)
+        layout_config.output_layer = layout
+        torch.manual_seed(config.seed)
+        # every word gets a random out of vocabulary embedding
+        model = Sequence2Sequence(dictionary, {}, layout_config)
+        output_layer = model.attention.out if args.model == 'seq2seq' else model.decoder.out
+        embedding_weight = model.embedding.embedding.weight
+        trainable = [param for param in model.parameters() if param.requires_grad]
+        optimizer = torch.optim.Adam(trainable, config.lr)
+
+        def train_steps():
+            for batch_tensors in tensors:
+                optimizer.zero_grad()
+                model(*batch_tensors).backward()
+                optimizer.step()
+
+        checkpoint = io.BytesIO()
+        torch.save(model.state_dict(), checkpoint)
+        timing = measure(train_steps, args.repeat)
+        results[layout] = {
+            'parameters': count_parameters(model.parameters()),
+            'trainable_parameters': count_parameters(trainable),
+            # the input embedding matrix is not counted as part of a tied output layer
+            'output_layer_parameters': count_parameters(param for param in output_layer.parameters()
+                                                        if param is not embedding_weight),
+            # false for a tied layout over frozen embeddings, whose output word vectors never train
+            'output_weight_trainable': output_layer.weight.requires_grad,
+            'checkpoint_mb': len(checkpoint.getvalue()) / 1024 / 1024,
+            'step_seconds': timing['median'] / len(tensors),
+        }
+    # the training examples of seq2seq are query pairs, those of hred are sessions
+    num_examples = len(corpus.data) if args.model == 'seq2seq' else len(corpus)
+    return results, {'train_examples': num_examples, 'vocabulary_size': len(dictionary), 'num_batches': len(tensors)}
+
+
+if __name__ == '__main__':
+    args, model_args = get_args()
+    # the modules of both models share their names, so only the compared model is importable
+    sys.path.insert(0, os.path.join(ROOT, PACKAGES[args.model]))
+    sys.argv = sys.argv[:1] + model_args
+    import util, helper, data, torch
+    from seq2seq import Sequence2Sequence
+
+    config = util.get_args()
+    torch.set_num_threads(config.num_threads)
+    # generated sessions are removed once the layouts are compared
+    generated_dir = None
+    if args.data_dir:
+        config.data = args.data_dir
+    else:
+        generated_dir = tempfile.TemporaryDirectory()
+        config.data = generated_dir.name
+        generate_sessions.generate(generate_sessions.get_args(['--output_dir', config.data]))
+
+    try:
+        layouts, dataset = compare_layouts(args, config)
+    finally:
+        if generated_dir:
+            generated_dir.cleanup()
+    results = {
+        'model': args.model,
+        'created': time.time(),
+        'config': {'batch_size': config.batch_size, 'emsize': config.emsize, 'output_rank': config.output_rank,
+                   'num_batches': args.num_batches},
+        'data': dataset,
+        'layouts': layouts,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    baseline = layouts.get('full')
+    print('%-12s %14s %14s %14s %12s %12s' % ('layout', 'parameters', 'trainable', 'output layer', 'checkpoint',
+                                             'step time'))
+    for layout, result in layouts.items():
+        relative = ''
+        if baseline and layout != 'full':
+            relative = ' (%+.1f%%)' % ((result['step_seconds'] / baseline['step_seconds'] - 1) * 100)
+        print('%-12s %14d %14d %14d %9.1f MB %10.4f s%s' % (
+            layout, result['parameters'], result['trainable_parameters'], result['output_layer_parameters'],
+            result['checkpoint_mb'], result['step_seconds'], relative))
+    for layout, result in layouts.items():
+        if not result['output_weight_trainable']:
+            print('%s: the output word vectors are the frozen input embeddings, only the projection and the biases '
+                  'train' % layout)
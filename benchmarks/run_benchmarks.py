@@ -0,0 +1,150 @@
+###############################################################################
+# Author: agent
+# Project: Context-aware Query Suggestion
+# Date Created: 10/18/2026
+#
+# File Description: This script runs the microbenchmarks of the data pipeline
+# and of the training step of one of the two models on synthetic sessions,
+# writes the timings as JSON and optionally compares them with a baseline.
+###############################################################################
+
+import os, sys, copy, json, time, platform, tempfile, statistics
+import generate_sessions, compare
+from argparse import ArgumentParser
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGES = {'seq2seq': 'seq_to_seq_model', 'hred': "cikm'15_model_impl"}
+
+
+def get_args():
+    """Returns the arguments of the suite and the remaining arguments, which are passed on to the model."""
+    parser = ArgumentParser(description='benchmark_suite')
+    parser.add_argument('--model', type=str, default='seq2seq', choices=sorted(PACKAGES),
+                        help='model benchmarked, the attentive seq2seq model or the hierarchical encoder-decoder')
+    parser.add_argument('--data_dir', type=str, default='',
+                        help='directory of the session files (default: generated with the default generator settings)')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[128, 256, 512],
+                        help='hidden sizes of the forward and backward benchmarks')
+    parser.add_argument('--num_batches', type=int, default=10,
+                        help='number of batches converted to tensors and trained on by a benchmark')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='number of timed runs of every benchmark, after one warm up run')
+    parser.add_argument('--output', type=str, default='benchmark_results.json',
+                        help='file the results are written to')
+    parser.add_argument('--baseline', type=str, default='',
+                        help='results of a previous run to compare with')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='relative growth of the median time flagged as a regression')
+    return parser.parse_known_args()
+
+
+def measure(function, repeat):
+    """Runs a function once to warm up, then repeat times, and returns statistics of the run times in seconds."""
+    function()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return {'median': statistics.median(times), 'min': min(times), 'mean': statistics.mean(times), 'repeat': repeat}
+
+
+def synthetic_embeddings(dictionary, dimension, rng, coverage=0.8):
+    """Returns unit-length random vectors for a fraction of the words, the others are initialized as OOV words."""
+    embeddings_index = {}
+    for word in dictionary.idx2word:
+        if rng.random_sample() < coverage:
+            vector = rng.normal(size=dimension)
+            embeddings_index[word] = vector / np.linalg.norm(vector)
+    return embeddings_index
+
+
+def run_benchmarks(args, config):
+    """Returns the timing statistics of every benchmark by name."""
+    results = {}
+    results['corpus_parse'] = measure(
+        lambda: data.Corpus(config.data, 'session_train.txt', data.Dictionary(), config.max_length), args.repeat)
+    dictionary = data.Dictionary()
+    corpus = data.Corpus(config.data, 'session_train.txt', dictionary, config.max_length)
+
+    results['batchify'] = measure(lambda: helper.batchify(corpus.data, config.batch_size), args.repeat)
+    batches = helper.batchify(corpus.data, config.batch_size)[:args.num_batches]
+    to_tensors = helper.queries_to_tensors if args.model == 'seq2seq' else helper.session_to_tensor
+    results['to_tensors'] = measure(lambda: [to_tensors(batch, dictionary) for batch in batches], args.repeat)
+
+    embeddings_index = synthetic_embeddings(dictionary, config.emsize, np.random.RandomState(config.seed))
+    torch.manual_seed(config.seed)
+    model = Sequence2Sequence(dictionary, embeddings_index, config)
+    results['init_embedding_weights'] = measure(
+        lambda: model.embedding.init_embedding_weights(dictionary, embeddings_index, config.emsize), args.repeat)
+
+    tensors = [to_tensors(batch, dictionary) for batch in batches]
+    for size in args.sizes:
+        size_config = copy.copy(config)
+        if args.model == 'seq2seq':
+            size_config.nhid = size
+        else:
+            size_config.nhid_query, size_config.nhid_session = size, 2 * size
+        torch.manual_seed(config.seed)
+        model = Sequence2Sequence(dictionary, embeddings_index, size_config)
+
+        def train_steps():
+            for batch_tensors in tensors:
+                model.zero_grad()
+                model(*batch_tensors).backward()
+
+        results['forward_backward_%d' % size] = measure(train_steps, args.repeat)
+
+    return results, {'train_sessions': len(corpus), 'vocabulary_size': len(dictionary), 'num_batches': len(batches)}
+
+
+if __name__ == '__main__':
+    args, model_args = get_args()
+    # the modules of both models share their names, so only the benchmarked model is importable
+    sys.path.insert(0, os.path.join(ROOT, PACKAGES[args.model]))
+    sys.argv = sys.argv[:1] + model_args
+    import util, helper, data, torch
+    import numpy as np
+    from seq2seq import Sequence2Sequence
+
+    config = util.get_args()
+    torch.set_num_threads(config.num_threads)
+    # generated sessions are removed once the benchmarks are done
+    generated_dir = None
+    if args.data_dir:
+        config.data = args.data_dir
+    else:
+        generated_dir = tempfile.TemporaryDirectory()
+        config.data = generated_dir.name
+        generate_sessions.generate(generate_sessions.get_args(['--output_dir', config.data]))
+
+    try:
+        benchmarks, dataset = run_benchmarks(args, config)
+    finally:
+        if generated_dir:
+            generated_dir.cleanup()
+    results = {
+        'model': args.model,
+        'created': time.time(),
+        'platform': {
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'torch': torch.__version__,
+            'num_threads': torch.get_num_threads(),
+        },
+        'config': {'batch_size': config.batch_size, 'max_length': config.max_length, 'emsize': config.emsize,
+                   'sizes': args.sizes, 'num_batches': args.num_batches, 'data_dir': args.data_dir},
+        'data': dataset,
+        'benchmarks': benchmarks,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    if args.baseline:
+        regressions = compare.compare(compare.load_results(args.baseline), results, args.threshold)
+        if regressions:
+            print('%d benchmark(s) regressed by more than %d%%' % (len(regressions), args.threshold * 100))
+            sys.exit(1)
+    else:
+        for name, result in sorted(benchmarks.items()):
+            print('%-40s %10.4f s' % (name, result['median']))
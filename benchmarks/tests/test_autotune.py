@@ -0,0 +1,63 @@
+import types, pytest, autotune
+
+
+def batchify(data, bsz):
+    return [data[i:i + bsz] for i in range(0, len(data), bsz)]
+
+
+@pytest.fixture
+def grid(monkeypatch):
+    """Tuner arguments of a small grid, with a corpus of 100 sessions whose trials are recorded instead of run."""
+    monkeypatch.setattr(autotune, 'helper', types.SimpleNamespace(batchify=batchify), raising=False)
+    monkeypatch.setattr(autotune, 'corpus', types.SimpleNamespace(data=list(range(100))), raising=False)
+    args = types.SimpleNamespace(threads=[1, 2], interop_threads=[1], batch_sizes=[100, 10, 20], memory_budget=0,
+                                 warmup_batches=1, num_batches=2)
+    return args
+
+
+def fake_trial(peak_rss_mb):
+    """Returns a trial that reports the peak memory of a batch size and records the settings it ran."""
+    calls = []
+
+    def run_trial(context, config, batches, num_threads, num_interop_threads, warmup_batches):
+        calls.append((len(batches[0]), num_threads))
+        return {'status': 'done', 'tokens_per_sec': 100.0 * num_threads, 'peak_rss_mb': peak_rss_mb(len(batches[0]))}
+    return run_trial, calls
+
+
+def test_every_setting_of_the_grid_is_tried_in_order(grid, monkeypatch):
+    run_trial, calls = fake_trial(lambda batch_size: batch_size)
+    monkeypatch.setattr(autotune, 'run_trial', run_trial)
+    results = autotune.tune(grid, types.SimpleNamespace())
+    assert calls == [(10, 1), (20, 1), (10, 2), (20, 2)]
+    # 100 sessions are one batch of 100, which leaves no timed batch after the warmup one
+    assert [(r['batch_size'], r['num_threads'], r['status']) for r in results] == [
+        (10, 1, 'done'), (20, 1, 'done'), (100, 1, 'too few sessions'),
+        (10, 2, 'done'), (20, 2, 'done'), (100, 2, 'too few sessions')]
+
+
+def test_a_batch_size_over_the_budget_ends_the_larger_ones(grid, monkeypatch):
+    grid.batch_sizes, grid.memory_budget = [5, 10, 20], 12
+    run_trial, calls = fake_trial(lambda batch_size: batch_size * 1.5)
+    monkeypatch.setattr(autotune, 'run_trial', run_trial)
+    results = autotune.tune(grid, types.SimpleNamespace())
+    assert calls == [(5, 1), (10, 1), (5, 2), (10, 2)]
+    assert [r['status'] for r in results[:3]] == ['done', 'over budget', 'over budget']
+    assert 'peak_rss_mb' not in results[2]
+
+
+def exit_without_result(connection, *args):
+    connection.close()
+
+
+def test_a_trial_that_dies_fails(monkeypatch):
+    monkeypatch.setattr(autotune, 'trial_worker', exit_without_result)
+    context = autotune.mp.get_context('fork')
+    assert autotune.run_trial(context, None, [], 1, 1, 0) == {'status': 'failed'}
+
+
+def test_the_default_threads_end_with_the_available_cores(monkeypatch):
+    monkeypatch.setattr(autotune.os, 'sched_getaffinity', lambda pid: set(range(6)), raising=False)
+    assert autotune.default_threads() == [1, 2, 4, 6]
+    monkeypatch.setattr(autotune.os, 'sched_getaffinity', lambda pid: set(range(8)), raising=False)
+    assert autotune.default_threads() == [1, 2, 4, 8]
@@ -0,0 +1,31 @@
+import os
+import generate_sessions
+
+NAMES = ['session_train.txt', 'session_dev.txt', 'session_test.txt']
+
+
+def generate(output_dir, seed):
+    config = generate_sessions.get_args(['--output_dir', str(output_dir), '--num_sessions', '50', '10', '10',
+                                         '--vocab_size', '100', '--num_queries', '200', '--seed', str(seed)])
+    generate_sessions.generate(config)
+    return config, [open(os.path.join(str(output_dir), name)).read() for name in NAMES]
+
+
+def test_same_seed_gives_same_sessions(tmp_path):
+    _, first = generate(tmp_path / 'first', 7)
+    _, second = generate(tmp_path / 'second', 7)
+    _, other = generate(tmp_path / 'other', 8)
+    assert first == second
+    assert first != other
+
+
+def test_sessions_follow_the_log_format(tmp_path):
+    config, contents = generate(tmp_path, 7)
+    for content, num_sessions in zip(contents, config.num_sessions):
+        lines = content.splitlines()
+        assert len(lines) == num_sessions
+        for line in lines:
+            queries = line.split(':::')
+            assert config.min_session_length <= len(queries) <= config.max_session_length
+            for query in queries:
+                assert 1 <= len(query.split()) <= config.max_query_length
@@ -0,0 +1,65 @@
+###############################################################################
+# Author: agent
+# Project: Context-aware Query Suggestion
+# Date Created: 10/18/2026
+#
+# File Description: This script measures the training step time of the model
+# with dense and sparse embedding gradients for several vocabulary sizes, on
+# synthetic sessions.
+###############################################################################
+
+import util, helper, data, optimizer, copy, time, random
+import torch
+from seq2seq import Sequence2Sequence
+
+
+def synthetic_batch(dictionary, batch_size, session_length, max_length):
+    """Returns a batch of sessions of random queries drawn uniformly from the vocabulary."""
+    words = dictionary.idx2word[4:]
+    batch = []
+    for _ in range(batch_size):
+        session = data.Session()
+        session.queries = [random.sample(words, random.randint(1, max_length)) + [dictionary.end_token]
+                           for _ in range(session_length)]
+        batch.append(session)
+    return batch
+
+
+def time_steps(model, model_optimizer, batches, config):
+    """Returns the mean time of a training step and of its optimizer update in milliseconds."""
+    step_time, update_time = 0, 0
+    for batch_no, (sessions, length) in enumerate(batches):
+        start = time.time()
+        model_optimizer.zero_grad()
+        loss = model(sessions, length)
+        loss.backward()
+        helper.clip_grad_norm(model.parameters(), config.clip)
+        update_start = time.time()
+        model_optimizer.step()
+        # the first steps allocate the optimizer states
+        if batch_no >= 2:
+            step_time += time.time() - start
+            update_time += time.time() - update_start
+    num_steps = max(len(batches) - 2, 1)
+    return step_time / num_steps * 1000, update_time / num_steps * 1000
+
+
+args = util.get_args()
+random.seed(args.seed)
+torch.set_num_threads(args.num_threads)
+
+print('%10s %8s %12s %12s' % ('vocabulary', 'gradient', 'step (ms)', 'update (ms)'))
+for vocab_size in args.vocab_sizes:
+    dictionary = data.Dictionary()
+    for i in range(vocab_size - len(dictionary)):
+        dictionary.add_word('w%d' % i)
+    batches = [helper.session_to_tensor(synthetic_batch(dictionary, args.batch_size, 4, args.max_length), dictionary)
+               for _ in range(args.benchmark_steps + 2)]
+
+    for sparse_embedding in [False, True]:
+        config = copy.copy(args)
+        config.sparse_embedding = sparse_embedding
+        torch.manual_seed(args.seed)
+        model = Sequence2Sequence(dictionary, {}, config)
+        step_ms, update_ms = time_steps(model, optimizer.create_optimizer(model, config), batches, config)
+        print('%10d %8s %12.1f %12.1f' % (vocab_size, 'sparse' if sparse_embedding else 'dense', step_ms, update_ms))
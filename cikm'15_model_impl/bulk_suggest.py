@@ -0,0 +1,121 @@
+###############################################################################
+# Author: agent
+# Project: Context-aware Query Suggestion
+# Date Created: 10/18/2026
+#
+# File Description: This script generates suggestions for every position of
+# every session in a session file. The file is split into byte ranges which
+# are processed by a pool of workers; each shard records how far it got so an
+# interrupted job resumes where it stopped.
+###############################################################################
+
+import util, helper, cache, suggest, os, time, torch
+from common import step_profiler
+import multiprocessing as mp
+
+suggester = None
+# profiles the batches of a worker, counted over all of its shards
+profiler, batches_done = None, 0
+
+
+def read_offsets(filename):
+    """Returns the (input offset, output offset) recorded for a shard, or None if the shard has not started."""
+    if not os.path.isfile(filename):
+        return None
+    with open(filename, 'r') as f:
+        input_offset, output_offset = f.read().split()
+    return int(input_offset), int(output_offset)
+
+
+def write_offsets(filename, input_offset, output_offset):
+    """Atomically records how much of the input a shard has consumed and how much output it has written."""
+    with open(filename + '.tmp', 'w') as f:
+        f.write('%d %d\n' % (input_offset, output_offset))
+    os.replace(filename + '.tmp', filename)
+
+
+def init_worker(config):
+    """Loads the model once per worker process and pins its number of threads."""
+    global suggester, profiler
+    torch.set_num_threads(config.num_threads)
+    profiler = step_profiler.StepProfiler(config.profile_steps, config.profile_dir, 'bulk_suggest', config.cuda)
+    # the batches of a worker span several shards, so a range still open after its last shard is written at exit
+    profiler.finish_at_exit()
+    suggestion_cache = cache.SuggestionCache(config.cache_size * 1024 * 1024, config.cache_ttl)
+    suggester = suggest.load_suggester(config, suggestion_cache)
+    if os.path.isfile(config.cache_snapshot):
+        suggestion_cache.load(config.cache_snapshot)
+
+
+def process_shard(shard):
+    """Writes the suggestions of every session of a shard as `session offset, position, suggestions` lines."""
+    global batches_done
+    shard_no, filename, start, end = shard
+    config = suggester.config
+    output_path = os.path.join(config.output_dir, 'part-%05d.txt' % shard_no)
+    offset_path = os.path.join(config.output_dir, 'part-%05d.offset' % shard_no)
+
+    offsets = read_offsets(offset_path)
+    input_offset, output_offset = offsets if offsets is not None else (start, 0)
+    since = time.time()
+    num_sessions = 0
+    with open(filename, 'rb') as f, open(output_path, 'a+b') as out:
+        # drop whatever was written after the last recorded offset
+        out.truncate(output_offset)
+        out.seek(output_offset)
+        f.seek(input_offset)
+        while input_offset < end:
+            session_offsets, contexts = [], []
+            while input_offset < end and len(session_offsets) < config.batch_size:
+                line = f.readline().decode('utf-8').strip()
+                if line:
+                    queries = line.split(':::')
+                    for i in range(1, len(queries) + 1):
+                        session_offsets.append((input_offset, i - 1))
+                        contexts.append(queries[:i])
+                    num_sessions += 1
+                input_offset = f.tell()
+
+            batches_done += 1
+            profiler.begin(batches_done)
+            batch_suggestions = suggester.suggest(contexts)
+            profiler.end(batches_done)
+            lines = []
+            for (session_offset, position), suggestions in zip(session_offsets, batch_suggestions):
+                lines.append('%d\t%d\t%s\n' % (session_offset, position, ':::'.join(suggestions)))
+            out.write(''.join(lines).encode('utf-8'))
+            out.flush()
+            os.fsync(out.fileno())
+            write_offsets(offset_path, input_offset, out.tell())
+
+    return shard_no, num_sessions, time.time() - since
+
+
+if __name__ == '__main__':
+    args = util.get_args()
+    input_path = os.path.join(args.data, args.test_file)
+    assert os.path.exists(input_path)
+    if not os.path.isdir(args.output_dir):
+        os.makedirs(args.output_dir)
+
+    # the shard plan is kept with the output, so a resumed job uses the same byte ranges
+    plan_path = os.path.join(args.output_dir, 'shards.p')
+    if os.path.isfile(plan_path):
+        shards = helper.load_object(plan_path)
+    else:
+        shards = helper.plan_shards(input_path, args.num_shards)
+        helper.save_object(shards, plan_path)
+    print('Number of shards = ', len(shards))
+
+    start = time.time()
+    total_sessions = 0
+    tasks = [(shard_no, input_path, shard[0], shard[1]) for shard_no, shard in enumerate(shards)]
+    # workers are spawned rather than forked so that each one builds its own thread pools
+    pool = mp.get_context('spawn').Pool(args.num_workers, initializer=init_worker, initargs=(args,))
+    for shard_no, num_sessions, seconds in pool.imap_unordered(process_shard, tasks):
+        total_sessions += num_sessions
+        print('shard %d: %d sessions in %s, %s' % (shard_no, num_sessions, helper.convert_to_minutes(seconds),
+                                                    helper.convert_to_minutes(time.time() - start)))
+    pool.close()
+    pool.join()
+    print('%d sessions processed in %s' % (total_sessions, helper.convert_to_minutes(time.time() - start)))
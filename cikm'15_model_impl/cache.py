@@ -0,0 +1,98 @@
+###############################################################################
+# Author: agent
+# Project: Context-aware Query Suggestion
+# Date Created: 10/18/2026
+#
+# File Description: This script provides a size bounded LRU cache of query
+# suggestions that is tied to the checkpoint which generated them.
+###############################################################################
+
+import sys, time, hashlib, helper
+from collections import OrderedDict
+
+
+def checkpoint_fingerprint(filename, chunk_size=1 << 20):
+    """Returns a content hash that identifies a model checkpoint."""
+    sha1 = hashlib.sha1()
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+def sizeof(obj):
+    """Approximates the memory footprint (in bytes) of nested tuples and lists of ints and strings."""
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (tuple, list)):
+        size += sum(sizeof(item) for item in obj)
+    return size
+
+
+class SuggestionCache(object):
+    """LRU cache of suggestions with a time-to-live and a bound on its size in bytes."""
+
+    def __init__(self, max_bytes, ttl=0, checkpoint_id=None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.checkpoint_id = checkpoint_id
+        # key -> (suggestions, expiry time, size in bytes), ordered from least to most recently used
+        self.entries = OrderedDict()
+        self.num_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Returns the cached suggestions of a context or None if they are missing or expired."""
+        entry = self.entries.get(key)
+        if entry is not None and entry[1] and entry[1] < time.time():
+            self.remove(key)
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key, suggestions):
+        """Stores the suggestions of a context, evicting least recently used entries to respect the size bound."""
+        if key in self.entries:
+            self.remove(key)
+        num_bytes = sizeof(key) + sizeof(suggestions)
+        if num_bytes > self.max_bytes:
+            return
+        expiry = time.time() + self.ttl if self.ttl > 0 else 0
+        self.entries[key] = (suggestions, expiry, num_bytes)
+        self.num_bytes += num_bytes
+        while self.num_bytes > self.max_bytes:
+            self.remove(next(iter(self.entries)))
+
+    def remove(self, key):
+        self.num_bytes -= self.entries.pop(key)[2]
+
+    def clear(self):
+        self.entries.clear()
+        self.num_bytes = 0
+
+    def bind(self, checkpoint_id):
+        """Associates the cache with a checkpoint and drops every entry generated by a different one."""
+        if checkpoint_id != self.checkpoint_id:
+            self.clear()
+            self.checkpoint_id = checkpoint_id
+
+    def save(self, filename):
+        """Saves the cached suggestions, from least to most recently used, into a snapshot file."""
+        entries = [(key, entry[0]) for key, entry in self.entries.items()]
+        helper.save_object({'checkpoint_id': self.checkpoint_id, 'entries': entries}, filename)
+
+    def load(self, filename):
+        """Loads a snapshot and returns the number of loaded entries. Snapshots of other checkpoints are ignored."""
+        snapshot = helper.load_object(filename)
+        if snapshot['checkpoint_id'] != self.checkpoint_id:
+            return 0
+        for key, suggestions in snapshot['entries']:
+            self.put(key, suggestions)
+        return len(self.entries)
+
+    def __len__(self):
+        return len(self.entries)
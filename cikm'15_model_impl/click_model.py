@@ -0,0 +1,58 @@
+###############################################################################
+# Author: agent
+# Project: Context-aware Query Suggestion
+# Date Created: 10/18/2026
+#
+# File Description: This script contains code related to the document click
+# prediction model built on top of the hierarchical session encoder.
+###############################################################################
+
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+from nn_layer import ClickScorer
+
+
+class ClickModel(nn.Module):
+    """Predicts the clicks on the documents of a result page from the session encoding of the suggestion model."""
+
+    def __init__(self, session_model, config):
+        """"Constructor of the class."""
+        super(ClickModel, self).__init__()
+        self.config = config
+        self.session_model = session_model
+        context_size = self.config.nhid_session
+        if self.config.click_use_query:
+            context_size += self.config.nhid_query
+        self.scorer = ClickScorer(context_size, self.config.nhid_query, self.config.max_documents)
+
+    @staticmethod
+    def compute_loss(logits, clicks, document_mask):
+        # logits, clicks, document_mask: batch x num_documents
+        losses = F.binary_cross_entropy_with_logits(logits, clicks, weight=document_mask, reduction='sum')
+        return losses / document_mask.sum()
+
+    def encode_context(self, batch_session, last_query):
+        """Encodes the queries of each session once and returns the session state after its last query."""
+        session_input = self.session_model.encode_queries(batch_session.view(-1, batch_session.size(-1)))
+        session_input = session_input.view(batch_session.size(0), batch_session.size(1), -1)
+        hidden_states, cell_states = self.session_model.encode_session(session_input)
+        index = last_query.view(-1, 1, 1).expand(hidden_states.size(0), 1, hidden_states.size(2))
+        context = hidden_states.gather(1, index).squeeze(1)
+        if self.config.click_use_query:
+            index = last_query.view(-1, 1, 1).expand(session_input.size(0), 1, session_input.size(2))
+            context = torch.cat((context, session_input.gather(1, index).squeeze(1)), 1)
+        return context
+
+    def forward(self, batch_session, last_query, batch_documents):
+        """"Returns the click logits of every document of a batch of result pages."""
+        context = self.encode_context(batch_session, last_query)
+        # document titles are encoded by the query encoder, all the documents of the batch in one pass
+        documents = self.session_model.encode_queries(batch_documents.view(-1, batch_documents.size(-1)))
+        documents = documents.view(batch_documents.size(0), batch_documents.size(1), -1)
+        return self.scorer(context, documents)
+
+    def click_probabilities(self, batch_session, last_query, batch_documents, document_mask):
+        """Returns the click probability of every document, zero for the padded ones."""
+        with torch.no_grad():
+            return torch.sigmoid(self.forward(batch_session, last_query, batch_documents)) * document_mask
@@ -7,13 +7,17 @@
 # example in the corpus and the dictionary.
 ###############################################################################
 
-import os
+# util puts the common package on the path
+import os, util
+from common import normalizer
 
 
 class Dictionary(object):
-    def __init__(self):
+    def __init__(self, normalizer_mode='split'):
         self.word2idx = {}
         self.idx2word = []
+        # the normalizer mode of the queries, which inference uses as well, see normalizer.for_dictionary
+        self.normalizer = normalizer_mode
         # Create and store three special tokens
         self.pad_token = '<PAD>'
         self.start_token = '<SOS>'
@@ -45,13 +49,19 @@ class Session(object):
     def __init__(self):
         self.queries = []
 
-    def form_session(self, queries, dictionary, max_length, is_test_instance=False):
-        for query in queries:
-            # terms = helper.tokenize_and_normalize(query)
-            terms = query.split() + [dictionary.end_token]
+    def form_session(self, queries, dictionary, max_length, is_test_instance=False, session_window=0,
+                     query_normalizer=None):
+        if query_normalizer is None:
+            # the queries are split on whitespace unless a normalizer is given
+            query_normalizer = normalizer.QueryNormalizer('split', 0)
+        for query_terms in query_normalizer.normalize_batch(queries):
+            terms = query_terms + [dictionary.end_token]
             if len(terms) > (max_length + 1):
                 continue
             self.queries.append(terms)
+        if session_window > 0:
+            # only the last queries of long sessions are kept
+            self.queries = self.queries[-session_window:]
 
         if len(self.queries) > 2:
             for query in self.queries:
@@ -71,11 +81,13 @@ class Session(object):
 
 
 class Corpus(object):
-    def __init__(self, path, filename, dictionary, max_length, is_test_corpus=False):
+    def __init__(self, path, filename, dictionary, max_length, is_test_corpus=False, session_window=0,
+                 normalizer_cache_size=100000):
         self.max_session_length = 0
-        self.data = self.parse(os.path.join(path, filename), dictionary, max_length, is_test_corpus)
+        self.normalizer = normalizer.for_dictionary(dictionary, normalizer_cache_size)
+        self.data = self.parse(os.path.join(path, filename), dictionary, max_length, is_test_corpus, session_window)
 
-    def parse(self, path, dictionary, max_length, is_test_corpus):
+    def parse(self, path, dictionary, max_length, is_test_corpus, session_window=0):
         """Parses the content of a file."""
         assert os.path.exists(path)
 
@@ -84,7 +96,8 @@ class Corpus(object):
             for line in f:
                 queries = line.strip().split(':::')
                 session = Session()
-                session_length = session.form_session(queries, dictionary, max_length, is_test_corpus)
+                session_length = session.form_session(queries, dictionary, max_length, is_test_corpus, session_window,
+                                                      self.normalizer)
                 if session_length != -1:
                     if session_length in samples:
                         samples[session_length].append(session)
@@ -100,3 +113,58 @@ class Corpus(object):
         for key, value in self.data.items():
             length += len(value)
         return length
+
+
+class ResultPage(object):
+    def __init__(self):
+        self.queries = []
+        self.documents = []
+        self.clicks = []
+
+    def form_page(self, queries, titles, clicks, dictionary, max_length, max_title_length, max_documents,
+                  query_normalizer=None):
+        normalize = query_normalizer.normalize if query_normalizer else str.split
+        for query in queries:
+            terms = normalize(query)[:max_length]
+            if terms:
+                self.queries.append(terms + [dictionary.end_token])
+
+        for title, click in list(zip(titles, clicks))[:max_documents]:
+            self.documents.append(normalize(title)[:max_title_length] + [dictionary.end_token])
+            self.clicks.append(float(click))
+
+        if self.queries and self.documents:
+            return len(self.documents)
+        else:
+            return -1
+
+    def __len__(self):
+        return len(self.documents)
+
+
+class ClickCorpus(object):
+    def __init__(self, path, filename, dictionary, max_length, max_title_length, max_documents,
+                 normalizer_cache_size=100000):
+        self.normalizer = normalizer.for_dictionary(dictionary, normalizer_cache_size)
+        self.data = self.parse(os.path.join(path, filename), dictionary, max_length, max_title_length, max_documents)
+
+    def parse(self, path, dictionary, max_length, max_title_length, max_documents):
+        """Parses a click log, where each line holds the session queries, the document titles of the result
+        page of the last query and the click labels, separated by tabs."""
+        assert os.path.exists(path)
+
+        samples = []
+        with open(path, 'r') as f:
+            for line in f:
+                fields = line.rstrip('\n').split('\t')
+                if len(fields) != 3:
+                    continue
+                page = ResultPage()
+                if page.form_page(fields[0].split(':::'), fields[1].split(':::'), fields[2].split(), dictionary,
+                                  max_length, max_title_length, max_documents, self.normalizer) != -1:
+                    samples.append(page)
+
+        return samples
+
+    def __len__(self):
+        return len(self.data)
@@ -0,0 +1,227 @@
+###############################################################################
+# Author: agent
+# Project: Context-aware Query Suggestion
+# Date Created: 10/18/2026
+#
+# File Description: This script evaluates a checkpoint on the test sessions.
+# It reports the token-level perplexity of the next queries and how the next
+# query is ranked against mined or sampled candidates (MRR and recall@k).
+###############################################################################
+
+import util, helper, data, suggest, os, math, time, random, torch
+from common import normalizer, step_profiler
+import multiprocessing as mp
+from collections import Counter, defaultdict
+from torch.autograd import Variable
+
+evaluator = None
+# profiles the batches of a worker, counted over all of its shards
+profiler, batches_done = None, 0
+
+
+def query_key(terms, dictionary):
+    """Returns the key a query is mined and looked up by: the indices of its terms, as the model reads them. Queries
+    that only differ by words missing from the dictionary are the same query for the model, so they share a key."""
+    unknown = dictionary.word2idx[dictionary.unknown_token]
+    return tuple(dictionary.word2idx.get(term, unknown) for term in terms)
+
+
+def mine_candidates(filename, config, dictionary, query_normalizer):
+    """Returns the keys of the most frequent queries of a session file and, if needed, the keys of the queries that
+    most often follow each query, keyed by query_key."""
+    query_counts = Counter()
+    next_query_counts = defaultdict(Counter)
+    for line in helper.read_lines(filename):
+        queries = [query_key(terms, dictionary) for terms in query_normalizer.normalize_batch(line.split(':::'))
+                   if terms and len(terms) <= config.max_length]
+        query_counts.update(queries)
+        if config.candidates == 'mined':
+            for i in range(1, len(queries)):
+                next_query_counts[queries[i - 1]][queries[i]] += 1
+
+    candidate_pool = [query for query, count in query_counts.most_common(config.candidate_pool)]
+    # one extra candidate is kept since the next query itself is never used as a negative candidate
+    mined_candidates = {query: [next_query for next_query, count in counts.most_common(config.num_candidates + 1)]
+                        for query, counts in next_query_counts.items()}
+    return candidate_pool, mined_candidates
+
+
+class Evaluator(object):
+    """Computes perplexity and ranking metrics of a model over batches of test sessions."""
+
+    def __init__(self, model, dictionary, config, candidate_pool, mined_candidates):
+        self.model = model
+        self.dictionary = dictionary
+        self.config = config
+        self.candidate_pool = candidate_pool
+        self.mined_candidates = mined_candidates
+        self.random = random.Random(config.seed)
+        self.normalizer = normalizer.for_dictionary(dictionary, config.normalizer_cache_size)
+        self.encoding_cache = helper.EncodingCache(config.encoding_cache_size) if config.encoding_cache_size else None
+        self.model.eval()
+
+    def to_indices(self, key):
+        """Converts the key of a query to the list of indices of its terms followed by the end token."""
+        return list(key) + [self.dictionary.word2idx[self.dictionary.end_token]]
+
+    def negative_candidates(self, previous_query, next_query):
+        """Returns num_candidates queries other than the next query, sampled queries filling in for missing mined
+        ones."""
+        candidates = []
+        if self.config.candidates == 'mined':
+            candidates = [query for query in self.mined_candidates.get(previous_query, []) if query != next_query]
+            candidates = candidates[:self.config.num_candidates]
+        if len(candidates) < self.config.num_candidates:
+            sampled = self.random.sample(self.candidate_pool,
+                                         min(len(self.candidate_pool), self.config.num_candidates + 1))
+            for query in sampled:
+                if len(candidates) < self.config.num_candidates and query != next_query and query not in candidates:
+                    candidates.append(query)
+        return candidates
+
+    def read_batches(self, filename, start, end):
+        """Streams the sessions of a byte range as batches of sessions of the same length along with their
+        candidates."""
+        buckets = {}
+        for line in helper.read_lines(filename, start, end):
+            session = data.Session()
+            if session.form_session(line.split(':::'), self.dictionary, self.config.max_length, True,
+                                    query_normalizer=self.normalizer) == -1:
+                continue
+            bucket = buckets.setdefault(len(session), [])
+            bucket.append(session)
+            if len(bucket) == self.config.batch_size:
+                yield self.sessions_to_tensors(bucket)
+                buckets[len(session)] = []
+
+        # unlike batchify, the remainders are evaluated as well
+        for bucket in buckets.values():
+            if bucket:
+                yield self.sessions_to_tensors(bucket)
+
+    def sessions_to_tensors(self, sessions):
+        """Converts a batch of sessions and the candidates of every next query to padded tensors."""
+        batch_session, length = helper.session_to_tensor(sessions, self.dictionary)
+        candidates = []
+        for session in sessions:
+            for i in range(1, len(session)):
+                previous_query = query_key(session.queries[i - 1][:-1], self.dictionary)
+                next_query = query_key(session.queries[i][:-1], self.dictionary)
+                candidates.extend(self.to_indices(query) for query in
+                                  self.negative_candidates(previous_query, next_query))
+
+        max_length = max(len(candidate) for candidate in candidates)
+        candidate_length = torch.LongTensor([len(candidate) for candidate in candidates])
+        candidates = torch.LongTensor([candidate + [0] * (max_length - len(candidate)) for candidate in candidates])
+        return batch_session, length, Variable(candidates), Variable(candidate_length)
+
+    def evaluate_batch(self, batch):
+        """Returns the sums of the metrics over all the next queries of a batch of sessions."""
+        batch_session, length, candidates, candidate_length = batch
+        if self.config.cuda:
+            batch_session, length = batch_session.cuda(), length.cuda()
+            candidates, candidate_length = candidates.cuda(), candidate_length.cuda()
+
+        with torch.no_grad():
+            session_input = self.model.encode_queries(batch_session.view(-1, batch_session.size(-1)),
+                                                      self.encoding_cache)
+            session_input = session_input.view(batch_session.size(0), batch_session.size(1), -1)
+            hidden_states, cell_states = self.model.encode_session(session_input)
+            hidden_states = hidden_states[:, :-1, :].contiguous().view(-1, hidden_states.size(-1))
+            cell_states = cell_states[:, :-1, :].contiguous().view(-1, cell_states.size(-1))
+            next_queries = batch_session[:, 1:, :].contiguous().view(-1, batch_session.size(-1))
+            next_query_length = length[:, 1:].contiguous().view(-1)
+            log_likelihood = self.model.score_queries((hidden_states.unsqueeze(0), cell_states.unsqueeze(0)),
+                                                      next_queries, next_query_length)
+
+            # candidates are scored a few next queries at a time to bound the size of the vocabulary projections
+            num_pairs, num_candidates = log_likelihood.size(0), self.config.num_candidates
+            candidate_log_likelihood = []
+            for start in range(0, num_pairs, self.config.batch_size):
+                end = min(start + self.config.batch_size, num_pairs)
+                origin = torch.arange(start, end).long().unsqueeze(1).expand(end - start, num_candidates)
+                origin = origin.contiguous().view(-1)
+                if self.config.cuda:
+                    origin = origin.cuda()
+                decoder_hidden = (hidden_states.index_select(0, origin).unsqueeze(0),
+                                  cell_states.index_select(0, origin).unsqueeze(0))
+                candidate_log_likelihood.append(self.model.score_queries(
+                    decoder_hidden, candidates[start * num_candidates:end * num_candidates],
+                    candidate_length[start * num_candidates:end * num_candidates]))
+            candidate_log_likelihood = torch.cat(candidate_log_likelihood, 0).view(num_pairs, num_candidates)
+
+        rank = 1 + (candidate_log_likelihood > log_likelihood.unsqueeze(1)).long().sum(1)
+        metrics = {
+            'sessions': batch_session.size(0),
+            'pairs': num_pairs,
+            'tokens': next_query_length.sum().item(),
+            'nll': -log_likelihood.sum().item(),
+            'reciprocal_rank': (1.0 / rank.float()).sum().item()
+        }
+        for k in self.config.recall_at:
+            metrics['recall@%d' % k] = (rank <= k).long().sum().item()
+        return metrics
+
+
+def init_worker(config, candidate_pool, mined_candidates):
+    """Loads the model once per worker process and pins its number of threads."""
+    global evaluator, profiler
+    torch.set_num_threads(config.num_threads)
+    profiler = step_profiler.StepProfiler(config.profile_steps, config.profile_dir, 'evaluate', config.cuda)
+    # the batches of a worker span several shards, so a range still open after its last shard is written at exit
+    profiler.finish_at_exit()
+    suggester = suggest.load_suggester(config)
+    evaluator = Evaluator(suggester.model, suggester.dictionary, config, candidate_pool, mined_candidates)
+
+
+def evaluate_shard(shard):
+    """Evaluates the sessions of a byte range while the next batches are prepared in the background."""
+    global batches_done
+    shard_no, filename, start, end = shard
+    # candidates of a shard do not depend on which worker evaluates it
+    evaluator.random.seed(evaluator.config.seed + shard_no)
+    metrics = Counter()
+    for batch in helper.prefetch(evaluator.read_batches(filename, start, end), 4):
+        batches_done += 1
+        profiler.begin(batches_done)
+        metrics.update(evaluator.evaluate_batch(batch))
+        profiler.end(batches_done)
+    return shard_no, metrics
+
+
+if __name__ == '__main__':
+    args = util.get_args()
+    test_path = os.path.join(args.data, args.test_file)
+    assert os.path.exists(test_path)
+
+    # the candidates are normalized as the queries the dictionary was built from
+    dictionary = helper.load_object(args.save_path + 'dictionary.p')
+    query_normalizer = normalizer.for_dictionary(dictionary, args.normalizer_cache_size)
+    candidate_pool, mined_candidates = mine_candidates(os.path.join(args.data, 'session_train.txt'), args,
+                                                       dictionary, query_normalizer)
+    print('Number of candidate queries = ', len(candidate_pool))
+    assert len(candidate_pool) > args.num_candidates
+
+    start = time.time()
+    totals = Counter()
+    shards = helper.plan_shards(test_path, args.num_shards)
+    tasks = [(shard_no, test_path, shard[0], shard[1]) for shard_no, shard in enumerate(shards)]
+    pool = mp.get_context('spawn').Pool(args.num_workers, initializer=init_worker,
+                                        initargs=(args, candidate_pool, mined_candidates))
+    for shard_no, metrics in pool.imap_unordered(evaluate_shard, tasks):
+        totals.update(metrics)
+        elapsed = time.time() - start
+        print('shard %d done, %s, %.1f tokens/sec, %.1f sessions/sec' % (
+            shard_no, helper.convert_to_minutes(elapsed), totals['tokens'] / elapsed, totals['sessions'] / elapsed))
+    pool.close()
+    pool.join()
+
+    elapsed = time.time() - start
+    print('Number of test sessions = ', totals['sessions'])
+    print('Number of next queries = ', totals['pairs'])
+    print('Perplexity = %.4f' % math.exp(totals['nll'] / totals['tokens']))
+    print('MRR = %.4f' % (totals['reciprocal_rank'] / totals['pairs']))
+    for k in args.recall_at:
+        print('Recall@%d = %.4f' % (k, totals['recall@%d' % k] / totals['pairs']))
+    print('Throughput = %.1f tokens/sec, %.1f sessions/sec' % (totals['tokens'] / elapsed,
+                                                               totals['sessions'] / elapsed))
@@ -7,30 +7,33 @@
 # may come in handy at any point in the experiments.
 ###############################################################################
 
-import re, os, glob, pickle, string, math, time, util, torch, shutil
+import os, glob, pickle, math, time, util, torch, threading, queue, random
 import numpy as np
-import matplotlib as mpl
-
-mpl.use('Agg')
-import matplotlib.pyplot as plt
-import matplotlib.ticker as ticker
-from nltk import wordpunct_tokenize
 from numpy.linalg import norm
 from collections import OrderedDict
 from torch.autograd import Variable
+import torch.distributed as dist
+from common import normalizer
+from common.encoding_cache import EncodingCache
+from common.plots import load_pyplot, save_plot, PlotWriter
+from common.weights import save_inference_weights, is_inference_weights, map_inference_weights, \
+    load_inference_weights
 
 
 def normalize_word_embedding(v):
     return np.array(v) / norm(np.array(v))
 
 
-def load_word_embeddings(directory, file):
+def load_word_embeddings(directory, file, words=None):
+    """Returns the normalized vectors of a word vectors file, only those of words if given."""
     embeddings_index = {}
     f = open(os.path.join(directory, file))
     for line in f:
         try:
             values = line.split()
             word = values[0]
+            if words is not None and word not in words:
+                continue
             embeddings_index[word] = normalize_word_embedding([float(x) for x in values[1:]])
         except ValueError as e:
             print(e)
@@ -57,9 +60,84 @@ def save_model_states(model, loss, epoch, snapshot_prefix):
 
 
 def save_checkpoint(state, filename='./checkpoint.pth.tar'):
-    if os.path.isfile(filename):
-        os.remove(filename)
-    torch.save(state, filename)
+    # written to a temporary file first, so that a crash never leaves a partial or missing checkpoint
+    torch.save(state, filename + '.tmp')
+    os.replace(filename + '.tmp', filename)
+
+
+def cpu_copy(obj):
+    """Returns a copy of nested dicts, lists and tuples in which every tensor is cloned to the CPU."""
+    if torch.is_tensor(obj):
+        return obj.detach().cpu().clone()
+    if isinstance(obj, dict):
+        copied = type(obj)((key, cpu_copy(value)) for key, value in obj.items())
+        if hasattr(obj, '_metadata'):
+            copied._metadata = obj._metadata
+        return copied
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(cpu_copy(value) for value in obj)
+    return obj
+
+
+class CheckpointWriter(object):
+    """Writes checkpoints on a background thread, so that training only waits for the in-memory copy of a state."""
+
+    def __init__(self, keep_last=0):
+        self.keep_last = keep_last
+        # at most one snapshot waits to be written, to bound the memory held by pending checkpoints
+        self.requests = queue.Queue(1)
+        self.errors = []
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def run(self):
+        while True:
+            state, filename, pattern = self.requests.get()
+            try:
+                save_checkpoint(state, filename)
+                if pattern and self.keep_last > 0:
+                    for old_filename in sorted(glob.glob(pattern))[:-self.keep_last]:
+                        os.remove(old_filename)
+            except Exception as e:
+                self.errors.append(e)
+            self.requests.task_done()
+
+    def save(self, state, filename, pattern=None):
+        """Queues a copy of a state to be written to filename, then keeps the last keep_last files matching pattern."""
+        if self.errors:
+            raise self.errors.pop(0)
+        self.requests.put((cpu_copy(state), filename, pattern))
+
+    def wait(self):
+        """Blocks until every queued checkpoint is written."""
+        self.requests.join()
+        if self.errors:
+            raise self.errors.pop(0)
+
+
+def get_rng_states():
+    """Returns the states of the python, numpy and torch random number generators."""
+    name, keys, position, has_gauss, cached_gaussian = np.random.get_state()
+    states = {
+        'python': random.getstate(),
+        # the numpy keys are stored as a tensor so that the checkpoint only holds tensors and python objects
+        'numpy': (name, torch.from_numpy(keys.astype(np.int64)), position, has_gauss, cached_gaussian),
+        'torch': torch.get_rng_state(),
+    }
+    if torch.cuda.is_available():
+        states['cuda'] = torch.cuda.get_rng_state_all()
+    return states
+
+
+def set_rng_states(states):
+    """Restores the random number generator states returned by get_rng_states."""
+    random.setstate(states['python'])
+    name, keys, position, has_gauss, cached_gaussian = states['numpy']
+    np.random.set_state((name, keys.numpy().astype(np.uint32), position, has_gauss, cached_gaussian))
+    torch.set_rng_state(states['torch'])
+    if 'cuda' in states and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(states['cuda'])
 
 
 def load_model_states(model, filename):
@@ -71,7 +149,7 @@ def load_model_states(model, filename):
 def load_model_states_from_checkpoint(model, filename, tag):
     """Load model states from a previously saved checkpoint."""
     assert os.path.exists(filename)
-    checkpoint = torch.load(filename)
+    checkpoint = torch.load(filename, map_location=lambda storage, loc: storage)
     model.load_state_dict(checkpoint[tag])
 
 
@@ -87,6 +165,50 @@ def load_model_states_without_dataparallel(model, filename):
     model.load_state_dict(new_state_dict)
 
 
+def load_model_weights(model, filename):
+    """Loads the model states of a checkpoint or, without copying them, of an inference weights file."""
+    assert os.path.exists(filename)
+    if is_inference_weights(filename):
+        load_inference_weights(model, filename)
+    else:
+        load_model_states_from_checkpoint(model, filename, 'state_dict')
+
+
+def grow_state_dict(model, state_dict, old_size):
+    """Loads the states of a model trained with the first old_size words of the dictionary of model. In the
+    parameters sized by the vocabulary, the rows of the new words keep their initialization (the pretrained
+    embeddings, if any), except the output biases, which start at the lowest bias of the old words so that the new
+    words are not favored before fine-tuning. Returns the names of the grown parameters."""
+    own_state = model.state_dict()
+    grown = []
+    for name, value in list(state_dict.items()):
+        own_value = own_state.get(name)
+        if own_value is None or value.dim() == 0 or value.size(0) != old_size or own_value.size(0) == old_size \
+                or value.size()[1:] != own_value.size()[1:]:
+            continue
+        rows = own_value.clone()
+        rows[:old_size] = value
+        if name.endswith('out.bias'):
+            rows[old_size:] = value.min()
+        state_dict[name] = rows
+        grown.append(name)
+    model.load_state_dict(state_dict)
+    return grown
+
+
+def grow_optimizer_state(optimizer):
+    """Pads the per parameter state (e.g. the Adam moments) of the parameters grown by grow_state_dict with zeros
+    for the new rows, so that the state of the old rows is kept."""
+    for inner_optimizer in getattr(optimizer, 'optimizers', [optimizer]):
+        for param, state in inner_optimizer.state.items():
+            for key, value in state.items():
+                if torch.is_tensor(value) and value.dim() > 0 and value.size() != param.size() and \
+                        value.size()[1:] == param.size()[1:]:
+                    rows = value.new_zeros(param.size())
+                    rows[:value.size(0)] = value
+                    state[key] = rows
+
+
 def save_object(obj, filename):
     """Save an object into file."""
     with open(filename, 'wb') as output:
@@ -101,11 +223,8 @@ def load_object(filename):
 
 
 def tokenize_and_normalize(s):
-    """Tokenize and normalize string."""
-    token_list = []
-    tokens = wordpunct_tokenize(s.lower())
-    token_list.extend([x for x in tokens if not re.fullmatch('[' + string.punctuation + ']+', x)])
-    return token_list
+    """Tokenize and normalize string, see normalizer.wordpunct_terms."""
+    return normalizer.wordpunct_terms(s)
 
 
 def initialize_out_of_vocab_words(dimension):
@@ -149,6 +268,120 @@ def batchify(data, bsz):
     return batched_data
 
 
+def stratified_sample(batches, num_samples, key, seed):
+    """Returns a fixed sample of about num_samples batches in which every stratum of key keeps its share."""
+    if num_samples >= len(batches):
+        return batches
+    strata = OrderedDict()
+    for batch in batches:
+        strata.setdefault(key(batch), []).append(batch)
+    rng = random.Random(seed)
+    sample = []
+    for stratum in strata.values():
+        # every stratum is represented by at least one batch
+        size = max(1, int(round(num_samples * len(stratum) / len(batches))))
+        sample.extend(rng.sample(stratum, min(size, len(stratum))))
+    return sample
+
+
+def plan_shards(filename, num_shards):
+    """Splits a file into at most num_shards byte ranges that start and end at line boundaries."""
+    file_size = os.path.getsize(filename)
+    boundaries = [0]
+    with open(filename, 'rb') as f:
+        for k in range(1, num_shards):
+            f.seek(max(file_size * k // num_shards, boundaries[-1]))
+            if f.tell() > 0:
+                f.readline()
+            boundaries.append(min(f.tell(), file_size))
+    boundaries.append(file_size)
+    return [(boundaries[k], boundaries[k + 1]) for k in range(num_shards) if boundaries[k] < boundaries[k + 1]]
+
+
+def read_lines(filename, start=0, end=None):
+    """Yields the stripped non-empty lines of a file that start within the byte range [start, end)."""
+    with open(filename, 'rb') as f:
+        f.seek(start)
+        while end is None or f.tell() < end:
+            line = f.readline()
+            if not line:
+                break
+            line = line.decode('utf-8').strip()
+            if line:
+                yield line
+
+
+def prefetch(iterable, size):
+    """Iterates over an iterable in a background thread, keeping up to size items ready in advance."""
+    buffer = queue.Queue(size)
+    done = object()
+    errors = []
+
+    def produce():
+        try:
+            for item in iterable:
+                buffer.put(item)
+        except Exception as e:
+            errors.append(e)
+        buffer.put(done)
+
+    thread = threading.Thread(target=produce)
+    thread.daemon = True
+    thread.start()
+    item = buffer.get()
+    while item is not done:
+        yield item
+        item = buffer.get()
+    if errors:
+        raise errors[0]
+
+
+def shard_batches(batches, rank, world_size):
+    """Returns the batches of a process of distributed training, every process gets the same number of batches."""
+    num_batches = len(batches) // world_size
+    return batches[rank:num_batches * world_size:world_size]
+
+
+def collective_tensor(value, dtype):
+    """Returns a one element tensor for the collectives of distributed training, on the current CUDA device with the
+    nccl backend, which only communicates CUDA tensors, and on the CPU otherwise."""
+    device = torch.device('cuda', torch.cuda.current_device()) if dist.get_backend() == 'nccl' else 'cpu'
+    return torch.tensor([value], dtype=dtype, device=device)
+
+
+def broadcast_flag(flag, src=0):
+    """Returns the value of a boolean flag on process src to every process of distributed training."""
+    flag = collective_tensor(int(flag), torch.long)
+    dist.broadcast(flag, src)
+    return bool(flag[0].item())
+
+
+def all_reduce_sum(value):
+    """Returns the sum of a number over every process of distributed training."""
+    value = collective_tensor(value, torch.double)
+    dist.all_reduce(value)
+    return value[0].item()
+
+
+def clip_grad_norm(parameters, max_norm):
+    """Rescales the gradients of parameters so that their total norm is at most max_norm, sparse gradients included."""
+    grads = []
+    for param in parameters:
+        if param.grad is not None:
+            if param.grad.is_sparse:
+                # duplicate rows of an uncoalesced sparse gradient would be counted separately
+                param.grad = param.grad.coalesce()
+                grads.append(param.grad._values())
+            else:
+                grads.append(param.grad.data)
+    total_norm = math.sqrt(sum(grad.norm().item() ** 2 for grad in grads))
+    clip_coef = max_norm / (total_norm + 1e-6)
+    if clip_coef < 1:
+        for grad in grads:
+            grad.mul_(clip_coef)
+    return total_norm
+
+
 def repackage_hidden(h):
     """Wraps hidden states in new Variables, to detach them from their history."""
     if type(h) == Variable:
@@ -173,23 +406,9 @@ def show_progress(since, percent):
     return '%s (- %s)' % (convert_to_minutes(s), convert_to_minutes(rs))
 
 
-def save_plot(points, filepath, filetag, epoch):
-    """Generate and save the plot"""
-    path_prefix = os.path.join(filepath, filetag + '_loss_plot_')
-    path = path_prefix + 'epoch_{}.png'.format(epoch)
-    fig, ax = plt.subplots()
-    loc = ticker.MultipleLocator(base=0.2)  # this locator puts ticks at regular intervals
-    ax.yaxis.set_major_locator(loc)
-    ax.plot(points)
-    fig.savefig(path)
-    plt.close(fig)  # close the figure
-    for f in glob.glob(path_prefix + '*'):
-        if f != path:
-            os.remove(f)
-
-
 def show_plot(points):
     """Generates plots"""
+    plt, ticker = load_pyplot()
     plt.figure()
     fig, ax = plt.subplots()
     loc = ticker.MultipleLocator(base=0.2)  # this locator puts ticks at regular intervals
@@ -253,8 +472,31 @@ def session_to_tensor(sessions, dictionary):
     return Variable(session_tensor), Variable(length)
 
 
+def pages_to_tensors(pages, dictionary, max_query_length, max_title_length):
+    """Convert a batch of result pages to tensors of session queries, document titles, clicks and document mask."""
+    max_session_length = max(len(page.queries) for page in pages)
+    max_documents = max(len(page.documents) for page in pages)
+    session_tensor = torch.LongTensor(len(pages), max_session_length, max_query_length).zero_()
+    last_query = torch.LongTensor(len(pages))
+    document_tensor = torch.LongTensor(len(pages), max_documents, max_title_length).zero_()
+    clicks = torch.zeros(len(pages), max_documents)
+    document_mask = torch.zeros(len(pages), max_documents)
+    for i in range(len(pages)):
+        for j in range(len(pages[i].queries)):
+            session_tensor[i, j] = sentence_to_tensor(pages[i].queries[j], max_query_length, dictionary)
+        last_query[i] = len(pages[i].queries) - 1
+        for j in range(len(pages[i].documents)):
+            document_tensor[i, j] = sentence_to_tensor(pages[i].documents[j], max_title_length, dictionary)
+            clicks[i, j] = pages[i].clicks[j]
+            document_mask[i, j] = 1
+
+    return Variable(session_tensor), Variable(last_query), Variable(document_tensor), Variable(clicks), Variable(
+        document_mask)
+
+
 def show_attention_plot(input_sentence, output_words, attentions):
     """Shows attention as a graphical plot"""
+    plt, ticker = load_pyplot()
     # Set up figure with colorbar
     fig = plt.figure()
     ax = fig.add_subplot(111)
@@ -274,6 +516,7 @@ def show_attention_plot(input_sentence, output_words, attentions):
 
 def save_attention_plot(input_sentence, output_words, attentions, filename):
     """Save attention as a graphical plot"""
+    plt, ticker = load_pyplot()
     # Set up figure with colorbar
     fig = plt.figure()
     ax = fig.add_subplot(111)
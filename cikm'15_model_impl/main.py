@@ -8,80 +8,142 @@
 
 import util, helper, data, train, os
 import torch
-from torch import optim
+from optimizer import create_optimizer
 from seq2seq import Sequence2Sequence
 
-args = util.get_args()
-# Set the random seed manually for reproducibility.
-torch.manual_seed(args.seed)
-if torch.cuda.is_available():
-    if not args.cuda:
-        print("WARNING: You have a CUDA device, so you should probably run with --cuda")
+
+def main():
+    args = util.get_args()
+    if args.num_interop_threads:
+        # only possible before the first parallel operation of the process
+        torch.set_num_interop_threads(args.num_interop_threads)
+    if args.distributed:
+        # rank, world size and master address are given by torchrun through environment variables
+        torch.distributed.init_process_group(args.dist_backend, init_method='env://')
+        args.rank = torch.distributed.get_rank()
+        args.world_size = torch.distributed.get_world_size()
+        if args.cuda:
+            # one GPU per process, the collectives of nccl run on the current device
+            torch.cuda.set_device(int(os.environ.get('LOCAL_RANK', 0)))
+        torch.set_num_threads(args.num_threads)
     else:
-        torch.cuda.manual_seed(args.seed)
+        args.rank = 0
+        args.world_size = 1
+        # a single process uses every core, unless a tuned config sets its number of threads
+        if args.tuned_config:
+            torch.set_num_threads(args.num_threads)
+    # Set the random seed manually for reproducibility.
+    torch.manual_seed(args.seed)
+    if torch.cuda.is_available():
+        if not args.cuda:
+            print("WARNING: You have a CUDA device, so you should probably run with --cuda")
+        else:
+            torch.cuda.manual_seed(args.seed)
 
-###############################################################################
-# Load data
-###############################################################################
+    ###############################################################################
+    # Load data
+    ###############################################################################
 
-dictionary = data.Dictionary()
-train_corpus = data.Corpus(args.data, 'session_train.txt', dictionary, args.max_length)
-dev_corpus = data.Corpus(args.data, 'session_dev.txt', dictionary, args.max_length)
-print('Train set size = ', len(train_corpus))
-print('Max session length in train corpus = ', train_corpus.max_session_length)
-print('Dev set size = ', len(dev_corpus))
-print('Max session length in dev corpus = ', dev_corpus.max_session_length)
-print('Vocabulary size = ', len(dictionary))
-
-# save the dictionary object to use during testing
-helper.save_object(dictionary, args.save_path + 'dictionary.p')
-
-# embeddings_index = helper.load_word_embeddings(args.word_vectors_directory, args.word_vectors_file)
-# helper.save_word_embeddings('../data/glove/', 'glove.840B.300d.s2s.txt', embeddings_index, dictionary.idx2word)
-
-embeddings_index = helper.load_word_embeddings(args.word_vectors_directory, 'glove.840B.300d.s2s.txt')
-print('Number of OOV words = ', len(dictionary) - len(embeddings_index))
-
-# Splitting the data in batches
-train_batches = helper.batchify(train_corpus.data, args.batch_size)
-print('Number of train batches = ', len(train_batches))
-dev_batches = helper.batchify(dev_corpus.data, args.batch_size)
-print('Number of dev batches = ', len(dev_batches))
-
-# for session in train_batches[0]:
-#    print(session.queries)
-
-# ###############################################################################
-# # Build the model
-# ###############################################################################
-
-model = Sequence2Sequence(dictionary, embeddings_index, args)
-optimizer = optim.Adam(filter(lambda p: p.requires_grad, model.parameters()), args.lr)
-best_loss = -1
-
-# for training on multiple GPUs. use CUDA_VISIBLE_DEVICES=0,1 to specify which GPUs to use
-# if 'CUDA_VISIBLE_DEVICES' in os.environ:
-#     cuda_visible_devices = [int(x) for x in os.environ['CUDA_VISIBLE_DEVICES'].split(',')]
-#     model = torch.nn.DataParallel(model, device_ids=cuda_visible_devices)
-if args.cuda:
-    model = model.cuda()
-
-if args.resume:
-    if os.path.isfile(args.resume):
-        print("=> loading checkpoint '{}'".format(args.resume))
-        checkpoint = torch.load(args.resume)
-        args.start_epoch = checkpoint['epoch']
-        best_loss = checkpoint['best_loss']
-        model.load_state_dict(checkpoint['state_dict'])
-        optimizer.load_state_dict(checkpoint['optimizer'])
-        print("=> loaded checkpoint '{}' (epoch {})"
-              .format(args.resume, checkpoint['epoch']))
+    if args.warm_start:
+        # the words of the warm started model keep their indices, the new words of the corpus are appended
+        dictionary = helper.load_object(os.path.join(os.path.dirname(args.warm_start), 'dictionary.p'))
+        # the words of the new sessions are normalized the way the dictionary was built
+        assert getattr(dictionary, 'normalizer', 'split') == args.normalizer, \
+            'the warm started dictionary was built with --normalizer %s' % getattr(dictionary, 'normalizer', 'split')
     else:
-        print("=> no checkpoint found at '{}'".format(args.resume))
+        dictionary = data.Dictionary(args.normalizer)
+    old_vocab_size = len(dictionary)
+    train_corpus = data.Corpus(args.data, 'session_train.txt', dictionary, args.max_length,
+                               session_window=args.session_window, normalizer_cache_size=args.normalizer_cache_size)
+    dev_corpus = data.Corpus(args.data, 'session_dev.txt', dictionary, args.max_length,
+                             session_window=args.session_window, normalizer_cache_size=args.normalizer_cache_size)
+    print('Train set size = ', len(train_corpus))
+    print('Max session length in train corpus = ', train_corpus.max_session_length)
+    print('Dev set size = ', len(dev_corpus))
+    print('Max session length in dev corpus = ', dev_corpus.max_session_length)
+    print('Vocabulary size = ', len(dictionary))
+
+    # save the dictionary object to use during testing
+    if args.rank == 0:
+        helper.save_object(dictionary, args.save_path + 'dictionary.p')
+
+    # embeddings_index = helper.load_word_embeddings(args.word_vectors_directory, args.word_vectors_file)
+    # helper.save_word_embeddings('../data/glove/', 'glove.840B.300d.s2s.txt', embeddings_index, dictionary.idx2word)
+
+    embeddings_index = helper.load_word_embeddings(args.word_vectors_directory, 'glove.840B.300d.s2s.txt')
+    if args.warm_start and len(dictionary) > old_vocab_size and \
+            os.path.isfile(os.path.join(args.word_vectors_directory, args.word_vectors_file)):
+        # the vectors of the new words are read from the full file, which the filtered one may not cover
+        new_words = set(dictionary.idx2word[old_vocab_size:]) - set(embeddings_index)
+        embeddings_index.update(helper.load_word_embeddings(args.word_vectors_directory, args.word_vectors_file,
+                                                            new_words))
+    print('Number of OOV words = ', len(dictionary) - len(embeddings_index))
+
+    # Splitting the data in batches
+    train_batches = helper.batchify(train_corpus.data, args.batch_size)
+    if args.distributed:
+        # every process trains on its own share of the batches, gradients are averaged across processes
+        train_batches = helper.shard_batches(train_batches, args.rank, args.world_size)
+    print('Number of train batches = ', len(train_batches))
+    dev_batches = helper.batchify(dev_corpus.data, args.batch_size)
+    print('Number of dev batches = ', len(dev_batches))
+
+    # for session in train_batches[0]:
+    #    print(session.queries)
+
+    # ###############################################################################
+    # # Build the model
+    # ###############################################################################
+
+    model = Sequence2Sequence(dictionary, embeddings_index, args)
+    optimizer = create_optimizer(model, args)
+    best_loss = -1
+    checkpoint = None
+
+    # for training on multiple GPUs. use CUDA_VISIBLE_DEVICES=0,1 to specify which GPUs to use
+    # if 'CUDA_VISIBLE_DEVICES' in os.environ:
+    #     cuda_visible_devices = [int(x) for x in os.environ['CUDA_VISIBLE_DEVICES'].split(',')]
+    #     model = torch.nn.DataParallel(model, device_ids=cuda_visible_devices)
+    if args.cuda:
+        model = model.cuda()
+
+    if args.warm_start:
+        # a new training run from the weights and the optimizer state of the checkpoint, grown to the new words
+        assert not args.resume, 'a warm start begins a new training run, it cannot resume one'
+        print("=> warm starting from '{}' with {} new words".format(args.warm_start, len(dictionary) - old_vocab_size))
+        warm_start = torch.load(args.warm_start, map_location=lambda storage, loc: storage)
+        helper.grow_state_dict(model, warm_start['state_dict'], old_vocab_size)
+        optimizer.load_state_dict(warm_start['optimizer'])
+        helper.grow_optimizer_state(optimizer)
+
+    if args.resume:
+        if os.path.isfile(args.resume):
+            print("=> loading checkpoint '{}'".format(args.resume))
+            checkpoint = torch.load(args.resume)
+            model.load_state_dict(checkpoint['state_dict'])
+            optimizer.load_state_dict(checkpoint['optimizer'])
+            print("=> loaded checkpoint '{}' (epoch {}, batch {})"
+                  .format(args.resume, checkpoint['epoch'], checkpoint.get('batch', 0)))
+        else:
+            print("=> no checkpoint found at '{}'".format(args.resume))
+
+    # ###############################################################################
+    # # Train the model
+    # ###############################################################################
+
+    # wrapped after resuming, so that the checkpoint keys match the plain model
+    if args.distributed:
+        model = torch.nn.parallel.DistributedDataParallel(model, device_ids=[torch.cuda.current_device()]
+                                                          if args.cuda else None)
+
+    trainer = train.Train(model, optimizer, dictionary, embeddings_index, args, best_loss)
+    # restores the early stopping state, the loss history and the random number generators of the checkpoint
+    start_batch = 0
+    if checkpoint:
+        args.start_epoch, start_batch = trainer.load_state(checkpoint)
+    trainer.train_epochs(train_batches, dev_batches, args.start_epoch, args.epochs, start_batch)
 
-# ###############################################################################
-# # Train the model
-# ###############################################################################
 
-train = train.Train(model, optimizer, dictionary, embeddings_index, args, best_loss)
-train.train_epochs(train_batches, dev_batches, args.start_epoch, args.epochs)
+if __name__ == '__main__':
+    # the --async_validation process is spawned and imports this module again, which must not train
+    main()
@@ -0,0 +1,86 @@
+###############################################################################
+# Author: agent
+# Project: Context-aware Query Suggestion
+# Date Created: 10/18/2026
+#
+# File Description: This script is the entry point of the click prediction
+# pipeline. It trains the click model on click_train.txt, validates it on
+# click_dev.txt and evaluates the best model on click_test.txt if available.
+###############################################################################
+
+import util, helper, data, train, os
+import torch
+from optimizer import create_optimizer
+from seq2seq import Sequence2Sequence
+from click_model import ClickModel
+
+
+def main():
+    args = util.get_args()
+    # Set the random seed manually for reproducibility.
+    torch.manual_seed(args.seed)
+    if torch.cuda.is_available():
+        if not args.cuda:
+            print("WARNING: You have a CUDA device, so you should probably run with --cuda")
+        else:
+            torch.cuda.manual_seed(args.seed)
+
+    ###############################################################################
+    # Load data
+    ###############################################################################
+
+    # the click model shares the vocabulary of the suggestion model
+    dictionary = helper.load_object(args.save_path + 'dictionary.p')
+    train_corpus = data.ClickCorpus(args.data, 'click_train.txt', dictionary, args.max_length, args.max_title_length,
+                                    args.max_documents, args.normalizer_cache_size)
+    dev_corpus = data.ClickCorpus(args.data, 'click_dev.txt', dictionary, args.max_length, args.max_title_length,
+                                  args.max_documents, args.normalizer_cache_size)
+    print('Train set size = ', len(train_corpus))
+    print('Dev set size = ', len(dev_corpus))
+
+    embeddings_index = helper.load_word_embeddings(args.word_vectors_directory, 'glove.840B.300d.s2s.txt')
+
+    # Splitting the data in batches, the remainder of the dev set is validated as well
+    train_batches = helper.batchify({0: train_corpus.data}, args.batch_size)
+    print('Number of train batches = ', len(train_batches))
+    dev_batches = [dev_corpus.data[i:i + args.batch_size] for i in range(0, len(dev_corpus), args.batch_size)]
+    print('Number of dev batches = ', len(dev_batches))
+
+    ###############################################################################
+    # Build the model
+    ###############################################################################
+
+    session_model = Sequence2Sequence(dictionary, embeddings_index, args)
+    # start from the encoders of the suggestion model when it has been trained
+    suggestion_checkpoint = args.checkpoint if args.checkpoint else args.save_path + 'model_best.pth.tar'
+    if os.path.isfile(suggestion_checkpoint):
+        print("=> loading encoders from '{}'".format(suggestion_checkpoint))
+        helper.load_model_states_from_checkpoint(session_model, suggestion_checkpoint, 'state_dict')
+    if args.freeze_encoders:
+        for param in session_model.parameters():
+            param.requires_grad = False
+
+    model = ClickModel(session_model, args)
+    if args.cuda:
+        model = model.cuda()
+    optimizer = create_optimizer(model, args)
+
+    ###############################################################################
+    # Train and evaluate the model
+    ###############################################################################
+
+    click_train = train.ClickTrain(model, optimizer, dictionary, args, -1)
+    click_train.train_epochs(train_batches, dev_batches, args.start_epoch, args.epochs)
+
+    if os.path.isfile(os.path.join(args.data, 'click_test.txt')):
+        test_corpus = data.ClickCorpus(args.data, 'click_test.txt', dictionary, args.max_length, args.max_title_length,
+                                       args.max_documents, args.normalizer_cache_size)
+        test_batches = [test_corpus.data[i:i + args.batch_size] for i in range(0, len(test_corpus), args.batch_size)]
+        helper.load_model_states_from_checkpoint(model, args.save_path + 'click_model_best.pth.tar', 'state_dict')
+        test_loss, test_perplexity = click_train.validate(test_batches)
+        print('test loss = %.4f, click perplexity = %.4f' % (test_loss, test_perplexity))
+
+
+if __name__ == '__main__':
+    # importable without training, like main.py
+    main()
@@ -11,6 +11,7 @@ import numpy as np
 import torch.nn as nn
 from torch.autograd import Variable
 import torch.nn.functional as F
+from common import step_profiler
 
 
 class EmbeddingLayer(nn.Module):
@@ -20,7 +21,8 @@ class EmbeddingLayer(nn.Module):
         """"Constructor of the class"""
         super(EmbeddingLayer, self).__init__()
         self.drop = nn.Dropout(config.dropout)
-        self.embedding = nn.Embedding(input_size, config.emsize)
+        # sparse gradients only hold the rows of the words of a batch, see optimizer.create_optimizer
+        self.embedding = nn.Embedding(input_size, config.emsize, sparse=config.sparse_embedding)
         # self.embedding.weight.requires_grad = False
 
     def forward(self, input_variable):
@@ -80,17 +82,60 @@ class Encoder(nn.Module):
             return Variable(weight.new(self.n_layers * num_directions, bsz, self.hidden_size).zero_())
 
 
+class OutputLayer(nn.Module):
+    """Projection of hidden states to vocabulary logits. The full layout is a linear layer (nhid x V); the tied
+    layout projects to the embedding size and reuses the input embedding matrix as output weights; the factorized
+    layout goes through a rank dimensional bottleneck, so that the vocabulary matrix is V x rank."""
+
+    def __init__(self, hidden_size, output_size, config, embedding=None):
+        """"Constructor of the class"""
+        super(OutputLayer, self).__init__()
+        self.layout = config.output_layer
+        self.projection = None
+        if self.layout == 'tied':
+            assert embedding is not None, 'the tied output layer needs the input embedding'
+            self.projection = nn.Linear(hidden_size, embedding.embedding_dim)
+            # the same parameter as the input embedding, so it is stored and updated once
+            self.weight = embedding.weight
+        elif self.layout == 'factorized':
+            self.projection = nn.Linear(hidden_size, config.output_rank, bias=False)
+            self.weight = nn.Parameter(torch.Tensor(output_size, config.output_rank))
+        else:
+            # the parameters are named as the ones of nn.Linear, so that earlier checkpoints still load
+            self.weight = nn.Parameter(torch.Tensor(output_size, hidden_size))
+        self.bias = nn.Parameter(torch.zeros(output_size))
+        if self.layout != 'tied':
+            # the initialization of nn.Linear
+            bound = 1 / self.weight.size(1) ** 0.5
+            nn.init.uniform_(self.weight, -bound, bound)
+            nn.init.uniform_(self.bias, -bound, bound)
+
+    def select_rows(self, rows):
+        """Returns the output weights and biases of a shortlist of words, which forward then scores instead of the
+        whole vocabulary."""
+        return self.weight.index_select(0, rows), self.bias.index_select(0, rows)
+
+    def forward(self, input, shortlist=None):
+        """"Defines the forward computation of the output layer. With shortlist, the logits of the words selected by
+        select_rows are returned, in their order."""
+        weight, bias = shortlist if shortlist is not None else (self.weight, self.bias)
+        with step_profiler.record('output_layer'):
+            if self.projection is not None:
+                input = self.projection(input)
+            return F.linear(input, weight, bias)
+
+
 class Decoder(nn.Module):
     """Decoder class of a sequence-to-sequence network"""
 
-    def __init__(self, input_size, hidden_size, output_size, config):
+    def __init__(self, input_size, hidden_size, output_size, config, embedding=None):
         """"Constructor of the class"""
         super(Decoder, self).__init__()
         self.config = config
         self.input_size = input_size
         self.hidden_size = hidden_size
         self.drop = nn.Dropout(self.config.dropout)
-        self.out = nn.Linear(hidden_size, output_size)
+        self.out = OutputLayer(hidden_size, output_size, config, embedding)
 
         if self.config.model in ['LSTM', 'GRU']:
             self.rnn = getattr(nn, self.config.model)(self.input_size, self.hidden_size, self.config.nlayers,
@@ -104,11 +149,31 @@ class Decoder(nn.Module):
             self.rnn = nn.RNN(self.input_size, self.hidden_size, self.config.nlayers, nonlinearity=nonlinearity,
                               batch_first=True, dropout=self.config.dropout)
 
-    def forward(self, input, hidden):
-        """"Defines the forward computation of the decoder"""
+    def forward(self, input, hidden, shortlist=None, disallowed=None):
+        """"Defines the forward computation of the decoder. With shortlist (see OutputLayer.select_rows), the
+        log-probabilities are normalized over the shortlisted words only, and with the disallowed mask (batch x
+        shortlist size) every row only over the words it allows."""
         output = input
         for i in range(self.config.nlayers):
             output, hidden = self.rnn(output, hidden)
             output = self.drop(output)
-        output = F.log_softmax(self.out(output.squeeze(1)))
+        scores = self.out(output.squeeze(1), shortlist)
+        if disallowed is not None:
+            scores = scores.masked_fill(disallowed, -float('inf'))
+        output = F.log_softmax(scores, dim=1)
         return output, hidden
+
+
+class ClickScorer(nn.Module):
+    """Bilinear scorer of candidate documents against a context vector, with a learned bias for every rank."""
+
+    def __init__(self, context_size, document_size, max_documents):
+        """"Constructor of the class"""
+        super(ClickScorer, self).__init__()
+        self.project = nn.Linear(context_size, document_size)
+        self.rank_bias = nn.Parameter(torch.zeros(max_documents))
+
+    def forward(self, context, documents):
+        """"Scores all the documents of a batch of result pages (batch x num_documents x document_size) at once"""
+        scores = torch.bmm(documents, self.project(context).unsqueeze(2)).squeeze(2)
+        return scores + self.rank_bias[:documents.size(1)].unsqueeze(0)
@@ -0,0 +1,203 @@
+###############################################################################
+# Author: agent
+# Project: Context-aware Query Suggestion
+# Date Created: 10/18/2026
+#
+# File Description: This script keeps training a model on the sessions
+# appended to live session logs. The new sessions are batched by length with
+# sessions replayed from the past, a bounded number of steps is taken after
+# every poll of the logs and the weights are published at a fixed cadence,
+# replacing the previous ones at once.
+###############################################################################
+
+import util, helper, data, train, optimizer, os, time
+from common import normalizer
+from common.streaming import LogTail, ReplayBuffer
+import torch
+from seq2seq import Sequence2Sequence
+
+
+class OnlineTrainer(object):
+    """Trains a model on the sessions read from the logs, every batch mixing new sessions with sessions of the same
+    length from the replay buffer, and publishes its weights and its online checkpoint."""
+
+    def __init__(self, trainer, tail, replay, config, steps=0, pending=None):
+        self.trainer = trainer
+        self.tail = tail
+        self.replay = replay
+        self.config = config
+        self.normalizer = normalizer.for_dictionary(trainer.dictionary, config.normalizer_cache_size)
+        # session length -> sessions read from the logs and not trained on yet, oldest first
+        self.pending = pending if pending is not None else {}
+        self.steps = steps
+        self.published_steps = steps
+        self.last_publish = time.time()
+        self.loss_total = 0
+
+    def session(self, line):
+        """Returns the session of a log line, None if it has too few queries."""
+        session = data.Session()
+        # the vocabulary is fixed while training online, new words are unknown
+        if session.form_session(line.split(':::'), self.trainer.dictionary, self.config.max_length, True,
+                                self.config.session_window, self.normalizer) == -1:
+            return None
+        return session
+
+    def seed_replay(self, filename):
+        for line in helper.read_lines(filename):
+            session = self.session(line)
+            if session is not None:
+                self.replay.add(session, len(session))
+        print('Replay buffer size = ', len(self.replay))
+
+    def num_pending(self):
+        return sum(len(sessions) for sessions in self.pending.values())
+
+    def read(self):
+        """Reads the new sessions of the logs and returns their number. Beyond --online_max_pending sessions, the
+        oldest sessions of the longest waiting lists go to the replay buffer without being trained on."""
+        lines = self.tail.poll()
+        for line in lines:
+            session = self.session(line)
+            if session is not None:
+                self.pending.setdefault(len(session), []).append(session)
+        overflow = self.num_pending() - self.config.online_max_pending
+        while overflow > 0:
+            length, sessions = max(self.pending.items(), key=lambda item: len(item[1]))
+            count = min(len(sessions), overflow)
+            for session in sessions[:count]:
+                self.replay.add(session, length)
+            del sessions[:count]
+            if not sessions:
+                del self.pending[length]
+            overflow -= count
+        return len(lines)
+
+    def train_steps(self):
+        """Takes up to --online_max_steps optimizer steps on batches of pending and replayed sessions of one length and
+        returns their number. The pending sessions of a length wait until they fill the new share of a batch."""
+        num_fresh = max(1, int(round(self.config.batch_size * (1 - self.config.replay_ratio))))
+        num_steps = 0
+        while num_steps < self.config.online_max_steps:
+            ready = [length for length, sessions in self.pending.items() if len(sessions) >= num_fresh]
+            if not ready:
+                break
+            # the length with the most waiting sessions goes first
+            length = max(ready, key=lambda length: len(self.pending[length]))
+            fresh = self.pending[length][:num_fresh]
+            del self.pending[length][:num_fresh]
+            if not self.pending[length]:
+                del self.pending[length]
+            batch = fresh + self.replay.sample(self.config.batch_size - num_fresh, length)
+            self.loss_total += self.trainer.train_step([batch])
+            for session in fresh:
+                self.replay.add(session, length)
+            num_steps += 1
+            self.steps += 1
+            if self.steps % self.config.print_every == 0:
+                print('%d steps, %d pending sessions, %d replayed sessions, loss %.4f' % (
+                    self.steps, self.num_pending(), len(self.replay), self.loss_total / self.config.print_every))
+                self.loss_total = 0
+        return num_steps
+
+    def publish(self):
+        """Replaces the published weights, which inference scripts read with --checkpoint, and queues the online
+        checkpoint, which training continues from after a restart."""
+        helper.save_inference_weights(self.trainer.local_model.state_dict(), self.config.online_dir + 'model.weights')
+        self.trainer.checkpoint_writer.save({'state_dict': self.trainer.local_model.state_dict(),
+                                             'optimizer': self.trainer.optimizer.state_dict(),
+                                             'offsets': self.tail.offsets,
+                                             'steps': self.steps,
+                                             'pending': pending_words(self.pending)},
+                                            self.config.online_dir + 'online.pth.tar')
+        print('published the weights after %d steps' % self.steps)
+        self.published_steps = self.steps
+        self.last_publish = time.time()
+
+    def run(self):
+        """Polls the logs and trains until interrupted, then publishes the last steps."""
+        try:
+            while True:
+                num_lines = self.read()
+                num_steps = self.train_steps()
+                if self.steps > self.published_steps and \
+                        time.time() - self.last_publish >= self.config.publish_every:
+                    self.publish()
+                if num_lines == 0 and num_steps == 0:
+                    time.sleep(self.config.poll_interval)
+        except KeyboardInterrupt:
+            print('online training stopped')
+        if self.steps > self.published_steps:
+            self.publish()
+        self.trainer.checkpoint_writer.wait()
+
+
+def pending_words(pending):
+    """Returns the words of the queries of the pending sessions by length, which the online checkpoint holds instead
+    of the pickled sessions, so that it is loaded as plain data."""
+    return {length: [session.queries for session in sessions] for length, sessions in pending.items()}
+
+
+def pending_sessions(queries):
+    """Returns the pending sessions given by pending_words as sessions."""
+    pending = {}
+    for length, sessions in queries.items():
+        for session_queries in sessions:
+            session = data.Session()
+            session.queries = session_queries
+            pending.setdefault(length, []).append(session)
+    return pending
+
+
+def load_online_state(model, optimizer, config):
+    """Loads the online checkpoint to continue online training, or the offline checkpoint to begin it. Returns the
+    log offsets, the number of steps and the pending sessions of the online checkpoint."""
+    filename = config.online_dir + 'online.pth.tar'
+    if os.path.isfile(filename):
+        state = torch.load(filename)
+        model.load_state_dict(state['state_dict'])
+        optimizer.load_state_dict(state['optimizer'])
+        print("=> continuing online training from '{}' ({} steps)".format(filename, state['steps']))
+        return state['offsets'], state['steps'], pending_sessions(state['pending'])
+
+    filename = config.checkpoint if config.checkpoint else config.save_path + 'model_best.pth.tar'
+    assert os.path.exists(filename)
+    if helper.is_inference_weights(filename):
+        # copied into the model, since the mapped weights are read-only
+        model.load_state_dict(helper.map_inference_weights(filename))
+    else:
+        checkpoint = torch.load(filename)
+        model.load_state_dict(checkpoint['state_dict'])
+        if 'optimizer' in checkpoint:
+            optimizer.load_state_dict(checkpoint['optimizer'])
+    print("=> starting online training from '{}'".format(filename))
+    return {}, 0, {}
+
+
+if __name__ == '__main__':
+    args = util.get_args()
+    args.rank, args.world_size, args.distributed = 0, 1, False
+    assert args.stream, 'the session log file or directory is given with --stream'
+    args.online_dir = os.path.join(args.online_dir if args.online_dir else args.save_path + 'online', '')
+    if not os.path.isdir(args.online_dir):
+        os.makedirs(args.online_dir)
+    torch.manual_seed(args.seed)
+    if args.cuda:
+        torch.cuda.manual_seed(args.seed)
+
+    dictionary = helper.load_object(args.save_path + 'dictionary.p')
+    # the pretrained embeddings are overwritten by the checkpoint, so they are not loaded here
+    model = Sequence2Sequence(dictionary, {}, args)
+    if args.cuda:
+        model = model.cuda()
+    optimizer = optimizer.create_optimizer(model, args)
+    offsets, steps, pending = load_online_state(model, optimizer, args)
+
+    trainer = train.Train(model, optimizer, dictionary, None, args, -1)
+    # Turn on training mode which enables dropout.
+    model.train()
+    online_trainer = OnlineTrainer(trainer, LogTail(args.stream, offsets), ReplayBuffer(args.replay_size, args.seed),
+                                   args, steps, pending)
+    if args.replay_file:
+        online_trainer.seed_replay(args.replay_file)
+    online_trainer.run()
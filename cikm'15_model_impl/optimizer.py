@@ -0,0 +1,59 @@
+###############################################################################
+# Author: agent
+# Project: Context-aware Query Suggestion
+# Date Created: 10/18/2026
+#
+# File Description: This script creates the optimizer of a model. With sparse
+# embedding gradients, the embedding rows are updated by SparseAdam and the
+# rest of the parameters by Adam.
+###############################################################################
+
+import torch.nn as nn
+from torch import optim
+
+
+class SplitOptimizer(object):
+    """Updates the parameters with sparse gradients by SparseAdam and all the other parameters by Adam."""
+
+    def __init__(self, sparse_parameters, dense_parameters, lr):
+        self.optimizers = []
+        if sparse_parameters:
+            self.optimizers.append(optim.SparseAdam(sparse_parameters, lr))
+        if dense_parameters:
+            self.optimizers.append(optim.Adam(dense_parameters, lr))
+
+    @property
+    def param_groups(self):
+        return [group for optimizer in self.optimizers for group in optimizer.param_groups]
+
+    def zero_grad(self):
+        for optimizer in self.optimizers:
+            optimizer.zero_grad()
+
+    def step(self):
+        for optimizer in self.optimizers:
+            optimizer.step()
+
+    def state_dict(self):
+        return {'optimizers': [optimizer.state_dict() for optimizer in self.optimizers]}
+
+    def load_state_dict(self, state_dict):
+        assert len(state_dict['optimizers']) == len(self.optimizers), 'checkpoint of a different optimizer'
+        for optimizer, optimizer_state in zip(self.optimizers, state_dict['optimizers']):
+            optimizer.load_state_dict(optimizer_state)
+
+
+def sparse_parameters(model):
+    """Returns the trainable weights of the embedding layers of a model that produce sparse gradients."""
+    return [module.weight for module in model.modules()
+            if isinstance(module, nn.Embedding) and module.sparse and module.weight.requires_grad]
+
+
+def create_optimizer(model, config):
+    """Returns Adam over the trainable parameters of a model, split with SparseAdam for sparse embeddings."""
+    parameters = [param for param in model.parameters() if param.requires_grad]
+    if not config.sparse_embedding:
+        return optim.Adam(parameters, config.lr)
+    sparse = sparse_parameters(model)
+    sparse_ids = set(id(param) for param in sparse)
+    return SplitOptimizer(sparse, [param for param in parameters if id(param) not in sparse_ids], config.lr)
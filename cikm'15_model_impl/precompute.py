@@ -0,0 +1,49 @@
+###############################################################################
+# Author: agent
+# Project: Context-aware Query Suggestion
+# Date Created: 10/18/2026
+#
+# File Description: This script precomputes suggestions for the most frequent
+# contexts of the training sessions and saves them as a cache snapshot.
+###############################################################################
+
+import util, cache, suggest, os, time
+from collections import Counter
+
+
+def mine_head_contexts(filename, suggester, top_n):
+    """Counts the context keys the suggester sees while walking each session and returns the top_n most frequent."""
+    assert os.path.exists(filename)
+
+    counts = Counter()
+    with open(filename, 'r') as f:
+        for line in f:
+            queries = line.strip().split(':::')
+            for i in range(1, len(queries) + 1):
+                key = suggester.context_key(queries[:i])
+                if key:
+                    counts[key] += 1
+    return counts.most_common(top_n)
+
+
+args = util.get_args()
+
+suggestion_cache = cache.SuggestionCache(args.cache_size * 1024 * 1024, args.cache_ttl)
+suggester = suggest.load_suggester(args, suggestion_cache)
+
+head_contexts = mine_head_contexts(os.path.join(args.data, 'session_train.txt'), suggester, args.top_n_contexts)
+print('Number of head contexts = ', len(head_contexts))
+
+start = time.time()
+keys = [key for key, count in head_contexts]
+suggestions = []
+for batch_start in range(0, len(keys), args.batch_size):
+    suggestions.extend(suggester.generate(keys[batch_start:batch_start + args.batch_size]))
+print('Suggestions generated in %.2f seconds' % (time.time() - start))
+
+# insert the least frequent contexts first, so the most frequent ones are evicted last
+for key, generated in reversed(list(zip(keys, suggestions))):
+    suggestion_cache.put(key, generated)
+suggestion_cache.save(args.cache_snapshot)
+print('Number of cached contexts = ', len(suggestion_cache))
+print('Size of the cache (in bytes) = ', suggestion_cache.num_bytes)
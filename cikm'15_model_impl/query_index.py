@@ -0,0 +1,46 @@
+###############################################################################
+# Author: agent
+# Project: Context-aware Query Suggestion
+# Date Created: 10/18/2026
+#
+# File Description: This script encodes every distinct query of the corpus
+# with the query encoder and stores the vectors in a vector index, see
+# common/vector_index.py.
+###############################################################################
+
+import util, helper, suggest, os, time, torch
+import numpy as np
+from common import vector_index
+from torch.autograd import Variable
+
+
+def encode_queries(model, dictionary, config, queries):
+    """Returns the unit-length query encoder vectors of a list of queries as a float32 matrix."""
+    unknown = dictionary.word2idx[dictionary.unknown_token]
+    # queries are always padded to the maximum query length so that a vector does not depend on the batch
+    batch_queries = torch.LongTensor(len(queries), config.max_length + 1).zero_()
+    for i in range(len(queries)):
+        terms = queries[i].split()[:config.max_length] + [dictionary.end_token]
+        batch_queries[i, :len(terms)] = torch.LongTensor([dictionary.word2idx.get(term, unknown) for term in terms])
+    batch_queries = Variable(batch_queries)
+    if config.cuda:
+        batch_queries = batch_queries.cuda()
+
+    with torch.no_grad():
+        vectors = model.encode_queries(batch_queries).cpu().numpy().astype(np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+if __name__ == '__main__':
+    args = util.get_args()
+    suggester = suggest.load_suggester(args)
+
+    queries = vector_index.unique_queries([os.path.join(args.data, 'session_train.txt'),
+                                           os.path.join(args.data, 'session_dev.txt')], args.max_length,
+                                          suggester.normalizer)
+    print('Number of unique queries = ', len(queries))
+
+    start = time.time()
+    vector_index.build_index(lambda batch: encode_queries(suggester.model, suggester.dictionary, args, batch),
+                             args.nhid_query, args, queries)
+    print('Query index built in %s' % helper.convert_to_minutes(time.time() - start))
@@ -10,6 +10,7 @@
 import torch, helper
 import torch.nn as nn
 from torch.autograd import Variable
+from common import step_profiler
 from nn_layer import EmbeddingLayer, Encoder, Decoder
 
 
@@ -22,10 +23,14 @@ class Sequence2Sequence(nn.Module):
         self.dictionary = dictionary
         self.embedding_index = embedding_index
         self.config = args
+        # the tied output weights would receive dense gradients, which SparseAdam cannot apply
+        assert not (self.config.sparse_embedding and self.config.output_layer == 'tied'), \
+            'a tied output layer cannot be used with sparse embedding gradients'
         self.embedding = EmbeddingLayer(len(self.dictionary), self.config)
         self.query_encoder = Encoder(self.config.emsize, self.config.nhid_query, self.config)
         self.session_encoder = Encoder(self.config.nhid_query, self.config.nhid_session, self.config)
-        self.decoder = Decoder(self.config.emsize, self.config.nhid_session, len(self.dictionary), self.config)
+        self.decoder = Decoder(self.config.emsize, self.config.nhid_session, len(self.dictionary), self.config,
+                               self.embedding.embedding)
 
         # Initializing the weight parameters for the embedding layer.
         self.embedding.init_embedding_weights(self.dictionary, self.embedding_index, self.config.emsize)
@@ -33,8 +38,8 @@ class Sequence2Sequence(nn.Module):
     @staticmethod
     def compute_loss(logits, target, seq_idx, length):
         # logits: batch x vocab_size, target: batch x 1
-        losses = -torch.gather(logits, dim=1, index=target.unsqueeze(1))
-        # mask: batch x 1
+        losses = -torch.gather(logits, dim=1, index=target.unsqueeze(1)).squeeze(1)
+        # losses, mask: batch
         mask = helper.mask(length, seq_idx)
         losses = losses * mask.float()
         num_non_zero_elem = torch.nonzero(mask.data).size()
@@ -44,24 +49,42 @@ class Sequence2Sequence(nn.Module):
             loss = losses.sum() / num_non_zero_elem[0]
         return loss
 
-    def forward(self, batch_session, length):
-        """"Defines the forward computation of the question classifier."""
-        embedded_input = self.embedding(batch_session.view(-1, batch_session.size(-1)))
-        if self.config.model == 'LSTM':
-            encoder_hidden, encoder_cell = self.query_encoder.init_weights(embedded_input.size(0))
-            output, hidden = self.query_encoder(embedded_input, (encoder_hidden, encoder_cell))
-        else:
-            encoder_hidden = self.query_encoder.init_weights(embedded_input.size(0))
-            output, hidden = self.query_encoder(embedded_input, encoder_hidden)
+    def encode_queries(self, batch_queries, encoding_cache=None):
+        """Encodes a batch of queries and returns the last output of the query encoder for each of them. Repeated
+        queries are encoded once and share the output, so their gradients add up; with encoding_cache, cached
+        queries are not encoded at all."""
+        if encoding_cache is not None:
+            return encoding_cache.encode(batch_queries, lambda rows: (self.run_query_encoder(rows),))[0]
+        unique_queries, inverse = torch.unique(batch_queries, dim=0, return_inverse=True)
+        if unique_queries.size(0) < batch_queries.size(0):
+            return self.run_query_encoder(unique_queries).index_select(0, inverse)
+        return self.run_query_encoder(batch_queries)
+
+    def run_query_encoder(self, batch_queries):
+        """Runs the query encoder on every query of a batch and returns its last output for each of them."""
+        with step_profiler.record('embedding'):
+            embedded_input = self.embedding(batch_queries)
+        with step_profiler.record('encoder'):
+            if self.config.model == 'LSTM':
+                encoder_hidden, encoder_cell = self.query_encoder.init_weights(embedded_input.size(0))
+                output, hidden = self.query_encoder(embedded_input, (encoder_hidden, encoder_cell))
+            else:
+                encoder_hidden = self.query_encoder.init_weights(embedded_input.size(0))
+                output, hidden = self.query_encoder(embedded_input, encoder_hidden)
 
         if self.config.bidirection:
             output = torch.div(
                 torch.add(output[:, :, 0:self.config.nhid_query],
                           output[:, :, self.config.nhid_query:2 * self.config.nhid_query]), 2)
 
-        session_input = output[:, -1, :].contiguous().view(batch_session.size(0), batch_session.size(1), -1)
-        # session level encoding
-        sess_hidden = self.session_encoder.init_weights(session_input.size(0))
+        return output[:, -1, :].contiguous()
+
+    def encode_session(self, session_input, sess_hidden=None, return_state=False):
+        """Runs the session encoder, from sess_hidden if given, and returns its hidden and cell states after every
+        query of the session. With return_state, the state of the session encoder after the last query is returned
+        as well, which continues the session in a later call."""
+        if sess_hidden is None:
+            sess_hidden = self.session_encoder.init_weights(session_input.size(0))
         hidden_states, cell_states = [], []
         for idx in range(session_input.size(1)):
             sess_output, sess_hidden = self.session_encoder(session_input[:, idx, :].unsqueeze(1), sess_hidden)
@@ -74,8 +97,55 @@ class Sequence2Sequence(nn.Module):
 
         hidden_states = torch.stack(hidden_states, 2).squeeze(0)
         cell_states = torch.stack(cell_states, 2).squeeze(0)
-        hidden_states = hidden_states[:, :-1, :].contiguous().view(-1, hidden_states.size(-1)).unsqueeze(0)
-        cell_states = cell_states[:, :-1, :].contiguous().view(-1, cell_states.size(-1)).unsqueeze(0)
+        if return_state:
+            return hidden_states, cell_states, sess_hidden
+        return hidden_states, cell_states
+
+    def decode_step(self, input_variable, decoder_hidden, shortlist=None, disallowed=None):
+        """Feeds one token per sequence to the decoder and returns the log-probabilities of the next token, over the
+        words of shortlist if given (see OutputLayer.select_rows) that the disallowed mask leaves to each sequence."""
+        with step_profiler.record('embedding'):
+            embedded_decoder_input = self.embedding(input_variable).unsqueeze(1)
+        with step_profiler.record('decoder'):
+            return self.decoder(embedded_decoder_input, decoder_hidden, shortlist, disallowed)
+
+    def score_queries(self, decoder_hidden, queries, length):
+        """Returns the log-likelihood of each query given the decoder states it is generated from."""
+        input_variable = Variable(torch.LongTensor(queries.size(0)).fill_(
+            self.dictionary.word2idx[self.dictionary.start_token]))
+        if self.config.cuda:
+            input_variable = input_variable.cuda()
+
+        log_likelihood = 0
+        for idx in range(queries.size(1)):
+            if idx != 0:
+                input_variable = queries[:, idx - 1]
+            decoder_output, decoder_hidden = self.decode_step(input_variable, decoder_hidden)
+            log_probs = torch.gather(decoder_output, dim=1, index=queries[:, idx].unsqueeze(1)).squeeze(1)
+            log_likelihood += log_probs * helper.mask(length, idx).float()
+        return log_likelihood
+
+    @staticmethod
+    def compute_token_loss(logits, target, seq_idx, length):
+        """Returns the summed loss of the target tokens at position seq_idx and their number."""
+        losses = -torch.gather(logits, dim=1, index=target.unsqueeze(1)).squeeze(1)
+        mask = helper.mask(length, seq_idx).float()
+        return (losses * mask).sum(), mask.sum()
+
+    def forward(self, batch_session, length, token_sum=False, session_state=None, return_state=False):
+        """"Defines the forward computation of the question classifier. With token_sum, returns the summed loss of
+        the target tokens and their number instead of the sum of the per position mean losses. The session encoder
+        starts from session_state if given. With return_state, its state after the last but one query is returned
+        last; the next chunk of the session starts with the last query and continues from that state."""
+        # the last query is only a target, so the state after it is never used
+        context_session = batch_session[:, :-1, :].contiguous()
+        output = self.encode_queries(context_session.view(-1, context_session.size(-1)))
+        session_input = output.view(context_session.size(0), context_session.size(1), -1)
+        # session level encoding
+        with step_profiler.record('session_encoder'):
+            hidden_states, cell_states, session_state = self.encode_session(session_input, session_state, True)
+        hidden_states = hidden_states.contiguous().view(-1, hidden_states.size(-1)).unsqueeze(0)
+        cell_states = cell_states.contiguous().view(-1, cell_states.size(-1)).unsqueeze(0)
 
         decoder_input = batch_session[:, 1:, :].contiguous().view(-1, batch_session.size(-1))
         target_length = length[:, 1:].contiguous().view(-1)
@@ -88,13 +158,22 @@ class Sequence2Sequence(nn.Module):
 
         # Initialize hidden states of decoder with the last hidden states of the session encoder
         decoder_hidden = (hidden_states, cell_states)
-        loss = 0
-        for idx in range(decoder_input.size(1)):
-            if idx != 0:
-                input_variable = decoder_input[:, idx - 1]
-            embedded_decoder_input = self.embedding(input_variable).unsqueeze(1)
-            decoder_output, decoder_hidden = self.decoder(embedded_decoder_input, decoder_hidden)
-            target_variable = decoder_input[:, idx]
-            loss += self.compute_loss(decoder_output, target_variable, idx, target_length)
+        loss, num_tokens = 0, 0
+        with step_profiler.record('decoder_loop'):
+            for idx in range(decoder_input.size(1)):
+                if idx != 0:
+                    input_variable = decoder_input[:, idx - 1]
+                decoder_output, decoder_hidden = self.decode_step(input_variable, decoder_hidden)
+                target_variable = decoder_input[:, idx]
+                with step_profiler.record('loss'):
+                    if token_sum:
+                        token_loss, tokens = self.compute_token_loss(decoder_output, target_variable, idx,
+                                                                     target_length)
+                        loss, num_tokens = loss + token_loss, num_tokens + tokens
+                    else:
+                        loss += self.compute_loss(decoder_output, target_variable, idx, target_length)
 
-        return loss
+        outputs = (loss, num_tokens) if token_sum else (loss,)
+        if return_state:
+            outputs += (session_state,)
+        return outputs if len(outputs) > 1 else loss
@@ -0,0 +1,130 @@
+###############################################################################
+# Author: agent
+# Project: Context-aware Query Suggestion
+# Date Created: 10/18/2026
+#
+# File Description: This script mines the vocabulary shortlists used to
+# decode suggestions over a few thousand words instead of the whole
+# vocabulary: the words that most often follow each context word in the
+# training sessions, and the most frequent words. It also reports how often
+# the words of the reference next queries fall outside the shortlists.
+###############################################################################
+
+import util, helper, os, json, time
+from common import normalizer
+import numpy as np
+from collections import Counter, defaultdict
+
+
+class Shortlist(object):
+    """Table of the candidate next-query words of every context word, stored as compressed sparse rows: the
+    candidates of word i are words[offsets[i]:offsets[i + 1]]. The frequent words are candidates of every context."""
+
+    def __init__(self, frequent, offsets, words):
+        self.frequent = frequent
+        self.offsets = offsets
+        self.words = words
+
+    @staticmethod
+    def load(filename, dictionary):
+        table = np.load(filename)
+        assert len(table['offsets']) == len(dictionary) + 1, 'the shortlist was built with another dictionary'
+        return Shortlist(table['frequent'], table['offsets'], table['words'])
+
+    def save(self, filename):
+        # not compressed, so that loading does not have to inflate it
+        with open(filename, 'wb') as f:
+            np.savez(f, frequent=self.frequent, offsets=self.offsets, words=self.words)
+
+    def candidates(self, context):
+        """Returns the sorted distinct candidate words of a context, given as the word indices of its queries: the
+        frequent words, the context words and the words that follow them."""
+        context = np.unique(np.asarray(context, dtype=np.int64))
+        return np.unique(np.concatenate([self.frequent, context] + [
+            self.words[self.offsets[word]:self.offsets[word + 1]] for word in context]))
+
+
+def build_shortlist(filename, dictionary, query_normalizer, config):
+    """Counts how often every word of a query is followed by every word of the next query of its session and keeps
+    the --shortlist_per_word most frequent followers of every word, along with the --shortlist_frequent most frequent
+    words of all the next queries."""
+    unknown = dictionary.word2idx[dictionary.unknown_token]
+    followers = defaultdict(Counter)
+    frequencies = Counter()
+    for line in helper.read_lines(filename):
+        queries = []
+        for terms in query_normalizer.normalize_batch(line.split(':::')):
+            if terms:
+                words = set(dictionary.word2idx.get(term, unknown) for term in terms[:config.max_length])
+                words.discard(unknown)
+                queries.append(words)
+        for i in range(1, len(queries)):
+            frequencies.update(queries[i])
+            for word in queries[i - 1]:
+                followers[word].update(queries[i])
+
+    # the end token closes every query, padding extends the finished hypotheses of the beam
+    always = [dictionary.word2idx[dictionary.pad_token], dictionary.word2idx[dictionary.end_token]]
+    frequent = always + [word for word, _ in frequencies.most_common(config.shortlist_frequent)]
+    offsets, words = [0], []
+    for word in range(len(dictionary)):
+        words.extend(follower for follower, count in followers[word].most_common(config.shortlist_per_word)
+                     if count >= config.shortlist_min_count)
+        offsets.append(len(words))
+    return Shortlist(np.unique(np.array(frequent, dtype=np.int32)), np.array(offsets, dtype=np.int64),
+                     np.array(words, dtype=np.int32))
+
+
+def shortlist_recall(filename, dictionary, query_normalizer, shortlist, config):
+    """Returns how often the words of the next queries of a session file are candidates of the shortlist of their
+    context, the last --context_window queries, as suggest.py decodes them."""
+    unknown = dictionary.word2idx[dictionary.unknown_token]
+    num_tokens, num_covered, num_unknown, num_queries, num_full, sizes = 0, 0, 0, 0, 0, []
+    for line in helper.read_lines(filename):
+        queries = [[dictionary.word2idx.get(term, unknown) for term in terms[:config.max_length]]
+                   for terms in query_normalizer.normalize_batch(line.split(':::')) if terms]
+        for i in range(1, len(queries)):
+            context = [word for query in queries[max(0, i - config.context_window):i] for word in query]
+            candidates = shortlist.candidates(context)
+            # unknown words are never generated, with or without a shortlist
+            reference = np.array([word for word in queries[i] if word != unknown], dtype=np.int64)
+            covered = np.isin(reference, candidates).sum()
+            num_unknown += len(queries[i]) - len(reference)
+            num_tokens += len(reference)
+            num_covered += covered
+            num_queries += 1
+            num_full += covered == len(reference)
+            sizes.append(len(candidates))
+
+    return {'pairs': num_queries,
+            'token_recall': num_covered / max(num_tokens, 1),
+            'query_recall': num_full / max(num_queries, 1),
+            'unknown_tokens': num_unknown,
+            'mean_size': float(np.mean(sizes)) if sizes else 0,
+            'p99_size': float(np.percentile(sizes, 99)) if sizes else 0,
+            'vocabulary_size': len(dictionary)}
+
+
+def shortlist_path(config):
+    return config.shortlist_file if config.shortlist_file else config.save_path + 'shortlist.npz'
+
+
+if __name__ == '__main__':
+    args = util.get_args()
+    dictionary = helper.load_object(args.save_path + 'dictionary.p')
+    query_normalizer = normalizer.for_dictionary(dictionary, args.normalizer_cache_size)
+
+    start = time.time()
+    shortlist = build_shortlist(os.path.join(args.data, 'session_train.txt'), dictionary, query_normalizer, args)
+    shortlist.save(shortlist_path(args))
+    print('Shortlist built in %s, %d frequent words, %d follower entries (%.1f MB)' % (
+        helper.convert_to_minutes(time.time() - start), len(shortlist.frequent), len(shortlist.words),
+        (shortlist.offsets.nbytes + shortlist.words.nbytes + shortlist.frequent.nbytes) / 1024 / 1024))
+
+    report = shortlist_recall(os.path.join(args.data, args.test_file), dictionary, query_normalizer, shortlist, args)
+    with open(os.path.splitext(shortlist_path(args))[0] + '_recall.json', 'w') as f:
+        json.dump(report, f, indent=2)
+    print('Number of query pairs = ', report['pairs'])
+    print('Token recall = %.4f, query recall = %.4f' % (report['token_recall'], report['query_recall']))
+    print('Shortlist size: mean %.0f, 99th percentile %.0f of %d words' % (report['mean_size'], report['p99_size'],
+                                                                          report['vocabulary_size']))
@@ -0,0 +1,245 @@
+###############################################################################
+# Author: agent
+# Project: Context-aware Query Suggestion
+# Date Created: 10/18/2026
+#
+# File Description: This script generates context-aware query suggestions with
+# a trained model. Contexts are read from the standard input, one session per
+# line with queries separated by ':::'.
+###############################################################################
+
+import os, sys, time, torch, helper, cache, shortlist
+from common import normalizer, step_profiler
+import numpy as np
+from torch.autograd import Variable
+from seq2seq import Sequence2Sequence
+
+
+class Suggester(object):
+    """Generates query suggestions for session contexts, answering repeated contexts from a cache."""
+
+    def __init__(self, model, dictionary, config, suggestion_cache=None):
+        self.model = model
+        self.dictionary = dictionary
+        self.config = config
+        self.cache = suggestion_cache
+        self.normalizer = normalizer.for_dictionary(dictionary, config.normalizer_cache_size)
+        self.encoding_cache = helper.EncodingCache(config.encoding_cache_size) if config.encoding_cache_size else None
+        self.shortlist = shortlist.Shortlist.load(shortlist.shortlist_path(config), dictionary) if config.shortlist \
+            else None
+        self.model.eval()
+
+    def load_checkpoint(self, filename):
+        """Loads the model states of a checkpoint or an inference weights file; cached suggestions of any other
+        checkpoint are dropped."""
+        helper.load_model_weights(self.model, filename)
+        self.model.eval()
+        if self.encoding_cache is not None:
+            # the cached query encodings were computed with the previous weights
+            self.encoding_cache = helper.EncodingCache(self.config.encoding_cache_size)
+        if self.cache is not None:
+            fingerprint = cache.checkpoint_fingerprint(filename)
+            if self.shortlist is not None:
+                # suggestions decoded over shortlists also depend on the shortlist table
+                fingerprint += ':' + cache.checkpoint_fingerprint(shortlist.shortlist_path(self.config))
+            self.cache.bind(fingerprint)
+
+    def context_key(self, context):
+        """Normalizes the last queries of a context into a hashable tuple of token indices."""
+        unknown = self.dictionary.word2idx[self.dictionary.unknown_token]
+        key = []
+        for terms in self.normalizer.normalize_batch(context):
+            terms = terms[:self.config.max_length]
+            if terms:
+                terms.append(self.dictionary.end_token)
+                key.append(tuple(self.dictionary.word2idx.get(term, unknown) for term in terms))
+        return tuple(key[-self.config.context_window:])
+
+    def suggest(self, contexts):
+        """Returns the suggestions for each context, where a context is the list of previous queries."""
+        keys = [self.context_key(context) for context in contexts]
+        suggestions = [[] for _ in keys]
+        misses = {}
+        for i, key in enumerate(keys):
+            if not key:
+                continue
+            cached = self.cache.get(key) if self.cache is not None else None
+            if cached is not None:
+                suggestions[i] = cached
+            else:
+                misses.setdefault(key, []).append(i)
+
+        # only the contexts that are not cached are sent to the model, each one once
+        unique_keys = list(misses.keys())
+        for start in range(0, len(unique_keys), self.config.batch_size):
+            batch_keys = unique_keys[start:start + self.config.batch_size]
+            for key, generated in zip(batch_keys, self.generate(batch_keys)):
+                if self.cache is not None:
+                    self.cache.put(key, generated)
+                for i in misses[key]:
+                    suggestions[i] = generated
+
+        return suggestions
+
+    def keys_to_tensor(self, keys):
+        """Converts a batch of context keys to a padded tensor of token indices."""
+        # queries are always padded to the maximum query length so that suggestions do not depend on the batch
+        session_tensor = torch.LongTensor(len(keys), max(len(key) for key in keys),
+                                          self.config.max_length + 1).zero_()
+        for i in range(len(keys)):
+            for j in range(len(keys[i])):
+                session_tensor[i, j, :len(keys[i][j])] = torch.LongTensor(keys[i][j])
+        return Variable(session_tensor)
+
+    def generate(self, keys):
+        """Generates suggestions for a batch of non-empty context keys with beam search."""
+        batch_session = self.keys_to_tensor(keys)
+        last_query = Variable(torch.LongTensor([len(key) - 1 for key in keys]))
+        if self.config.cuda:
+            batch_session = batch_session.cuda()
+            last_query = last_query.cuda()
+
+        with torch.no_grad():
+            session_input = self.model.encode_queries(batch_session.view(-1, batch_session.size(-1)),
+                                                      self.encoding_cache)
+            session_input = session_input.view(batch_session.size(0), batch_session.size(1), -1)
+            hidden_states, cell_states = self.model.encode_session(session_input)
+            # the session encoder is unidirectional in time, so padded queries never affect the last real state
+            index = last_query.view(-1, 1, 1).expand(hidden_states.size(0), 1, hidden_states.size(2))
+            decoder_hidden = (hidden_states.gather(1, index).squeeze(1).unsqueeze(0),
+                              cell_states.gather(1, index).squeeze(1).unsqueeze(0))
+            rows, allowed = self.shortlist_rows(keys) if self.shortlist is not None else (None, None)
+            sequences = self.beam_search(decoder_hidden, rows, allowed)
+
+        return [self.sequences_to_queries(hypotheses) for hypotheses in sequences]
+
+    def shortlist_rows(self, keys):
+        """Returns the union of the shortlists of a batch of context keys, as sorted word indices, and for every
+        context the mask of its own shortlisted words within the union."""
+        never = [self.dictionary.word2idx[self.dictionary.start_token],
+                 self.dictionary.word2idx[self.dictionary.unknown_token]]
+        candidates = [self.shortlist.candidates([word for query in key for word in query]) for key in keys]
+        rows = np.setdiff1d(np.concatenate(candidates), never)
+        allowed = np.stack([np.isin(rows, words) for words in candidates])
+        rows, allowed = torch.from_numpy(rows).long(), torch.from_numpy(allowed)
+        if self.config.cuda:
+            rows, allowed = rows.cuda(), allowed.cuda()
+        return rows, allowed
+
+    def beam_search(self, decoder_hidden, rows=None, allowed=None):
+        """Decodes a beam of queries for every decoder state and returns them from the most to the least likely.
+        With rows, the words are chosen among the shortlisted rows (see shortlist_rows), each context only among
+        those allowed by its mask, and the output layer is only computed for them."""
+        num_contexts, beam_size, vocab_size = decoder_hidden[0].size(1), self.config.beam_size, len(self.dictionary)
+        pad = self.dictionary.word2idx[self.dictionary.pad_token]
+        end = self.dictionary.word2idx[self.dictionary.end_token]
+        banned = [pad, self.dictionary.word2idx[self.dictionary.start_token],
+                  self.dictionary.word2idx[self.dictionary.unknown_token]]
+        output_rows, disallowed = None, None
+        if rows is not None:
+            # the decoder scores columns of the shortlist, which are mapped back to words after every step
+            vocab_size = rows.size(0)
+            output_rows = self.model.decoder.out.select_rows(rows)
+            pad = int((rows == pad).nonzero()[0])
+            banned = [pad]
+            # the hypotheses of a context stay in its beam, so the mask of every row of the beams is fixed
+            disallowed = ~allowed.repeat_interleave(beam_size, 0)
+
+        offsets = torch.arange(0, num_contexts).long().unsqueeze(1) * beam_size
+        # the decoder state of every context is repeated for each hypothesis of its beam
+        origin = torch.arange(0, num_contexts).long().repeat_interleave(beam_size)
+        scores = torch.zeros(num_contexts, beam_size)
+        # every beam starts from the same state, so only the first one is expanded at the first step
+        scores[:, 1:] = -float('inf')
+        sequences = torch.LongTensor(num_contexts * beam_size, 0)
+        finished = torch.zeros(num_contexts * beam_size).bool()
+        input_variable = torch.LongTensor(num_contexts * beam_size).fill_(
+            self.dictionary.word2idx[self.dictionary.start_token])
+        if self.config.cuda:
+            offsets, origin, scores = offsets.cuda(), origin.cuda(), scores.cuda()
+            sequences, finished, input_variable = sequences.cuda(), finished.cuda(), input_variable.cuda()
+        decoder_hidden = tuple(state.index_select(1, origin) for state in decoder_hidden)
+
+        for step in range(self.config.max_length + 1):
+            # the words outside the shortlist of a context are masked before the normalization, so its scores do
+            # not depend on the other contexts of the batch
+            log_probs, decoder_hidden = self.model.decode_step(input_variable, decoder_hidden, output_rows,
+                                                               disallowed)
+            log_probs[:, banned] = -float('inf')
+            # a finished hypothesis is only extended with padding, which leaves its score unchanged
+            log_probs[finished] = -float('inf')
+            log_probs[finished, pad] = 0
+
+            candidates = (scores.view(-1, 1) + log_probs).view(num_contexts, -1)
+            scores, flat_index = candidates.topk(beam_size, 1)
+            tokens = (flat_index % vocab_size).view(-1)
+            if rows is not None:
+                tokens = rows.index_select(0, tokens)
+            origin = (offsets + flat_index // vocab_size).view(-1)
+
+            decoder_hidden = tuple(state.index_select(1, origin) for state in decoder_hidden)
+            sequences = torch.cat((sequences.index_select(0, origin), tokens.unsqueeze(1)), 1)
+            finished = finished.index_select(0, origin) | (tokens == end)
+            input_variable = tokens
+            if finished.all():
+                break
+
+        return sequences.view(num_contexts, beam_size, -1).tolist()
+
+    def sequences_to_queries(self, sequences):
+        """Converts the decoded token indices of a beam to distinct queries."""
+        queries = []
+        for sequence in sequences:
+            words = []
+            for idx in sequence:
+                word = self.dictionary.idx2word[idx]
+                if word in (self.dictionary.end_token, self.dictionary.pad_token):
+                    break
+                words.append(word)
+            query = ' '.join(words)
+            if query and query not in queries:
+                queries.append(query)
+        return queries[:self.config.num_suggestions]
+
+
+def load_suggester(config, suggestion_cache=None):
+    """Builds a suggester from the dictionary and the checkpoint saved by the training pipeline."""
+    dictionary = helper.load_object(config.save_path + 'dictionary.p')
+    # the pretrained embeddings are overwritten by the checkpoint, so they are not loaded here
+    model = Sequence2Sequence(dictionary, {}, config)
+    if config.cuda:
+        model = model.cuda()
+    suggester = Suggester(model, dictionary, config, suggestion_cache)
+    suggester.load_checkpoint(checkpoint_path(config))
+    return suggester
+
+
+def checkpoint_path(config):
+    return config.checkpoint if config.checkpoint else config.save_path + 'model_best.pth.tar'
+
+
+if __name__ == '__main__':
+    import util
+
+    args = util.get_args()
+    suggestion_cache = cache.SuggestionCache(args.cache_size * 1024 * 1024, args.cache_ttl)
+    suggester = load_suggester(args, suggestion_cache)
+    if os.path.isfile(args.cache_snapshot):
+        print('Number of precomputed suggestions = ', suggestion_cache.load(args.cache_snapshot), file=sys.stderr)
+
+    profiler = step_profiler.StepProfiler(args.profile_steps, args.profile_dir, 'suggest', args.cuda)
+    # the weights published by online_train.py replace the file at once, so a changed inode means new weights
+    checkpoint_stat, last_check = os.stat(checkpoint_path(args)), time.time()
+    for line_no, line in enumerate(sys.stdin, 1):
+        if args.reload_every > 0 and time.time() - last_check >= args.reload_every:
+            stat, last_check = os.stat(checkpoint_path(args)), time.time()
+            if (stat.st_ino, stat.st_mtime) != (checkpoint_stat.st_ino, checkpoint_stat.st_mtime):
+                suggester.load_checkpoint(checkpoint_path(args))
+                checkpoint_stat = stat
+                print('reloaded %s' % checkpoint_path(args), file=sys.stderr)
+        profiler.begin(line_no)
+        suggestions = suggester.suggest([line.strip().split(':::')])[0]
+        profiler.end(line_no)
+        print(':::'.join(suggestions))
+        sys.stdout.flush()
+    profiler.finish()
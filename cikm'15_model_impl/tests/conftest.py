@@ -0,0 +1,68 @@
+import os, sys, pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import util, data, train, optimizer, torch
+from seq2seq import Sequence2Sequence
+
+SESSIONS = ['cheap flights:::cheap flights paris:::paris hotels:::paris hotels cheap',
+            'weather today:::weather paris:::paris weather tomorrow',
+            'python list:::python list sort:::python sort dict:::python dict keys',
+            'cheap hotels:::cheap hotels paris:::paris flights',
+            'news today:::world news:::world news paris:::paris news today']
+
+
+def get_config(*argv):
+    """Returns the default arguments with a tiny model, updated by argv."""
+    saved_argv = sys.argv
+    sys.argv = ['pytest', '--emsize', '8', '--nhid_query', '8', '--nhid_session', '8', '--dropout', '0',
+                '--plot_mode', 'none', '--encoding_cache_size', '0'] + list(argv)
+    try:
+        return util.get_args()
+    finally:
+        sys.argv = saved_argv
+
+
+@pytest.fixture
+def config():
+    return get_config()
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    """Directory of small train, dev and test session files."""
+    for filename in ['session_train.txt', 'session_dev.txt', 'session_test.txt']:
+        (tmp_path / filename).write_text('\n'.join(SESSIONS) + '\n')
+    return str(tmp_path)
+
+
+@pytest.fixture
+def dictionary():
+    return data.Dictionary()
+
+
+@pytest.fixture
+def corpus(data_dir, dictionary, config):
+    """Training corpus of the sessions, whose words fill the dictionary."""
+    return data.Corpus(data_dir, 'session_train.txt', dictionary, config.max_length)
+
+
+@pytest.fixture
+def model(corpus, dictionary, config):
+    torch.manual_seed(config.seed)
+    # every word gets a random out of vocabulary embedding
+    return Sequence2Sequence(dictionary, {}, config)
+
+
+def create_trainer(model, dictionary, config):
+    """Returns a trainer of a model with the optimizer of the training script."""
+    return train.Train(model, optimizer.create_optimizer(model, config), dictionary, None, config, -1)
+
+
+@pytest.fixture
+def trainer(model, dictionary, config, tmp_path):
+    """Trainer of the model in a single process, saving under a temporary directory."""
+    config.rank, config.world_size, config.distributed = 0, 1, False
+    config.save_path = str(tmp_path / 'output') + '/'
+    os.makedirs(config.save_path)
+    return create_trainer(model, dictionary, config)
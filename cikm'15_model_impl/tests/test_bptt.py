@@ -0,0 +1,61 @@
+import data, pytest
+from conftest import get_config
+
+
+def test_the_session_window_keeps_the_last_queries(dictionary):
+    session = data.Session()
+    queries = ['q%d' % i for i in range(6)]
+    assert session.form_session(queries, dictionary, 10, session_window=4) == 4
+    assert [query[0] for query in session.queries] == ['q2', 'q3', 'q4', 'q5']
+    # a session needs three queries to be kept
+    assert data.Session().form_session(queries, dictionary, 10, session_window=2) == -1
+
+
+
+@pytest.mark.parametrize('session_window', ['1', '2', '-1'])
+def test_a_session_window_that_drops_every_session_is_rejected(session_window):
+    with pytest.raises(SystemExit):
+        get_config('--session_window', session_window)
+    assert get_config('--session_window', '3').session_window == 3
+
+
+def test_the_corpus_windows_every_session(data_dir, dictionary, config):
+    corpus = data.Corpus(data_dir, 'session_train.txt', dictionary, config.max_length, session_window=3)
+    assert sorted(corpus.data.keys()) == [3]
+    assert corpus.max_session_length == 3
+    assert len(corpus) == 5
+
+
+@pytest.mark.parametrize('bptt_chunk, chunks', [(0, [(0, 4)]), (2, [(0, 2), (2, 4)]), (3, [(0, 3), (3, 4)]),
+                                                (1, [(0, 1), (1, 2), (2, 3), (3, 4)])])
+def test_consecutive_chunks_share_a_query(trainer, bptt_chunk, chunks):
+    trainer.config.bptt_chunk = bptt_chunk
+    assert trainer.session_chunks(5) == chunks
+
+
+@pytest.mark.parametrize('bptt_chunk', [1, 2])
+def test_chunks_have_the_loss_of_the_whole_session(trainer, corpus, model, bptt_chunk):
+    batch = corpus.data[4]
+    model.zero_grad()
+    loss, num_tokens = trainer.backward_batch(batch)
+    trainer.config.bptt_chunk = bptt_chunk
+    model.zero_grad()
+    chunked_loss, chunked_tokens = trainer.backward_batch(batch)
+    assert chunked_tokens == num_tokens
+    assert abs(chunked_loss - loss) < 1e-4
+
+
+def test_a_chunk_covering_the_session_has_the_gradients_of_the_session(trainer, corpus, model):
+    batch = corpus.data[4]
+    model.zero_grad()
+    trainer.backward_batch(batch)
+    expected = [param.grad.to_dense() if param.grad.is_sparse else param.grad.clone()
+                for param in model.parameters() if param.grad is not None]
+    trainer.config.bptt_chunk = 3
+    model.zero_grad()
+    trainer.backward_batch(batch)
+    grads = [param.grad.to_dense() if param.grad.is_sparse else param.grad
+             for param in model.parameters() if param.grad is not None]
+    assert len(grads) == len(expected)
+    for grad, expected_grad in zip(grads, expected):
+        assert (grad - expected_grad).abs().max().item() < 1e-6
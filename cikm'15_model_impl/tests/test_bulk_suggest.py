@@ -0,0 +1,65 @@
+import os, helper, suggest, bulk_suggest, pytest
+from common import step_profiler
+
+
+@pytest.fixture
+def session_lines(tmp_path):
+    lines = ['cheap flights %d:::paris hotels:::weather paris' % i for i in range(40)]
+    filename = tmp_path / 'bulk_sessions.txt'
+    filename.write_text('\n'.join(lines) + '\n')
+    return str(filename), lines
+
+
+@pytest.mark.parametrize('num_shards', [1, 3, 7, 100])
+def test_shards_cover_every_line_once(session_lines, num_shards):
+    filename, lines = session_lines
+    shards = helper.plan_shards(filename, num_shards)
+    assert len(shards) <= num_shards
+    assert [line for start, end in shards for line in helper.read_lines(filename, start, end)] == lines
+
+
+@pytest.fixture
+def worker(model, dictionary, config, tmp_path, monkeypatch):
+    """Sets the globals of a bulk suggestion worker, writing its shards to an output directory."""
+    config.output_dir = str(tmp_path / 'suggestions')
+    config.batch_size = 8
+    os.makedirs(config.output_dir)
+    monkeypatch.setattr(bulk_suggest, 'suggester', suggest.Suggester(model, dictionary, config))
+    monkeypatch.setattr(bulk_suggest, 'profiler', step_profiler.StepProfiler('', config.profile_dir, 'test'))
+    return config
+
+
+def test_every_position_of_every_session_gets_a_line(session_lines, worker):
+    filename, lines = session_lines
+    shards = helper.plan_shards(filename, 3)
+    outputs = []
+    for shard_no, (start, end) in enumerate(shards):
+        assert bulk_suggest.process_shard((shard_no, filename, start, end))[1] > 0
+        with open(os.path.join(worker.output_dir, 'part-%05d.txt' % shard_no)) as f:
+            outputs.extend(line.split('\t')[:2] for line in f)
+    assert len(outputs) == 3 * len(lines)
+    assert sorted(set(int(position) for _, position in outputs)) == [0, 1, 2]
+
+
+def test_an_interrupted_shard_resumes_after_its_recorded_offsets(session_lines, worker):
+    filename, lines = session_lines
+    start, end = helper.plan_shards(filename, 1)[0]
+    bulk_suggest.process_shard((0, filename, start, end))
+    output_path = os.path.join(worker.output_dir, 'part-00000.txt')
+    with open(output_path) as f:
+        expected = f.read()
+
+    # the job stopped after the first batch, with the output of a second batch partially written
+    offset_path = os.path.join(worker.output_dir, 'part-00000.offset')
+    first_batch = expected.splitlines(True)[:9]
+    with open(filename, 'rb') as f:
+        f.readline(), f.readline(), f.readline()
+        input_offset = f.tell()
+    bulk_suggest.write_offsets(offset_path, input_offset, len(''.join(first_batch).encode('utf-8')))
+    with open(output_path, 'w') as f:
+        f.write(''.join(first_batch) + 'partial li')
+
+    bulk_suggest.process_shard((0, filename, start, end))
+    with open(output_path) as f:
+        assert f.read() == expected
+    assert bulk_suggest.read_offsets(offset_path) == (end, len(expected.encode('utf-8')))
@@ -0,0 +1,63 @@
+import cache, pytest
+
+
+def test_least_recently_used_entries_are_evicted_first():
+    key_size = cache.sizeof(('a',)) + cache.sizeof(['x'])
+    suggestion_cache = cache.SuggestionCache(2 * key_size)
+    suggestion_cache.put(('a',), ['x'])
+    suggestion_cache.put(('b',), ['x'])
+    assert suggestion_cache.get(('a',)) == ['x']
+    suggestion_cache.put(('c',), ['x'])
+    assert suggestion_cache.get(('b',)) is None
+    assert suggestion_cache.get(('a',)) == ['x'] and suggestion_cache.get(('c',)) == ['x']
+    assert suggestion_cache.num_bytes <= suggestion_cache.max_bytes
+
+
+def test_entries_larger_than_the_cache_are_not_stored():
+    suggestion_cache = cache.SuggestionCache(10)
+    suggestion_cache.put(('a',), ['a long suggestion'])
+    assert len(suggestion_cache) == 0 and suggestion_cache.num_bytes == 0
+
+
+def test_expired_entries_are_dropped(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, 'time', lambda: now[0])
+    suggestion_cache = cache.SuggestionCache(1 << 20, ttl=60)
+    suggestion_cache.put(('a',), ['x'])
+    now[0] += 59
+    assert suggestion_cache.get(('a',)) == ['x']
+    now[0] += 2
+    assert suggestion_cache.get(('a',)) is None
+    assert len(suggestion_cache) == 0 and suggestion_cache.num_bytes == 0
+
+
+def test_binding_another_checkpoint_clears_the_cache():
+    suggestion_cache = cache.SuggestionCache(1 << 20, checkpoint_id='first')
+    suggestion_cache.put(('a',), ['x'])
+    suggestion_cache.bind('first')
+    assert len(suggestion_cache) == 1
+    suggestion_cache.bind('second')
+    assert len(suggestion_cache) == 0 and suggestion_cache.checkpoint_id == 'second'
+
+
+def test_snapshots_of_other_checkpoints_are_ignored(tmp_path):
+    filename = str(tmp_path / 'snapshot.p')
+    suggestion_cache = cache.SuggestionCache(1 << 20, checkpoint_id='first')
+    suggestion_cache.put(('a',), ['x'])
+    suggestion_cache.put(('b',), ['y'])
+    suggestion_cache.save(filename)
+
+    assert cache.SuggestionCache(1 << 20, checkpoint_id='second').load(filename) == 0
+    loaded = cache.SuggestionCache(1 << 20, checkpoint_id='first')
+    assert loaded.load(filename) == 2
+    # the recency order is kept
+    assert list(loaded.entries) == [('a',), ('b',)]
+
+
+def test_checkpoint_fingerprint_follows_the_content(tmp_path):
+    first, second = tmp_path / 'first', tmp_path / 'second'
+    first.write_bytes(b'weights')
+    second.write_bytes(b'weights')
+    assert cache.checkpoint_fingerprint(str(first)) == cache.checkpoint_fingerprint(str(second))
+    second.write_bytes(b'other weights')
+    assert cache.checkpoint_fingerprint(str(first)) != cache.checkpoint_fingerprint(str(second))
@@ -0,0 +1,47 @@
+import data, helper, torch
+import torch.nn.functional as F
+from click_model import ClickModel
+from conftest import get_config
+
+CLICKS = ['cheap flights:::paris hotels\tparis hotel deals:::cheap paris hotels:::hotels in paris\t1 0 0',
+          'python list\tsorting lists in python:::python docs\t0 1',
+          'missing fields\tonly two fields',
+          'weather today\tweather paris:::weather forecast:::paris news:::world weather\t0 0 1 0']
+
+
+def load_pages(tmp_path, dictionary, config):
+    (tmp_path / 'click_train.txt').write_text('\n'.join(CLICKS) + '\n')
+    return data.ClickCorpus(str(tmp_path), 'click_train.txt', dictionary, config.max_length, config.max_title_length,
+                            config.max_documents).data
+
+
+def test_malformed_lines_are_skipped_and_pages_truncated(tmp_path, corpus, dictionary):
+    config = get_config('--max_documents', '3')
+    pages = load_pages(tmp_path, dictionary, config)
+    assert len(pages) == 3
+    assert pages[0].queries[-1] == ['paris', 'hotels', dictionary.end_token]
+    assert [len(page) for page in pages] == [3, 2, 3]
+    assert pages[2].clicks == [0.0, 0.0, 1.0]
+
+
+def test_pages_are_scored_independently_of_their_batch(tmp_path, corpus, dictionary, model):
+    config = get_config('--click_use_query')
+    click_model = ClickModel(model, config)
+    click_model.eval()
+    pages = load_pages(tmp_path, dictionary, config)
+    batch = helper.pages_to_tensors(pages, dictionary, config.max_length + 1, config.max_title_length + 1)
+    probabilities = click_model.click_probabilities(*batch[:3], batch[4])
+    assert (probabilities[batch[4] == 0] == 0).all()
+    for i, page in enumerate(pages):
+        single = helper.pages_to_tensors([page], dictionary, config.max_length + 1, config.max_title_length + 1)
+        expected = click_model.click_probabilities(*single[:3], single[4])
+        assert torch.allclose(probabilities[i, :len(page)], expected[0], atol=1e-5)
+
+
+def test_loss_is_the_mean_over_the_documents_of_the_pages(config):
+    logits = torch.randn(2, 3)
+    clicks = torch.Tensor([[1, 0, 0], [0, 1, 0]])
+    document_mask = torch.Tensor([[1, 1, 1], [1, 1, 0]])
+    loss = ClickModel.compute_loss(logits, clicks, document_mask)
+    expected = F.binary_cross_entropy_with_logits(logits[document_mask == 1], clicks[document_mask == 1])
+    assert torch.allclose(loss, expected)
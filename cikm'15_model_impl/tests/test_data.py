@@ -0,0 +1,22 @@
+import data
+
+
+def test_the_corpus_uses_the_normalizer_of_the_dictionary(data_dir, config):
+    dictionary = data.Dictionary(normalizer_mode='wordpunct')
+    with open(data_dir + '/session_train.txt', 'a') as f:
+        f.write('Cheap Flights!:::PARIS, hotels:::Hotels  PARIS\n')
+    corpus = data.Corpus(data_dir, 'session_train.txt', dictionary, config.max_length, normalizer_cache_size=3)
+    assert corpus.normalizer.mode == 'wordpunct'
+    assert corpus.normalizer.cache_size == 3
+    assert corpus.data[3][-1].queries == [['cheap', 'flights', dictionary.end_token],
+                                          ['paris', 'hotels', dictionary.end_token],
+                                          ['hotels', 'paris', dictionary.end_token]]
+
+
+def test_the_click_corpus_uses_the_normalizer_of_the_dictionary(tmp_path, config):
+    dictionary = data.Dictionary(normalizer_mode='wordpunct')
+    (tmp_path / 'click_train.txt').write_text('Cheap Flights!\tParis: Flights\t1\n')
+    corpus = data.ClickCorpus(str(tmp_path), 'click_train.txt', dictionary, config.max_length, 10, 5, 3)
+    assert corpus.normalizer.cache_size == 3
+    assert corpus.data[0].queries == [['cheap', 'flights', dictionary.end_token]]
+    assert corpus.data[0].documents == [['paris', 'flights', dictionary.end_token]]
@@ -0,0 +1,33 @@
+import helper, pytest, torch
+import torch.distributed as dist
+
+
+@pytest.fixture
+def process_group(tmp_path):
+    dist.init_process_group('gloo', init_method='file://' + str(tmp_path / 'store'), rank=0, world_size=1)
+    yield
+    dist.destroy_process_group()
+
+
+def test_collectives_of_a_single_process(process_group):
+    assert helper.broadcast_flag(True) is True
+    assert helper.broadcast_flag(False) is False
+    assert helper.all_reduce_sum(2.5) == 2.5
+    assert helper.collective_tensor(1, torch.long).device.type == 'cpu'
+
+
+def test_nccl_collectives_use_the_current_cuda_device(process_group, monkeypatch):
+    devices = []
+    tensor = torch.tensor
+    monkeypatch.setattr(helper.dist, 'get_backend', lambda: 'nccl')
+    monkeypatch.setattr(helper.torch.cuda, 'current_device', lambda: 1)
+    monkeypatch.setattr(helper.torch, 'tensor', lambda data, dtype, device: devices.append(device) or tensor(
+        data, dtype=dtype))
+    helper.collective_tensor(1, torch.long)
+    assert devices == [torch.device('cuda', 1)]
+
+
+def test_every_process_gets_as_many_batches():
+    batches = list(range(10))
+    shards = [helper.shard_batches(batches, rank, 3) for rank in range(3)]
+    assert shards == [[0, 3, 6], [1, 4, 7], [2, 5, 8]]
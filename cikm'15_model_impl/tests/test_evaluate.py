@@ -0,0 +1,55 @@
+import evaluate
+from common import normalizer
+from conftest import SESSIONS
+
+
+def mine(data_dir, dictionary, config):
+    query_normalizer = normalizer.for_dictionary(dictionary)
+    return evaluate.mine_candidates(data_dir + '/session_train.txt', config, dictionary, query_normalizer)
+
+
+def test_candidates_are_mined_by_the_key_of_the_queries(corpus, data_dir, dictionary, config):
+    candidate_pool, mined_candidates = mine(data_dir, dictionary, config)
+    key = evaluate.query_key(['cheap', 'flights'], dictionary)
+    assert key in candidate_pool
+    assert evaluate.query_key(['cheap', 'flights', 'paris'], dictionary) in mined_candidates[key]
+
+
+def test_queries_with_unknown_words_find_their_mined_candidates(corpus, data_dir, dictionary, config, model):
+    with open(data_dir + '/session_train.txt', 'a') as f:
+        f.write('rareword flights:::cheap hotels:::paris hotels\n')
+    config.num_candidates = 1
+    candidate_pool, mined_candidates = mine(data_dir, dictionary, config)
+    evaluator = evaluate.Evaluator(model, dictionary, config, candidate_pool, mined_candidates)
+    # the words of a test session are mapped to the unknown token, as when the session is read
+    previous_query = evaluate.query_key([dictionary.unknown_token, 'flights'], dictionary)
+    assert previous_query == evaluate.query_key(['otherword', 'flights'], dictionary)
+    next_query = evaluate.query_key(['paris', 'flights'], dictionary)
+    hotels = evaluate.query_key(['cheap', 'hotels'], dictionary)
+    assert evaluator.negative_candidates(previous_query, next_query) == [hotels]
+
+
+def test_the_next_query_is_never_a_negative_candidate(corpus, data_dir, dictionary, config, model):
+    candidate_pool, mined_candidates = mine(data_dir, dictionary, config)
+    config.num_candidates = 3
+    evaluator = evaluate.Evaluator(model, dictionary, config, candidate_pool, mined_candidates)
+    for previous_query, next_queries in mined_candidates.items():
+        for next_query in next_queries:
+            candidates = evaluator.negative_candidates(previous_query, next_query)
+            assert next_query not in candidates
+            assert len(candidates) == len(set(candidates)) == config.num_candidates
+
+
+def test_every_next_query_of_the_test_file_is_evaluated(corpus, data_dir, dictionary, config, model):
+    config.num_candidates, config.batch_size = 3, 4
+    candidate_pool, mined_candidates = mine(data_dir, dictionary, config)
+    evaluator = evaluate.Evaluator(model, dictionary, config, candidate_pool, mined_candidates)
+    totals = {}
+    for batch in evaluator.read_batches(data_dir + '/session_test.txt', 0, None):
+        for name, value in evaluator.evaluate_batch(batch).items():
+            totals[name] = totals.get(name, 0) + value
+    assert totals['sessions'] == len(SESSIONS)
+    assert totals['pairs'] == sum(len(session.split(':::')) - 1 for session in SESSIONS)
+    assert totals['nll'] > 0
+    assert 0 < totals['reciprocal_rank'] <= totals['pairs']
+    assert totals['recall@1'] <= totals['recall@5'] == totals['pairs']
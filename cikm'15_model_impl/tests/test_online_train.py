@@ -0,0 +1,50 @@
+import os, helper, online_train, torch
+from common.streaming import LogTail, ReplayBuffer
+from conftest import SESSIONS, create_trainer
+from seq2seq import Sequence2Sequence
+
+
+def create_online_trainer(trainer, config, log, offsets=None, steps=0, pending=None):
+    return online_train.OnlineTrainer(trainer, LogTail(log, offsets), ReplayBuffer(config.replay_size, config.seed),
+                                      config, steps, pending)
+
+
+def test_a_restart_continues_with_the_pending_sessions(trainer, dictionary, config, tmp_path):
+    config.online_dir = str(tmp_path / 'online') + '/'
+    os.makedirs(config.online_dir)
+    log = str(tmp_path / 'sessions.log')
+    with open(log, 'w') as f:
+        f.write('\n'.join(SESSIONS) + '\n')
+    # the batches are too large to be filled, so all the sessions are left pending
+    config.batch_size = 100
+    online_trainer = create_online_trainer(trainer, config, log)
+    assert online_trainer.read() == len(SESSIONS)
+    assert online_trainer.train_steps() == 0 and online_trainer.num_pending() == len(SESSIONS)
+    online_trainer.publish()
+    trainer.checkpoint_writer.wait()
+
+    model = Sequence2Sequence(dictionary, {}, config)
+    restarted_trainer = create_trainer(model, dictionary, config)
+    offsets, steps, pending = online_train.load_online_state(model, restarted_trainer.optimizer, config)
+    assert offsets == online_trainer.tail.offsets and steps == 0
+    assert online_train.pending_words(pending) == online_train.pending_words(online_trainer.pending)
+    for key, value in trainer.local_model.state_dict().items():
+        assert torch.equal(model.state_dict()[key], value), key
+
+    # the logs were read up to their end, and the pending sessions now fill batches
+    config.batch_size = 2
+    restarted = create_online_trainer(restarted_trainer, config, log, offsets, steps, pending)
+    assert restarted.read() == 0
+    assert restarted.train_steps() > 0
+
+
+def test_online_training_begins_from_the_offline_checkpoint(trainer, dictionary, config, tmp_path):
+    config.online_dir = str(tmp_path / 'online') + '/'
+    helper.save_checkpoint({'state_dict': trainer.local_model.state_dict(),
+                            'optimizer': trainer.optimizer.state_dict()}, config.save_path + 'model_best.pth.tar')
+    model = Sequence2Sequence(dictionary, {}, config)
+    offsets, steps, pending = online_train.load_online_state(model, create_trainer(model, dictionary, config).optimizer,
+                                                             config)
+    assert (offsets, steps, pending) == ({}, 0, {})
+    for key, value in trainer.local_model.state_dict().items():
+        assert torch.equal(model.state_dict()[key], value), key
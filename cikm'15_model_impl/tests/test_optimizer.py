@@ -0,0 +1,61 @@
+import helper, optimizer, pytest, torch
+from conftest import get_config
+from seq2seq import Sequence2Sequence
+
+
+@pytest.fixture
+def sparse_model(corpus, dictionary):
+    config = get_config('--sparse_embedding')
+    torch.manual_seed(config.seed)
+    return Sequence2Sequence(dictionary, {}, config), config
+
+
+def test_every_parameter_is_updated_by_one_optimizer(sparse_model):
+    model, config = sparse_model
+    split = optimizer.create_optimizer(model, config)
+    assert [type(opt) for opt in split.optimizers] == [torch.optim.SparseAdam, torch.optim.Adam]
+    assert split.optimizers[0].param_groups[0]['params'] == [model.embedding.embedding.weight]
+    params = [param for group in split.param_groups for param in group['params']]
+    assert sorted(map(id, params)) == sorted(id(param) for param in model.parameters() if param.requires_grad)
+
+
+def test_only_the_rows_of_the_words_of_a_batch_are_updated(sparse_model, corpus, dictionary):
+    model, config = sparse_model
+    split = optimizer.create_optimizer(model, config)
+    batch_session, length = helper.session_to_tensor(corpus.data[4], dictionary)
+    before = model.embedding.embedding.weight.detach().clone()
+    split.zero_grad()
+    loss, num_tokens = model(batch_session, length, True)
+    loss.backward()
+    assert model.embedding.embedding.weight.grad.is_sparse
+    helper.clip_grad_norm(model.parameters(), config.clip)
+    split.step()
+    changed = (model.embedding.embedding.weight.detach() != before).any(1)
+    # the decoder reads the start token before every target query
+    words = set(batch_session.view(-1).tolist()) | {dictionary.word2idx[dictionary.start_token]}
+    assert set(changed.nonzero().view(-1).tolist()) <= words
+    assert changed.any()
+
+
+def test_clipping_counts_sparse_gradients_like_dense_ones(sparse_model, corpus, dictionary):
+    model, config = sparse_model
+    batch_session, length = helper.session_to_tensor(corpus.data[4], dictionary)
+    loss, num_tokens = model(batch_session, length, True)
+    loss.backward()
+    dense_norm = sum(param.grad.to_dense().norm() ** 2 if param.grad.is_sparse else param.grad.norm() ** 2
+                     for param in model.parameters() if param.grad is not None) ** 0.5
+    assert abs(helper.clip_grad_norm(model.parameters(), 1e-3) - dense_norm.item()) < 1e-4
+    clipped_norm = sum(param.grad.to_dense().norm() ** 2 if param.grad.is_sparse else param.grad.norm() ** 2
+                       for param in model.parameters() if param.grad is not None) ** 0.5
+    assert abs(clipped_norm.item() - 1e-3) < 1e-5
+
+
+def test_the_state_only_loads_into_the_same_split(sparse_model, model, config):
+    sparse, sparse_config = sparse_model
+    split = optimizer.create_optimizer(sparse, sparse_config)
+    state = split.state_dict()
+    optimizer.create_optimizer(sparse, sparse_config).load_state_dict(state)
+    frozen = optimizer.SplitOptimizer([], [param for param in sparse.parameters()], sparse_config.lr)
+    with pytest.raises(AssertionError):
+        frozen.load_state_dict(state)
+    assert type(optimizer.create_optimizer(model, config)) == torch.optim.Adam
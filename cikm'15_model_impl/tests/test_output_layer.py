@@ -0,0 +1,53 @@
+import helper, pytest, torch
+from conftest import get_config
+from seq2seq import Sequence2Sequence
+
+
+def build(dictionary, *argv):
+    config = get_config(*argv)
+    torch.manual_seed(config.seed)
+    return Sequence2Sequence(dictionary, {}, config), config
+
+
+def test_the_full_layout_has_the_parameters_of_a_linear_layer(corpus, dictionary):
+    model, config = build(dictionary)
+    layer = model.decoder.out
+    assert sorted(name for name, _ in layer.named_parameters()) == ['bias', 'weight']
+    assert layer.weight.size() == (len(dictionary), config.nhid_session)
+    linear = torch.nn.Linear(config.nhid_session, len(dictionary))
+    # checkpoints of the linear output layer still load
+    layer.load_state_dict(linear.state_dict())
+    hidden = torch.randn(3, config.nhid_session)
+    assert torch.allclose(layer(hidden), linear(hidden), atol=1e-6)
+
+
+def test_the_tied_layout_trains_the_input_embeddings(corpus, dictionary):
+    model, config = build(dictionary, '--output_layer', 'tied')
+    full_model, _ = build(dictionary)
+    assert model.decoder.out.weight is model.embedding.embedding.weight
+    assert sum(param.numel() for param in model.parameters()) < sum(param.numel() for param in full_model.parameters())
+    model(*helper.session_to_tensor(corpus.data[4], dictionary)).backward()
+    # the gradient of the output layer reaches every row, not only the rows of the input words
+    assert (model.embedding.embedding.weight.grad.abs().sum(1) > 0).all()
+
+
+def test_the_tied_layout_rejects_sparse_embedding_gradients(dictionary):
+    with pytest.raises(AssertionError):
+        build(dictionary, '--output_layer', 'tied', '--sparse_embedding')
+
+
+def test_the_factorized_layout_has_a_rank_bottleneck(corpus, dictionary):
+    model, config = build(dictionary, '--output_layer', 'factorized', '--output_rank', '4')
+    layer = model.decoder.out
+    assert layer.weight.size() == (len(dictionary), 4)
+    assert layer.projection.weight.size() == (4, config.nhid_session)
+    assert layer.projection.bias is None
+
+
+@pytest.mark.parametrize('layout', ['full', 'tied', 'factorized'])
+def test_shortlisted_logits_are_the_selected_columns(dictionary, corpus, layout):
+    model, config = build(dictionary, '--output_layer', layout, '--output_rank', '4')
+    layer = model.decoder.out
+    hidden = torch.randn(3, config.nhid_session)
+    rows = torch.LongTensor([5, 0, 2])
+    assert torch.allclose(layer(hidden, layer.select_rows(rows)), layer(hidden).index_select(1, rows), atol=1e-6)
@@ -0,0 +1,11 @@
+import numpy as np
+import query_index
+
+
+def test_query_vectors_are_unit_length_and_do_not_depend_on_the_batch(dictionary, corpus, config, model):
+    model.eval()
+    queries = ['cheap flights', 'paris hotels unseenword', 'weather today']
+    vectors = query_index.encode_queries(model, dictionary, config, queries)
+    assert vectors.shape == (3, config.nhid_query) and vectors.dtype == np.float32
+    assert np.allclose(np.linalg.norm(vectors, axis=1), 1, atol=1e-5)
+    assert np.allclose(query_index.encode_queries(model, dictionary, config, queries[1:2]), vectors[1:2], atol=1e-5)
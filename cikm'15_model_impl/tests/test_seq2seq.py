@@ -0,0 +1,28 @@
+import helper, torch
+
+
+def session_queries(corpus, dictionary):
+    sessions, length = helper.session_to_tensor(corpus.data[4], dictionary)
+    return sessions.view(-1, sessions.size(-1))
+
+
+def test_repeated_queries_share_their_encoding(corpus, dictionary, model):
+    model.eval()
+    queries = session_queries(corpus, dictionary)
+    batch_queries = torch.cat([queries, queries[:2]])
+    with torch.no_grad():
+        expected = model.run_query_encoder(batch_queries)
+        output = model.encode_queries(batch_queries)
+    assert torch.allclose(output, expected, atol=1e-6)
+
+
+def test_cached_encodings_match_the_encoder(corpus, dictionary, model):
+    model.eval()
+    queries = session_queries(corpus, dictionary)
+    cache = helper.EncodingCache(100)
+    with torch.no_grad():
+        expected = model.run_query_encoder(queries)
+        model.encode_queries(queries[:3], cache)
+        output = model.encode_queries(queries, cache)
+    assert cache.hits >= 3
+    assert torch.allclose(output, expected, atol=1e-6)
@@ -0,0 +1,74 @@
+import os, cache, helper, suggest, shortlist, torch
+from common import normalizer
+
+
+def test_suggestions_do_not_depend_on_the_batch(model, dictionary, config):
+    suggester = suggest.Suggester(model, dictionary, config)
+    first = suggester.context_key(['cheap flights', 'paris hotels'])
+    second = suggester.context_key(['python list sort', 'python dict keys', 'weather today'])
+    assert suggester.generate([first]) == suggester.generate([first, second])[:1]
+    assert suggester.generate([second]) == suggester.generate([first, second])[1:]
+
+
+def test_shortlisted_suggestions_do_not_depend_on_the_batch(model, dictionary, config, data_dir, tmp_path):
+    config.shortlist, config.shortlist_file = True, str(tmp_path / 'shortlist.npz')
+    config.shortlist_frequent, config.shortlist_per_word, config.shortlist_min_count = 1, 2, 1
+    table = shortlist.build_shortlist(os.path.join(data_dir, 'session_train.txt'), dictionary,
+                                      normalizer.for_dictionary(dictionary), config)
+    table.save(config.shortlist_file)
+    suggester = suggest.Suggester(model, dictionary, config)
+    first = suggester.context_key(['cheap flights', 'paris hotels'])
+    second = suggester.context_key(['python list sort', 'python dict keys', 'weather today'])
+    rows, allowed = suggester.shortlist_rows([first, second])
+    # the contexts have their own shortlists, so every one of them only scores a part of the union
+    assert not allowed.all(dim=1).any()
+    assert suggester.generate([first]) == suggester.generate([first, second])[:1]
+    assert suggester.generate([second]) == suggester.generate([first, second])[1:]
+
+
+def test_context_key_keeps_the_last_queries(model, dictionary, config):
+    suggester = suggest.Suggester(model, dictionary, config)
+    key = suggester.context_key(['news today', 'cheap flights', 'unseenword', 'paris hotels'])
+    assert len(key) == config.context_window
+    unknown = dictionary.word2idx[dictionary.unknown_token]
+    end = dictionary.word2idx[dictionary.end_token]
+    assert key[0] == (dictionary.word2idx['cheap'], dictionary.word2idx['flights'], end)
+    assert key[1] == (unknown, end)
+
+
+def test_repeated_and_cached_contexts_are_generated_once(model, dictionary, config, monkeypatch):
+    suggester = suggest.Suggester(model, dictionary, config, cache.SuggestionCache(1 << 20))
+    generated = []
+    generate = suggester.generate
+    monkeypatch.setattr(suggester, 'generate', lambda keys: generated.extend(keys) or generate(keys))
+
+    context = ['cheap flights', 'paris hotels']
+    first = suggester.suggest([context, context, []])
+    assert len(generated) == 1
+    assert first[0] == first[1] and first[2] == []
+    assert suggester.suggest([context]) == first[:1]
+    assert len(generated) == 1 and suggester.cache.hits == 1
+
+
+def test_suggestions_are_distinct_queries(model, dictionary, config):
+    suggester = suggest.Suggester(model, dictionary, config)
+    suggestions = suggester.suggest([['cheap flights', 'paris hotels']])[0]
+    assert 0 < len(suggestions) <= config.num_suggestions
+    assert len(set(suggestions)) == len(suggestions)
+
+
+def test_loading_another_checkpoint_drops_cached_suggestions(model, dictionary, config, tmp_path):
+    first, second = str(tmp_path / 'first.pth.tar'), str(tmp_path / 'second.pth.tar')
+    helper.save_checkpoint({'state_dict': model.state_dict()}, first)
+    with torch.no_grad():
+        next(model.parameters()).add_(1)
+    helper.save_checkpoint({'state_dict': model.state_dict(), 'epoch': 1}, second)
+
+    suggester = suggest.Suggester(model, dictionary, config, cache.SuggestionCache(1 << 20))
+    suggester.load_checkpoint(first)
+    suggester.suggest([['cheap flights']])
+    assert len(suggester.cache) == 1
+    suggester.load_checkpoint(first)
+    assert len(suggester.cache) == 1
+    suggester.load_checkpoint(second)
+    assert len(suggester.cache) == 0
@@ -0,0 +1,70 @@
+import data, helper, torch, train
+from common import telemetry
+
+# sessions of three queries of two words each, which are batched without padding
+SAME_SHAPE = ['cheap flights:::paris hotels:::weather today', 'python list:::world news:::news today',
+              'cheap hotels:::paris flights:::weather paris']
+
+
+def gradients(model):
+    return [param.grad.clone() for param in model.parameters() if param.grad is not None]
+
+
+def dense(grad):
+    return grad.to_dense() if grad.is_sparse else grad
+
+
+def same_shape_sessions(dictionary, config):
+    sessions = []
+    for line in SAME_SHAPE:
+        session = data.Session()
+        session.form_session(line.split(':::'), dictionary, config.max_length, True)
+        sessions.append(session)
+    return sessions
+
+
+def test_the_loss_of_a_step_is_the_mean_over_the_target_tokens(trainer, corpus, model, dictionary):
+    batch = corpus.data[4]
+    loss, num_tokens = model(*helper.session_to_tensor(batch, dictionary), token_sum=True)
+    # the first query of a session is not a target
+    assert num_tokens.item() == sum(len(query) for session in batch for query in session.queries[1:])
+    assert abs(trainer.train_step([batch]) - loss.item() / num_tokens.item()) < 1e-5
+
+
+def test_accumulated_batches_have_the_gradients_of_one_batch(trainer, corpus, model, dictionary, config):
+    batch = same_shape_sessions(dictionary, config)
+    model.zero_grad()
+    single = trainer.accumulate_gradients([batch])
+    expected = gradients(model)
+    model.zero_grad()
+    assert abs(trainer.accumulate_gradients([batch[:1], batch[1:]]) - single) < 1e-5
+    for grad, expected_grad in zip(gradients(model), expected):
+        assert torch.allclose(dense(grad), dense(expected_grad), atol=1e-6)
+
+
+def test_the_dev_loss_is_the_mean_over_the_target_tokens(corpus, model, dictionary, config):
+    batch = same_shape_sessions(dictionary, config)
+    dev_loss = train.compute_dev_loss(model, [batch], dictionary, config)
+    assert abs(train.compute_dev_loss(model, [batch[:1], batch[1:]], dictionary, config) - dev_loss) < 1e-5
+    assert model.training
+
+
+def test_telemetry_counts_the_target_tokens(trainer, corpus, model, dictionary, tmp_path):
+    trainer.telemetry = telemetry.Telemetry(str(tmp_path / 'telemetry.jsonl'), 100)
+    batch = corpus.data[4]
+    train_sessions, length = trainer.batch_to_tensors(batch)
+    assert trainer.telemetry.num_sequences == len(batch)
+    assert trainer.telemetry.num_tokens == model(train_sessions, length, True)[1].item()
+
+
+def test_the_validation_process_computes_the_dev_loss(trainer, corpus, model, dictionary, config):
+    batches = helper.batchify(corpus.data, 4)[:2]
+    dev_loss = train.compute_dev_loss(model, batches, dictionary, config)
+    process = train.ValidationProcess(model, batches, dictionary, config)
+    try:
+        process.submit(trainer.training_state(1, 1))
+        result, state = process.collect()
+    finally:
+        process.close()
+    assert abs(result - dev_loss) < 1e-5
+    assert state['batch'] == 1
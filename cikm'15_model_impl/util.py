@@ -6,8 +6,12 @@
 # File Description: This script contains all the command line arguments.
 ###############################################################################
 
+import os, sys, json
 from argparse import ArgumentParser
 
+# the scripts import util first, which makes the modules shared by both models importable as the common package
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
 
 def get_args():
     parser = ArgumentParser(description='seq2seq_language_model')
@@ -63,6 +67,154 @@ def get_args():
                         help='GloVe word embedding version')
     parser.add_argument('--word_vectors_directory', type=str, default='../data/glove/',
                         help='Path of GloVe word embeddings')
+    parser.add_argument('--checkpoint', type=str, default='',
+                        help='checkpoint or inference weights file used for inference (default: model_best.pth.tar '
+                             'under save_path)')
+    parser.add_argument('--beam_size', type=int, default=5,
+                        help='beam size used to generate suggestions')
+    parser.add_argument('--num_suggestions', type=int, default=5,
+                        help='number of suggestions returned for a context')
+    parser.add_argument('--context_window', type=int, default=3,
+                        help='number of previous queries used as the context of a suggestion')
+    parser.add_argument('--top_n_contexts', type=int, default=100000,
+                        help='number of most frequent contexts to precompute suggestions for')
+    parser.add_argument('--cache_size', type=int, default=256,
+                        help='size bound of the suggestion cache in megabytes')
+    parser.add_argument('--cache_ttl', type=int, default=86400,
+                        help='time to live of a cached suggestion in seconds (0 = never expires)')
+    parser.add_argument('--cache_snapshot', type=str, default='../output_session/suggestion_cache.p',
+                        help='snapshot of precomputed suggestions')
+    parser.add_argument('--test_file', type=str, default='session_test.txt',
+                        help='session file used for offline suggestion and evaluation')
+    parser.add_argument('--output_dir', type=str, default='../output_session/suggestions/',
+                        help='directory where the sharded suggestions are written')
+    parser.add_argument('--num_workers', type=int, default=1,
+                        help='number of worker processes, each one loads the model once')
+    parser.add_argument('--num_threads', type=int, default=1,
+                        help='number of intra-op threads of each worker process')
+    parser.add_argument('--num_interop_threads', type=int, default=0,
+                        help='number of inter-op threads of the training process (0 = PyTorch default)')
+    parser.add_argument('--num_shards', type=int, default=64,
+                        help='number of shards the session file is split into')
+    parser.add_argument('--candidates', type=str, default='mined', choices=['mined', 'sampled'],
+                        help='negative candidates used to rank the next query during evaluation')
+    parser.add_argument('--num_candidates', type=int, default=19,
+                        help='number of negative candidates ranked along with the next query')
+    parser.add_argument('--candidate_pool', type=int, default=50000,
+                        help='number of most frequent training queries negative candidates are sampled from')
+    parser.add_argument('--recall_at', type=int, nargs='+', default=[1, 5, 10],
+                        help='cutoffs of the recall of the next query')
+    parser.add_argument('--index_dir', type=str, default='../output_session/query_index/',
+                        help='directory of the query embedding index')
+    parser.add_argument('--index_dtype', type=str, default='float32', choices=['float32', 'float16'],
+                        help='data type of the stored query embeddings')
+    parser.add_argument('--encode_batch_size', type=int, default=2048,
+                        help='number of queries encoded at once while building the query index')
+    parser.add_argument('--num_clusters', type=int, default=0,
+                        help='number of clusters of the coarse query index (0 = exact search only)')
+    parser.add_argument('--kmeans_iterations', type=int, default=10,
+                        help='number of k-means iterations used to build the coarse query index')
+    parser.add_argument('--num_probes', type=int, default=8,
+                        help='number of clusters searched by the coarse query index')
+    parser.add_argument('--max_documents', type=int, default=50,
+                        help='maximum number of documents of a result page')
+    parser.add_argument('--max_title_length', type=int, default=20,
+                        help='maximum length of a document title')
+    parser.add_argument('--click_use_query', action='store_true',
+                        help='feed the query encoding along with the session encoding to the click scorer')
+    parser.add_argument('--freeze_encoders', action='store_true',
+                        help='train only the click scorer on top of the pretrained encoders')
+    parser.add_argument('--distributed', action='store_true',
+                        help='train with one process per worker, launched by torchrun')
+    parser.add_argument('--dist_backend', type=str, default='gloo',
+                        help='backend of distributed training (gloo for CPU, nccl for GPU)')
+    parser.add_argument('--accumulate_steps', type=int, default=1,
+                        help='number of batches whose gradients are accumulated before an optimizer step')
+    parser.add_argument('--keep_checkpoints', type=int, default=3,
+                        help='number of periodic checkpoints kept, saved every save_every batches (0 = keep all)')
+    parser.add_argument('--telemetry_file', type=str, default='',
+                        help='JSON lines file of the training stage timings and throughput (default: disabled)')
+    parser.add_argument('--telemetry_interval', type=int, default=100,
+                        help='number of batches summarized by a telemetry record')
+    parser.add_argument('--dev_sample', type=int, default=0,
+                        help='number of dev batches of the stratified sample used by the validation checks (0 = all)')
+    parser.add_argument('--async_validation', action='store_true',
+                        help='validate weight snapshots in a separate process while training continues (CPU only)')
+    parser.add_argument('--plot_mode', type=str, default='async', choices=['async', 'sync', 'none'],
+                        help='save the loss plots on a background thread, in the training loop or not at all')
+    parser.add_argument('--sparse_embedding', action='store_true',
+                        help='use sparse gradients for the word embeddings, updated by SparseAdam')
+    parser.add_argument('--vocab_sizes', type=int, nargs='+', default=[10000, 100000, 500000],
+                        help='vocabulary sizes of the embedding benchmark')
+    parser.add_argument('--benchmark_steps', type=int, default=20,
+                        help='number of timed training steps of a benchmark')
+    parser.add_argument('--session_window', type=int, default=0,
+                        help='number of last queries of a session kept for training, at least 3 (0 = all)')
+    parser.add_argument('--bptt_chunk', type=int, default=0,
+                        help='number of session queries backpropagated through at a time (0 = whole sessions)')
+    parser.add_argument('--encoding_cache_size', type=int, default=100000,
+                        help='number of query encodings cached during inference (0 = no cache)')
+    parser.add_argument('--output_layer', type=str, default='full', choices=['full', 'tied', 'factorized'],
+                        help='vocabulary projection: a full matrix, tied to the input embeddings through a projection '
+                             'to emsize, or factorized through a rank output_rank bottleneck')
+    parser.add_argument('--output_rank', type=int, default=128,
+                        help='rank of the factorized output layer')
+    parser.add_argument('--normalizer', type=str, default='split', choices=['split', 'wordpunct'],
+                        help='how queries are split into terms when the dictionary is built, which inference follows: '
+                             'on whitespace, or lowercased and split into words without punctuation')
+    parser.add_argument('--normalizer_cache_size', type=int, default=100000,
+                        help='number of distinct raw queries whose terms are cached by the normalizer')
+    parser.add_argument('--profile_steps', type=str, default='',
+                        help='steps profiled, e.g. 100-120: optimizer steps in training, batches of a worker in '
+                             'evaluation and bulk suggestion, input lines in suggest.py (default: no profiling)')
+    parser.add_argument('--profile_dir', type=str, default='../output_session/profile/',
+                        help='directory the profiler traces and operator tables are written to')
+    parser.add_argument('--shortlist', action='store_true',
+                        help='decode suggestions over the vocabulary shortlist of every context built by shortlist.py')
+    parser.add_argument('--shortlist_file', type=str, default='',
+                        help='vocabulary shortlist table (default: shortlist.npz under save_path)')
+    parser.add_argument('--shortlist_frequent', type=int, default=2000,
+                        help='number of the most frequent next-query words shortlisted for every context')
+    parser.add_argument('--shortlist_per_word', type=int, default=100,
+                        help='number of the words that most often follow a context word shortlisted for it')
+    parser.add_argument('--shortlist_min_count', type=int, default=2,
+                        help='number of times a word must follow a context word to be shortlisted for it')
+    parser.add_argument('--warm_start', default='', type=str, metavar='PATH',
+                        help='start a new training run from a checkpoint and the dictionary.p next to it, growing '
+                             'the vocabulary with the new words of the corpus (default: none)')
+    parser.add_argument('--stream', type=str, default='',
+                        help='session log file, or directory of rotating session log shards, tailed by '
+                             'online_train.py (default: none)')
+    parser.add_argument('--online_dir', type=str, default='',
+                        help='directory of the online checkpoint and the published weights (default: online under '
+                             'save_path)')
+    parser.add_argument('--replay_size', type=int, default=100000,
+                        help='number of past training examples kept in the replay buffer of online training')
+    parser.add_argument('--replay_ratio', type=float, default=0.5,
+                        help='share of every online batch drawn from the replay buffer')
+    parser.add_argument('--replay_file', type=str, default='',
+                        help='session file the replay buffer is seeded with, e.g. session_train.txt (default: none)')
+    parser.add_argument('--online_max_steps', type=int, default=10,
+                        help='number of optimizer steps taken at most after every poll of the session logs')
+    parser.add_argument('--online_max_pending', type=int, default=50000,
+                        help='number of new examples waiting to be trained on, older ones go to the replay buffer')
+    parser.add_argument('--poll_interval', type=float, default=5,
+                        help='seconds waited before polling the session logs again when nothing new was read')
+    parser.add_argument('--publish_every', type=float, default=600,
+                        help='seconds between two publications of the online weights and checkpoint')
+    parser.add_argument('--reload_every', type=float, default=0,
+                        help='seconds between two checks of suggest.py for new weights in its checkpoint file, e.g. '
+                             'published by online_train.py (0 = never)')
+    parser.add_argument('--tuned_config', type=str, default='',
+                        help='config file written by benchmarks/autotune.py, whose batch size and thread counts '
+                             'replace the defaults; arguments given on the command line still take precedence')
 
     args = parser.parse_args()
+    if args.tuned_config:
+        with open(args.tuned_config, 'r') as f:
+            parser.set_defaults(**json.load(f)['settings'])
+        args = parser.parse_args()
+    if args.session_window < 0 or 0 < args.session_window < 3:
+        # sessions of less than 3 queries are dropped, so a shorter window would drop all of them
+        parser.error('--session_window must be 0 or at least 3')
     return args
@@ -0,0 +1,47 @@
+###############################################################################
+# Author: agent
+# Project: Context-aware Query Suggestion
+# Date Created: 10/18/2026
+#
+# File Description: This script contains the cache of query encodings used by
+# the inference scripts of both models, so that frequent queries are only
+# encoded once.
+###############################################################################
+
+import torch
+from collections import OrderedDict
+
+
+class EncodingCache(object):
+    """LRU cache of query encodings keyed by the token indices of the padded queries, bounded by a number of queries.
+    The encoding of a query is a tuple of tensors, the rows of the encoder outputs that belong to it."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        # key -> encoding, ordered from least to most recently used
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def encode(self, batch_queries, encode_rows):
+        """Returns the encodings of a batch of queries stacked along the first dimension. The distinct queries that
+        are not cached are encoded in one batch by encode_rows, which returns a tuple of tensors with one row each."""
+        keys = [tuple(row) for row in batch_queries.tolist()]
+        encodings = OrderedDict()
+        for key in keys:
+            if key not in encodings:
+                encodings[key] = self.entries.get(key)
+                if encodings[key] is not None:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+        missing = [key for key, encoding in encodings.items() if encoding is None]
+        self.misses += len(missing)
+        if missing:
+            outputs = encode_rows(batch_queries.new_tensor(missing))
+            for i, key in enumerate(missing):
+                # the rows are copied so that an entry does not keep the outputs of the whole batch alive
+                encodings[key] = tuple(output[i].clone() for output in outputs)
+                self.entries[key] = encodings[key]
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return tuple(torch.stack([encodings[key][i] for key in keys]) for i in range(len(encodings[keys[0]])))
@@ -0,0 +1,45 @@
+###############################################################################
+# Author: agent
+# Project: Context-aware Query Suggestion
+# Date Created: 10/18/2026
+#
+# File Description: This script converts a training checkpoint of either
+# model to the inference weights format. It is run from the root of the
+# repository with python -m common.export_weights.
+###############################################################################
+
+import os, torch
+from argparse import ArgumentParser
+from collections import OrderedDict
+from common import weights
+
+
+def get_args(argv=None):
+    parser = ArgumentParser(description='export_weights')
+    parser.add_argument('--save_path', type=str, default='output/',
+                        help='directory of the training run')
+    parser.add_argument('--checkpoint', type=str, default='',
+                        help='checkpoint to convert (default: model_best.pth.tar under save_path)')
+    return parser.parse_args(argv)
+
+
+def export_checkpoint(checkpoint_path):
+    """Writes the model parameters of a checkpoint next to it, with the .weights extension, and returns the path of
+    the weights file and its number of tensors."""
+    checkpoint = torch.load(checkpoint_path, map_location=lambda storage, loc: storage)
+    # the optimizer state and the training history are dropped, as is the prefix of a data parallel model
+    state_dict = OrderedDict((key[7:] if key.startswith('module.') else key, value)
+                             for key, value in checkpoint['state_dict'].items())
+    weights_path = (checkpoint_path[:-len('.pth.tar')] if checkpoint_path.endswith('.pth.tar') else
+                    checkpoint_path) + '.weights'
+    weights.save_inference_weights(state_dict, weights_path)
+    return weights_path, len(state_dict)
+
+
+if __name__ == '__main__':
+    args = get_args()
+    checkpoint_path = args.checkpoint if args.checkpoint else args.save_path + 'model_best.pth.tar'
+    assert os.path.exists(checkpoint_path)
+    weights_path, num_tensors = export_checkpoint(checkpoint_path)
+    print('%d tensors written to %s (%.1f MB)' % (num_tensors, weights_path,
+                                                  os.path.getsize(weights_path) / 1024 / 1024))
@@ -0,0 +1,77 @@
+###############################################################################
+# Author: agent
+# Project: Context-aware Query Suggestion
+# Date Created: 10/18/2026
+#
+# File Description: This script provides the query normalizer that splits raw
+# queries into terms, shared by corpus loading and every inference script of
+# both models so that training and serving see the same terms.
+###############################################################################
+
+import re, string
+from collections import OrderedDict
+
+# the pattern of nltk's wordpunct_tokenize: runs of word characters and runs of other non-space characters
+WORDPUNCT_PATTERN = re.compile(r'\w+|[^\w\s]+')
+PUNCTUATION_PATTERN = re.compile('[%s]+' % re.escape(string.punctuation))
+
+
+def split_terms(query):
+    """Splits a query on whitespace."""
+    return query.split()
+
+
+def wordpunct_terms(query):
+    """Lowercases a query, splits it into words and punctuation and drops the tokens made of punctuation only."""
+    return [token for token in WORDPUNCT_PATTERN.findall(query.lower()) if not PUNCTUATION_PATTERN.fullmatch(token)]
+
+
+MODES = {'split': split_terms, 'wordpunct': wordpunct_terms}
+
+
+class QueryNormalizer(object):
+    """Splits raw queries into terms in one of the MODES, with an LRU cache of the terms of the last cache_size
+    distinct raw queries."""
+
+    def __init__(self, mode='split', cache_size=100000):
+        assert mode in MODES, 'unknown normalizer %s' % mode
+        self.mode = mode
+        self.terms = MODES[mode]
+        self.cache_size = cache_size
+        # raw query -> tuple of terms, ordered from least to most recently used
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def normalize(self, query):
+        """Returns the terms of a raw query as a new list, which the caller may modify."""
+        terms = self.cache.get(query)
+        if terms is not None:
+            self.cache.move_to_end(query)
+            self.hits += 1
+            return list(terms)
+        self.misses += 1
+        terms = self.terms(query)
+        if self.cache_size > 0:
+            self.cache[query] = tuple(terms)
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return terms
+
+    def normalize_batch(self, queries):
+        """Returns the terms of every raw query of a list, normalizing each distinct query once."""
+        normalized = {}
+        for query in queries:
+            if query not in normalized:
+                normalized[query] = self.normalize(query)
+        return [list(normalized[query]) for query in queries]
+
+    def join(self, query):
+        """Returns the normalized form of a raw query as a string, its terms separated by single spaces."""
+        return ' '.join(self.normalize(query))
+
+
+def for_dictionary(dictionary, cache_size=100000):
+    """Returns a normalizer in the mode a dictionary was built with. Dictionaries saved before the mode was recorded
+    were built by splitting on whitespace."""
+    return QueryNormalizer(getattr(dictionary, 'normalizer', 'split'), cache_size)
@@ -0,0 +1,50 @@
+###############################################################################
+# Author: agent
+# Project: Context-aware Query Suggestion
+# Date Created: 10/18/2026
+#
+# File Description: This script saves the loss plots of a training run of
+# either model from the loss history stored in its checkpoint, e.g. after
+# training with --plot_mode none. It is run from the root of the repository
+# with python -m common.plot_losses.
+###############################################################################
+
+import glob, torch
+from argparse import ArgumentParser
+from common import plots
+
+LOSSES = [('training', 'train_losses'), ('dev', 'dev_losses'), ('full_dev', 'full_dev_losses')]
+
+
+def get_args(argv=None):
+    parser = ArgumentParser(description='loss_plots')
+    parser.add_argument('--save_path', type=str, default='output/',
+                        help='directory of the training run, where the plots are saved')
+    parser.add_argument('--checkpoint', type=str, default='',
+                        help='checkpoint holding the loss history (default: the latest periodic checkpoint, '
+                             'else model_best.pth.tar under save_path)')
+    return parser.parse_args(argv)
+
+
+def latest_checkpoint(save_path):
+    """Returns the latest periodic checkpoint under save_path, which holds the longest loss history."""
+    checkpoints = sorted(glob.glob(glob.escape(save_path) + 'checkpoint_*.pth.tar'))
+    return checkpoints[-1] if checkpoints else save_path + 'model_best.pth.tar'
+
+
+def save_loss_plots(filename, save_path):
+    """Saves the plots of every loss history of the checkpoint under save_path and returns their file tags."""
+    checkpoint = torch.load(filename, map_location=lambda storage, loc: storage)
+    filetags = []
+    for filetag, key in LOSSES:
+        if checkpoint.get(key):
+            plots.save_plot(checkpoint[key], save_path, filetag, checkpoint['epoch'] + 1)
+            filetags.append(filetag)
+    return filetags
+
+
+if __name__ == '__main__':
+    args = get_args()
+    filename = args.checkpoint if args.checkpoint else latest_checkpoint(args.save_path)
+    save_loss_plots(filename, args.save_path)
+    print("=> saved the loss plots of '{}' under '{}'".format(filename, args.save_path))
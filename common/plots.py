@@ -0,0 +1,63 @@
+###############################################################################
+# Author: agent
+# Project: Context-aware Query Suggestion
+# Date Created: 10/18/2026
+#
+# File Description: This script saves the loss plots of both models, either
+# in the calling thread or on a background thread. Matplotlib is imported on
+# first use only.
+###############################################################################
+
+import os, glob, queue, threading
+
+
+def load_pyplot():
+    """Imports matplotlib with the Agg backend on first use, so that scripts which never plot do not load it."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import matplotlib.ticker as ticker
+    return plt, ticker
+
+
+def save_plot(points, filepath, filetag, epoch):
+    """Generate and save the plot"""
+    path_prefix = os.path.join(filepath, filetag + '_loss_plot_')
+    path = path_prefix + 'epoch_{}.png'.format(epoch)
+    plt, ticker = load_pyplot()
+    fig, ax = plt.subplots()
+    loc = ticker.MultipleLocator(base=0.2)  # this locator puts ticks at regular intervals
+    ax.yaxis.set_major_locator(loc)
+    ax.plot(points)
+    fig.savefig(path)
+    plt.close(fig)  # close the figure
+    for f in glob.glob(path_prefix + '*'):
+        if f != path:
+            os.remove(f)
+
+
+class PlotWriter(object):
+    """Saves loss plots on a background thread, which is the only thread that uses matplotlib."""
+
+    def __init__(self):
+        self.requests = queue.Queue()
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def run(self):
+        while True:
+            points, filepath, filetag, epoch = self.requests.get()
+            try:
+                save_plot(points, filepath, filetag, epoch)
+            except Exception as e:
+                print('failed to save the %s loss plot: %s' % (filetag, e))
+            self.requests.task_done()
+
+    def save(self, points, filepath, filetag, epoch):
+        # the points are copied since training keeps appending to them
+        self.requests.put((list(points), filepath, filetag, epoch))
+
+    def wait(self):
+        """Blocks until every queued plot is saved."""
+        self.requests.join()
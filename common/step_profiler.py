@@ -0,0 +1,89 @@
+###############################################################################
+# Author: agent
+# Project: Context-aware Query Suggestion
+# Date Created: 10/18/2026
+#
+# File Description: This script runs the PyTorch profiler over a range of
+# training or inference steps and writes a Chrome trace and a table of the
+# most expensive operators, with named ranges for the parts of both models.
+###############################################################################
+
+import os, sys, contextlib, torch
+import multiprocessing.util
+
+NULL_RANGE = contextlib.nullcontext()
+# set while a profiler records, so that the named ranges cost nothing otherwise
+recording = False
+
+
+def record(name):
+    """Returns a context manager that marks the operators run inside it as range name in the profile."""
+    return torch.profiler.record_function(name) if recording else NULL_RANGE
+
+
+def parse_steps(spec):
+    """Returns the first and last step of a range given as first-last or as a single step."""
+    first, _, last = spec.partition('-')
+    return int(first), int(last or first)
+
+
+class StepProfiler(object):
+    """Profiles the steps first to last (counted from 1) of a loop; disabled when steps is empty.
+
+    Call begin and end around every step. The trace and the table are written to directory when the last step ends
+    or, if the loop stops earlier, when finish is called; a pool worker calls finish_at_exit once instead."""
+
+    def __init__(self, steps, directory, name, cuda=False, row_limit=30):
+        self.enabled = bool(steps)
+        self.first, self.last = parse_steps(steps) if steps else (0, -1)
+        self.directory = directory
+        self.name = name
+        self.cuda = cuda
+        self.row_limit = row_limit
+        self.profile = None
+        self.last_step = 0
+
+    def begin(self, step_no):
+        global recording
+        if self.enabled and self.profile is None and self.first <= step_no <= self.last:
+            activities = [torch.profiler.ProfilerActivity.CPU]
+            if self.cuda:
+                activities.append(torch.profiler.ProfilerActivity.CUDA)
+            self.profile = torch.profiler.profile(activities=activities, record_shapes=True)
+            self.profile.start()
+            self.first = step_no
+            recording = True
+
+    def end(self, step_no):
+        if self.profile is not None:
+            self.last_step = step_no
+            if step_no >= self.last:
+                self.finish()
+
+    def finish_at_exit(self):
+        """Calls finish when the process exits, so that a worker whose steps are spread over several tasks writes the
+        range it left open once, after its last task."""
+        multiprocessing.util.Finalize(self, self.finish, exitpriority=0)
+
+    def finish(self):
+        """Stops profiling and writes the trace and the operator table of the steps profiled so far."""
+        global recording
+        if self.profile is None:
+            return
+        self.profile.stop()
+        recording = False
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        # worker processes profile their own steps, so the process id is part of the file names
+        prefix = os.path.join(self.directory, '%s_%d_steps_%d-%d' % (self.name, os.getpid(), self.first,
+                                                                        self.last_step))
+        self.profile.export_chrome_trace(prefix + '.json')
+        table = self.profile.key_averages().table(
+            sort_by='self_cuda_time_total' if self.cuda else 'self_cpu_time_total', row_limit=self.row_limit)
+        with open(prefix + '.txt', 'w') as f:
+            f.write(table + '\n')
+        # printed to the standard error, since the standard output of some scripts is their result
+        print('profile of steps %d-%d written to %s.json' % (self.first, self.last_step, prefix), file=sys.stderr)
+        print(table, file=sys.stderr)
+        self.profile = None
+        self.enabled = False
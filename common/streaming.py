@@ -0,0 +1,128 @@
+###############################################################################
+# Author: agent
+# Project: Context-aware Query Suggestion
+# Date Created: 10/18/2026
+#
+# File Description: This script contains the tail of the live session logs
+# and the replay buffer used by the online training scripts of both models.
+###############################################################################
+
+import glob, os, random
+
+
+class LogTail(object):
+    """Reads the lines appended to a log file, or to the shard files of a log directory from the oldest to the newest,
+    since the last poll. The offsets of the files can be saved and given back to continue where a previous tail
+    stopped."""
+
+    def __init__(self, path, offsets=None, pattern='*'):
+        self.path = path
+        self.pattern = pattern
+        # (device, inode) -> byte offset of the first unread line, so that a shard renamed by a rotation keeps its
+        # offset
+        self.offsets = dict(offsets or {})
+
+    def files(self):
+        """Returns the name and the stat of every log file, the least recently modified first."""
+        if os.path.isdir(self.path):
+            filenames = glob.glob(os.path.join(glob.escape(self.path), self.pattern))
+        else:
+            filenames = [self.path]
+        files = []
+        for filename in filenames:
+            try:
+                stat = os.stat(filename)
+            except OSError:
+                # removed since it was listed
+                continue
+            if os.path.isfile(filename):
+                files.append((stat.st_mtime, filename, stat))
+        return [(filename, stat) for _, filename, stat in sorted(files)]
+
+    def poll(self, max_bytes=1 << 20):
+        """Returns the stripped non-empty complete lines appended since the last poll, reading about max_bytes at
+        most. A partial last line is returned once it is complete."""
+        files = self.files()
+        for key in set(self.offsets) - set((stat.st_dev, stat.st_ino) for _, stat in files):
+            # a rotated shard that was removed
+            del self.offsets[key]
+        lines = []
+        for filename, stat in files:
+            if max_bytes <= 0:
+                break
+            key = (stat.st_dev, stat.st_ino)
+            offset = self.offsets.get(key, 0)
+            if stat.st_size < offset:
+                # the file was truncated, it is read again from its start
+                offset = 0
+            if stat.st_size > offset:
+                with open(filename, 'rb') as f:
+                    f.seek(offset)
+                    chunk = f.read(min(stat.st_size - offset, max_bytes))
+                    if b'\n' not in chunk and len(chunk) == max_bytes:
+                        # a line longer than the budget is read whole
+                        f.seek(offset)
+                        chunk = f.readline()
+                end = chunk.rfind(b'\n') + 1
+                lines.extend(line.strip() for line in chunk[:end].decode('utf-8', errors='replace').split('\n')
+                             if line.strip())
+                offset += end
+                max_bytes -= end
+            self.offsets[key] = offset
+        return lines
+
+
+class ReplayBuffer(object):
+    """Uniform reservoir sample of at most capacity of the examples added so far. Every example has a key, e.g. the
+    length of a session, and a sample only draws examples of one key, so that they can form a batch."""
+
+    def __init__(self, capacity, seed):
+        self.capacity = capacity
+        self.rng = random.Random(seed)
+        self.examples = []
+        self.keys = []
+        # key -> slots of its examples, and the position of every slot in the list of its key
+        self.slots = {}
+        self.positions = []
+        self.seen = 0
+
+    def add(self, example, key=None):
+        self.seen += 1
+        if len(self.examples) < self.capacity:
+            slot = len(self.examples)
+            self.examples.append(None)
+            self.keys.append(None)
+            self.positions.append(None)
+        else:
+            # every example added so far is kept with the same probability
+            slot = self.rng.randrange(self.seen)
+            if slot >= self.capacity:
+                return
+            self.remove(slot)
+        self.examples[slot] = example
+        self.keys[slot] = key
+        slots = self.slots.setdefault(key, [])
+        self.positions[slot] = len(slots)
+        slots.append(slot)
+
+    def remove(self, slot):
+        """Removes the example of a slot from the list of its key, by moving the last slot of the list in its place."""
+        key = self.keys[slot]
+        slots = self.slots[key]
+        last = slots.pop()
+        if last != slot:
+            slots[self.positions[slot]] = last
+            self.positions[last] = self.positions[slot]
+        if not slots:
+            del self.slots[key]
+
+    def count(self, key=None):
+        return len(self.slots.get(key, []))
+
+    def sample(self, n, key=None):
+        """Returns up to n distinct examples of a key drawn uniformly."""
+        slots = self.slots.get(key, [])
+        return [self.examples[slot] for slot in self.rng.sample(slots, min(n, len(slots)))]
+
+    def __len__(self):
+        return len(self.examples)
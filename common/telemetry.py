@@ -0,0 +1,88 @@
+###############################################################################
+# Author: agent
+# Project: Context-aware Query Suggestion
+# Date Created: 10/18/2026
+#
+# File Description: This script contains the training telemetry, which times
+# the stages of the training steps, counts the throughput and writes them as
+# JSON lines. It is shared by the training of both models.
+###############################################################################
+
+import os, json, time, resource, contextlib, torch
+
+NULL_STAGE = contextlib.nullcontext()
+
+
+def current_rss():
+    """Returns the resident set size of the process in megabytes."""
+    if os.path.isfile('/proc/self/statm'):
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * resource.getpagesize() / 1024 / 1024
+    # peak instead of current resident set size where /proc is not available
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Telemetry(object):
+    """Accumulates the time of every stage of the training steps and appends one JSON record per interval steps.
+
+    Telemetry is disabled when filename is empty, stages then cost a shared no-op context manager. With synchronize,
+    CUDA kernels are waited for at the end of every stage so that the time is charged to the stage that queued them.
+    """
+
+    def __init__(self, filename, interval, synchronize=False):
+        self.enabled = bool(filename)
+        self.filename = filename
+        self.interval = interval
+        self.synchronize = synchronize
+        self.reset()
+
+    def reset(self):
+        self.start = time.time()
+        self.stages = {}
+        self.num_steps = 0
+        self.num_sequences = 0
+        self.num_tokens = 0
+        self.loss_total = 0
+
+    @contextlib.contextmanager
+    def timed_stage(self, name):
+        start = time.time()
+        yield
+        if self.synchronize:
+            torch.cuda.synchronize()
+        self.stages[name] = self.stages.get(name, 0) + time.time() - start
+
+    def stage(self, name):
+        """Returns a context manager that adds the time spent inside it to stage name."""
+        return self.timed_stage(name) if self.enabled else NULL_STAGE
+
+    def count(self, num_sequences, num_tokens):
+        self.num_sequences += num_sequences
+        self.num_tokens += num_tokens
+
+    def step(self, epoch_no, batch_no, loss):
+        """Ends a training step and writes a record every interval steps."""
+        if not self.enabled:
+            return
+        self.num_steps += 1
+        self.loss_total += loss
+        if self.num_steps == self.interval:
+            self.write(epoch_no, batch_no)
+
+    def write(self, epoch_no, batch_no):
+        elapsed = time.time() - self.start
+        record = {
+            'time': time.time(),
+            'epoch': epoch_no,
+            'batch': batch_no,
+            'steps': self.num_steps,
+            'elapsed': elapsed,
+            'loss': self.loss_total / self.num_steps,
+            'sequences_per_sec': self.num_sequences / elapsed,
+            'tokens_per_sec': self.num_tokens / elapsed,
+            'rss_mb': current_rss(),
+            'stages': self.stages,
+        }
+        with open(self.filename, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+        self.reset()
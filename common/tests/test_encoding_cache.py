@@ -0,0 +1,48 @@
+import torch
+from common.encoding_cache import EncodingCache
+
+
+class CountingEncoder(object):
+    """Encodes a query as its sum and its length, and records the queries it encodes."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, rows):
+        self.calls.append(rows.tolist())
+        return rows.sum(1).float(), (rows != 0).sum(1)
+
+
+def test_distinct_queries_are_encoded_once():
+    cache, encoder = EncodingCache(10), CountingEncoder()
+    batch = torch.LongTensor([[1, 2], [3, 0], [1, 2]])
+    sums, lengths = cache.encode(batch, encoder)
+    assert sums.tolist() == [3.0, 3.0, 3.0]
+    assert lengths.tolist() == [2, 1, 2]
+    assert encoder.calls == [[[1, 2], [3, 0]]]
+    assert (cache.hits, cache.misses) == (0, 2)
+
+    sums, lengths = cache.encode(torch.LongTensor([[3, 0], [4, 4]]), encoder)
+    assert sums.tolist() == [3.0, 8.0]
+    assert encoder.calls[1:] == [[[4, 4]]]
+    assert (cache.hits, cache.misses) == (1, 3)
+
+
+def test_the_least_recently_used_queries_are_evicted():
+    cache, encoder = EncodingCache(2), CountingEncoder()
+    cache.encode(torch.LongTensor([[1], [2]]), encoder)
+    # 1 becomes the most recently used query, so 2 is evicted by 3
+    cache.encode(torch.LongTensor([[1]]), encoder)
+    cache.encode(torch.LongTensor([[3]]), encoder)
+    assert list(cache.entries.keys()) == [(1,), (3,)]
+    cache.encode(torch.LongTensor([[2], [3]]), encoder)
+    assert encoder.calls[-1] == [[2]]
+
+
+def test_the_cached_rows_do_not_keep_the_batch_alive():
+    cache = EncodingCache(10)
+    outputs = torch.arange(6.).view(3, 2)
+    cache.encode(torch.LongTensor([[1], [2], [3]]), lambda rows: (outputs,))
+    outputs.zero_()
+    assert cache.entries[(2,)][0].tolist() == [2.0, 3.0]
+    assert cache.entries[(2,)][0].untyped_storage().nbytes() == 2 * 4
@@ -0,0 +1,46 @@
+from common import normalizer
+
+
+class OldDictionary(object):
+    """A dictionary saved before the normalizer mode was recorded."""
+
+
+def test_the_modes_split_the_queries():
+    query = 'Cheap   Flights, to PARIS!! c++'
+    assert normalizer.QueryNormalizer('split').normalize(query) == ['Cheap', 'Flights,', 'to', 'PARIS!!', 'c++']
+    assert normalizer.QueryNormalizer('wordpunct').normalize(query) == ['cheap', 'flights', 'to', 'paris', 'c']
+
+
+def test_the_cache_keeps_the_last_distinct_queries():
+    query_normalizer = normalizer.QueryNormalizer('split', 2)
+    for query in ['a b', 'c', 'a b', 'd', 'c']:
+        query_normalizer.normalize(query)
+    # c was evicted by d, being less recently used than a b
+    assert list(query_normalizer.cache.keys()) == ['d', 'c']
+    assert (query_normalizer.hits, query_normalizer.misses) == (1, 4)
+    assert not normalizer.QueryNormalizer('split', 0).cache
+
+
+def test_the_cached_terms_are_not_shared_with_the_caller():
+    query_normalizer = normalizer.QueryNormalizer('split')
+    query_normalizer.normalize('a b').append('<EOS>')
+    terms = query_normalizer.normalize('a b')
+    terms[0] = '<UNKNOWN>'
+    assert query_normalizer.normalize('a b') == ['a', 'b']
+
+
+def test_a_batch_normalizes_every_distinct_query_once():
+    query_normalizer = normalizer.QueryNormalizer('wordpunct')
+    batch = query_normalizer.normalize_batch(['A b', 'c', 'A b'])
+    assert batch == [['a', 'b'], ['c'], ['a', 'b']]
+    assert batch[0] is not batch[2]
+    assert query_normalizer.misses == 2
+    assert query_normalizer.join('A,  b') == 'a b'
+
+
+def test_the_mode_of_a_dictionary_is_used():
+    dictionary = OldDictionary()
+    assert normalizer.for_dictionary(dictionary).mode == 'split'
+    dictionary.normalizer = 'wordpunct'
+    query_normalizer = normalizer.for_dictionary(dictionary, 10)
+    assert (query_normalizer.mode, query_normalizer.cache_size) == ('wordpunct', 10)
@@ -0,0 +1,25 @@
+import os, torch
+from common import plots, plot_losses
+
+
+def test_the_plot_writer_keeps_the_plot_of_the_last_epoch(tmp_path):
+    writer = plots.PlotWriter()
+    points = [1.0, 0.5]
+    writer.save(points, str(tmp_path), 'dev', 1)
+    # later points are not part of the queued plot
+    points.append(0.2)
+    writer.save(points, str(tmp_path), 'dev', 2)
+    writer.wait()
+    assert sorted(os.listdir(str(tmp_path))) == ['dev_loss_plot_epoch_2.png']
+
+
+def test_the_loss_plots_are_saved_from_the_latest_checkpoint(tmp_path):
+    save_path = str(tmp_path) + '/'
+    for batch, train_losses in [(1, [2.0]), (2, [2.0, 1.5])]:
+        torch.save({'epoch': 0, 'train_losses': train_losses, 'dev_losses': [1.8], 'full_dev_losses': []},
+                   save_path + 'checkpoint_000_%07d.pth.tar' % batch)
+    filename = plot_losses.latest_checkpoint(save_path)
+    assert filename == save_path + 'checkpoint_000_0000002.pth.tar'
+    assert plot_losses.save_loss_plots(filename, save_path) == ['training', 'dev']
+    assert os.path.isfile(save_path + 'training_loss_plot_epoch_1.png')
+    assert not os.path.isfile(save_path + 'full_dev_loss_plot_epoch_1.png')
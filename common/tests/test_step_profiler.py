@@ -0,0 +1,51 @@
+import os, glob, torch
+import multiprocessing as mp
+from common import step_profiler
+
+
+def init_worker(directory):
+    global profiler, steps_done
+    steps_done = 0
+    profiler = step_profiler.StepProfiler('1-100', directory, 'worker')
+    profiler.finish_at_exit()
+
+
+def run_task(num_steps):
+    global steps_done
+    for _ in range(num_steps):
+        steps_done += 1
+        profiler.begin(steps_done)
+        with step_profiler.record('task'):
+            torch.ones(4).sum()
+        profiler.end(steps_done)
+    return step_profiler.recording
+
+
+def test_steps_are_parsed_as_ranges():
+    assert step_profiler.parse_steps('100-120') == (100, 120)
+    assert step_profiler.parse_steps('7') == (7, 7)
+
+
+def test_the_range_is_written_when_its_last_step_ends(tmp_path):
+    profiler = step_profiler.StepProfiler('2-3', str(tmp_path), 'loop')
+    recording = []
+    for step_no in range(1, 6):
+        profiler.begin(step_no)
+        recording.append(step_profiler.recording)
+        profiler.end(step_no)
+    assert recording == [False, True, True, False, False]
+    traces = [os.path.basename(f) for f in glob.glob(str(tmp_path / '*.json'))]
+    assert traces == ['loop_%d_steps_2-3.json' % os.getpid()]
+    assert not profiler.enabled
+
+
+def test_a_worker_writes_its_open_range_once_at_exit(tmp_path):
+    pool = mp.get_context('spawn').Pool(1, initializer=init_worker, initargs=(str(tmp_path),))
+    # the range is still open after every task, so nothing is written until the worker exits
+    assert pool.map(run_task, [2, 2]) == [True, True]
+    assert not glob.glob(str(tmp_path / '*.json'))
+    pool.close()
+    pool.join()
+    traces = glob.glob(str(tmp_path / '*.json'))
+    assert len(traces) == 1
+    assert traces[0].endswith('_steps_1-4.json')
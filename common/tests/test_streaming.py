@@ -0,0 +1,89 @@
+import os
+from common.streaming import LogTail, ReplayBuffer
+
+
+def write(filename, text, mtime=None, mode='a'):
+    with open(filename, mode) as f:
+        f.write(text)
+    if mtime is not None:
+        os.utime(filename, (mtime, mtime))
+
+
+def test_partial_lines_are_returned_once_complete(tmp_path):
+    log = str(tmp_path / 'sessions.log')
+    write(log, 'a:::b\nc:::')
+    tail = LogTail(log)
+    assert tail.poll() == ['a:::b']
+    assert tail.poll() == []
+    write(log, 'd\n\n')
+    assert tail.poll() == ['c:::d']
+
+
+def test_a_renamed_shard_is_not_read_again(tmp_path):
+    log = str(tmp_path / 'sessions.log')
+    write(log, 'a:::b\nc:::d\n', 100)
+    tail = LogTail(str(tmp_path))
+    assert tail.poll() == ['a:::b', 'c:::d']
+
+    # the rotation renames the shard and the writer opens a new one, after a last line
+    write(log, 'g:::h\n', 200)
+    os.rename(log, log + '.1')
+    write(log, 'e:::f\n', 300)
+    assert tail.poll() == ['g:::h', 'e:::f']
+    assert tail.poll() == []
+
+    # the offsets are saved and given back to a new tail
+    tail = LogTail(str(tmp_path), tail.offsets)
+    write(log, 'i:::j\n', 400)
+    assert tail.poll() == ['i:::j']
+
+
+def test_removed_shards_are_forgotten_and_truncated_files_read_again(tmp_path):
+    log = str(tmp_path / 'sessions.log')
+    write(log + '.1', 'a:::b\n', 100)
+    write(log, 'c:::d\n', 200)
+    tail = LogTail(str(tmp_path))
+    assert tail.poll() == ['a:::b', 'c:::d']
+    os.remove(log + '.1')
+    assert tail.poll() == []
+    assert len(tail.offsets) == 1
+
+    # a truncated file is shorter than its offset
+    write(log, 'e\n', 300, mode='w')
+    assert tail.poll() == ['e']
+
+
+def test_polls_read_about_max_bytes(tmp_path):
+    log = str(tmp_path / 'sessions.log')
+    write(log, 'a:::b\nc:::d\n' + 'x' * 20 + '\n')
+    tail = LogTail(log)
+    assert tail.poll(max_bytes=8) == ['a:::b']
+    assert tail.poll(max_bytes=8) == ['c:::d']
+    # a line longer than the budget is read whole
+    assert tail.poll(max_bytes=8) == ['x' * 20]
+
+
+def test_replay_buffer_keeps_a_uniform_sample_by_key():
+    replay = ReplayBuffer(100, seed=1)
+    for i in range(1000):
+        replay.add(i, key=i % 2)
+    assert len(replay) == 100
+    assert replay.count(0) + replay.count(1) == 100
+    # every example is kept with the same probability, so the sample spans the whole stream
+    assert max(replay.examples) > 900 and min(replay.examples) < 100
+
+    sample = replay.sample(10, key=1)
+    assert len(sample) == 10 and len(set(sample)) == 10
+    assert all(example % 2 == 1 for example in sample)
+    assert replay.sample(10, key=2) == []
+    assert len(replay.sample(1000, key=0)) == replay.count(0)
+
+
+def test_replay_buffer_slots_stay_consistent_after_replacements():
+    replay = ReplayBuffer(5, seed=3)
+    for i in range(200):
+        replay.add(i, key=i % 3)
+    for key, slots in replay.slots.items():
+        for position, slot in enumerate(slots):
+            assert replay.keys[slot] == key and replay.positions[slot] == position
+    assert sorted(slot for slots in replay.slots.values() for slot in slots) == list(range(5))
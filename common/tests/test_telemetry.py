@@ -0,0 +1,31 @@
+import json
+from common import telemetry
+
+
+def test_disabled_telemetry_writes_nothing(tmp_path):
+    recorder = telemetry.Telemetry('', 1)
+    assert recorder.stage('forward') is telemetry.NULL_STAGE
+    recorder.step(1, 1, 0.5)
+    assert recorder.num_steps == 0
+
+
+def test_a_record_is_written_every_interval_steps(tmp_path, monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(telemetry.time, 'time', lambda: now[0])
+    filename = str(tmp_path / 'telemetry.jsonl')
+    recorder = telemetry.Telemetry(filename, 2)
+    for batch_no, loss in [(1, 1.0), (2, 3.0), (3, 5.0)]:
+        with recorder.stage('forward'):
+            now[0] += 1
+        recorder.count(4, 10)
+        now[0] += 1
+        recorder.step(1, batch_no, loss)
+
+    with open(filename) as f:
+        records = [json.loads(line) for line in f]
+    assert len(records) == 1
+    record = records[0]
+    assert record['batch'] == 2 and record['steps'] == 2 and record['loss'] == 2.0
+    assert record['elapsed'] == 4 and record['sequences_per_sec'] == 2 and record['tokens_per_sec'] == 5
+    assert record['stages'] == {'forward': 2}
+    assert recorder.num_steps == 1 and recorder.num_tokens == 10
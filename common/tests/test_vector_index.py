@@ -0,0 +1,51 @@
+import numpy as np
+from argparse import Namespace
+from common import vector_index
+
+QUERIES = ['cheap flights', 'paris hotels', 'weather today', 'python list', 'world news']
+
+
+def unit_vectors(num_vectors, dimension, seed=0):
+    vectors = np.random.RandomState(seed).randn(num_vectors, dimension).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def build(tmp_path, num_clusters, vectors):
+    config = Namespace(index_dir=str(tmp_path), index_dtype='float32', encode_batch_size=2, num_clusters=num_clusters,
+                       kmeans_iterations=3, seed=1)
+    encoded = iter(np.array_split(vectors, range(2, len(vectors), 2)))
+    vector_index.build_index(lambda batch: next(encoded), vectors.shape[1], config, QUERIES)
+    return vector_index.QueryIndex(str(tmp_path), block_size=2)
+
+
+def test_unique_queries_keep_their_first_occurrence(tmp_path):
+    filename = tmp_path / 'sessions.txt'
+    filename.write_text('cheap  flights:::paris hotels\n\nparis hotels:::a b c d:::cheap flights\n')
+    queries = vector_index.unique_queries([str(filename)], 3, Namespace(normalize=str.split))
+    assert queries == ['cheap flights', 'paris hotels']
+
+
+def test_kmeans_keeps_at_most_one_centroid_per_vector():
+    vectors = unit_vectors(3, 4)
+    centroids = vector_index.kmeans(vectors, 8, 2, np.random.RandomState(0))
+    assert centroids.shape == (3, 4)
+    assert sorted(vector_index.assign_clusters(vectors, centroids)) == [0, 1, 2]
+
+
+def test_exact_search_returns_the_nearest_queries(tmp_path):
+    vectors = unit_vectors(len(QUERIES), 4)
+    index = build(tmp_path, 0, vectors)
+    for i, neighbors in enumerate(index.nearest_queries(vectors, 2)):
+        assert neighbors[0][0] == QUERIES[i]
+        assert abs(neighbors[0][1] - 1) < 1e-5
+        assert neighbors[0][1] >= neighbors[1][1]
+
+
+def test_more_clusters_than_queries_are_clamped(tmp_path):
+    vectors = unit_vectors(len(QUERIES), 4)
+    index = build(tmp_path, 16, vectors)
+    assert len(index.centroids) == len(QUERIES)
+    assert index.cluster_offsets[-1] == len(QUERIES)
+    # probing every cluster scores every vector
+    for probed, exact in zip(index.search(vectors, 3, num_probes=len(QUERIES)), index.search_exact(vectors, 3)):
+        assert [query_id for query_id, _ in probed] == [query_id for query_id, _ in exact]
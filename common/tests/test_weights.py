@@ -0,0 +1,55 @@
+import torch
+import torch.nn as nn
+from common import weights, export_weights
+
+
+class TiedModel(nn.Module):
+
+    def __init__(self):
+        super(TiedModel, self).__init__()
+        self.embedding = nn.Embedding(10, 4)
+        self.out = nn.Linear(4, 10)
+        self.out.weight = self.embedding.weight
+        self.register_buffer('counts', torch.arange(10, dtype=torch.int64))
+
+
+def test_the_weights_round_trip_with_tied_parameters(tmp_path):
+    torch.manual_seed(1)
+    model = TiedModel()
+    filename = str(tmp_path / 'model.weights')
+    weights.save_inference_weights(model.state_dict(), filename)
+    assert weights.is_inference_weights(filename)
+    tensors = weights.map_inference_weights(filename)
+    assert list(tensors.keys()) == list(model.state_dict().keys())
+    for name, value in model.state_dict().items():
+        assert tensors[name].dtype == value.dtype
+        assert torch.equal(tensors[name], value)
+        if tensors[name].dim():
+            assert tensors[name].data_ptr() % weights.WEIGHTS_ALIGNMENT == 0
+    assert tensors['out.weight'] is tensors['embedding.weight']
+
+
+def test_a_loaded_model_shares_the_mapped_weights(tmp_path):
+    torch.manual_seed(1)
+    model = TiedModel()
+    filename = str(tmp_path / 'model.weights')
+    weights.save_inference_weights(model.state_dict(), filename)
+    torch.manual_seed(2)
+    loaded = TiedModel()
+    weights.load_inference_weights(loaded, filename)
+    assert loaded.out.weight is loaded.embedding.weight
+    assert not loaded.embedding.weight.requires_grad
+    inputs = torch.LongTensor([[1, 2, 3]])
+    assert torch.equal(loaded.out(loaded.embedding(inputs)), model.out(model.embedding(inputs)))
+
+
+def test_a_checkpoint_is_exported_without_the_data_parallel_prefix(tmp_path):
+    model = TiedModel()
+    checkpoint_path = str(tmp_path / 'model_best.pth.tar')
+    torch.save({'state_dict': {'module.' + key: value for key, value in model.state_dict().items()},
+                'optimizer': {}, 'epoch': 3}, checkpoint_path)
+    weights_path, num_tensors = export_weights.export_checkpoint(checkpoint_path)
+    assert weights_path == str(tmp_path / 'model_best.weights')
+    assert num_tensors == 4
+    assert not weights.is_inference_weights(checkpoint_path)
+    assert list(weights.map_inference_weights(weights_path).keys()) == list(model.state_dict().keys())
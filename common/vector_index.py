@@ -0,0 +1,135 @@
+###############################################################################
+# Author: agent
+# Project: Context-aware Query Suggestion
+# Date Created: 10/18/2026
+#
+# File Description: This script stores query vectors as a memory-mapped matrix
+# that supports exact and cluster-based nearest neighbor search. It is shared
+# by the query indexes of both models.
+###############################################################################
+
+import os
+import numpy as np
+
+
+def unique_queries(filenames, max_length, query_normalizer):
+    """Returns the distinct normalized queries of session files in the order of their first occurrence."""
+    queries = {}
+    for filename in filenames:
+        with open(filename, 'r', encoding='utf-8') as f:
+            for line in f:
+                for query in line.strip().split(':::'):
+                    terms = query_normalizer.normalize(query)
+                    if terms and len(terms) <= max_length:
+                        queries.setdefault(' '.join(terms), None)
+    return list(queries)
+
+
+def assign_clusters(vectors, centroids, block_size=65536):
+    """Returns the index of the most similar centroid of every vector, computed block by block."""
+    assignment = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), block_size):
+        block = np.asarray(vectors[start:start + block_size], dtype=np.float32)
+        assignment[start:start + len(block)] = block.dot(centroids.T).argmax(1)
+    return assignment
+
+
+def kmeans(vectors, num_clusters, num_iterations, rng):
+    """Clusters unit-length vectors by cosine similarity (spherical k-means) and returns the centroids, at most one
+    per vector."""
+    num_clusters = min(num_clusters, len(vectors))
+    centroids = vectors[np.sort(rng.choice(len(vectors), num_clusters, replace=False))].astype(np.float32)
+    for _ in range(num_iterations):
+        assignment = assign_clusters(vectors, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        # empty clusters keep their previous centroid
+        non_empty = norms[:, 0] > 0
+        centroids[non_empty] = sums[non_empty] / norms[non_empty]
+    return centroids
+
+
+def build_index(encode, dimension, config, queries):
+    """Writes the id to query table, the query vectors returned by encode for every batch of queries and,
+    optionally, the coarse clustering of the vectors."""
+    if not os.path.isdir(config.index_dir):
+        os.makedirs(config.index_dir)
+    with open(os.path.join(config.index_dir, 'queries.txt'), 'w') as f:
+        for query in queries:
+            f.write(query + '\n')
+
+    embeddings = np.lib.format.open_memmap(os.path.join(config.index_dir, 'embeddings.npy'), mode='w+',
+                                           dtype=config.index_dtype, shape=(len(queries), dimension))
+    for start in range(0, len(queries), config.encode_batch_size):
+        batch = queries[start:start + config.encode_batch_size]
+        embeddings[start:start + len(batch)] = encode(batch)
+    embeddings.flush()
+
+    if config.num_clusters > 0:
+        rng = np.random.RandomState(config.seed)
+        # centroids are trained on a sample, every vector is then assigned to its closest centroid
+        sample = rng.choice(len(queries), min(len(queries), config.num_clusters * 256), replace=False)
+        centroids = kmeans(np.asarray(embeddings[np.sort(sample)], dtype=np.float32), config.num_clusters,
+                           config.kmeans_iterations, rng)
+        assignment = assign_clusters(embeddings, centroids)
+        cluster_offsets = np.concatenate(([0], np.cumsum(np.bincount(assignment, minlength=len(centroids)))))
+        np.save(os.path.join(config.index_dir, 'centroids.npy'), centroids)
+        np.save(os.path.join(config.index_dir, 'cluster_ids.npy'), np.argsort(assignment, kind='stable'))
+        np.save(os.path.join(config.index_dir, 'cluster_offsets.npy'), cluster_offsets)
+
+
+class QueryIndex(object):
+    """Memory-mapped matrix of unit-length query vectors with exact and cluster-based top-k search."""
+
+    def __init__(self, directory, block_size=65536):
+        self.block_size = block_size
+        with open(os.path.join(directory, 'queries.txt'), 'r') as f:
+            self.queries = [line.rstrip('\n') for line in f]
+        self.embeddings = np.load(os.path.join(directory, 'embeddings.npy'), mmap_mode='r')
+        self.centroids = None
+        if os.path.isfile(os.path.join(directory, 'centroids.npy')):
+            self.centroids = np.load(os.path.join(directory, 'centroids.npy'))
+            self.cluster_ids = np.load(os.path.join(directory, 'cluster_ids.npy'), mmap_mode='r')
+            self.cluster_offsets = np.load(os.path.join(directory, 'cluster_offsets.npy'))
+
+    def search(self, vectors, k, num_probes=0):
+        """Returns the (query id, cosine similarity) pairs of the k nearest queries of each vector."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if num_probes > 0 and self.centroids is not None:
+            return [self.search_clusters(vector, k, num_probes) for vector in vectors]
+        return self.search_exact(vectors, k)
+
+    def search_exact(self, vectors, k):
+        """Scores every stored vector with one matrix multiplication per block of rows, keeping a running top-k."""
+        best_scores = np.empty((len(vectors), 0), dtype=np.float32)
+        best_ids = np.empty((len(vectors), 0), dtype=np.int64)
+        for start in range(0, len(self.embeddings), self.block_size):
+            block = np.asarray(self.embeddings[start:start + self.block_size], dtype=np.float32)
+            scores = np.concatenate((best_scores, vectors.dot(block.T)), 1)
+            ids = np.concatenate((best_ids, np.broadcast_to(np.arange(start, start + len(block)),
+                                                            (len(vectors), len(block)))), 1)
+            if scores.shape[1] > k:
+                top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                scores, ids = np.take_along_axis(scores, top, 1), np.take_along_axis(ids, top, 1)
+            best_scores, best_ids = scores, ids
+
+        order = np.argsort(-best_scores, axis=1)
+        best_scores, best_ids = np.take_along_axis(best_scores, order, 1), np.take_along_axis(best_ids, order, 1)
+        return [list(zip(ids.tolist(), scores.tolist())) for ids, scores in zip(best_ids, best_scores)]
+
+    def search_clusters(self, vector, k, num_probes):
+        """Scores only the vectors of the num_probes clusters whose centroids are the most similar to a vector."""
+        num_probes = min(num_probes, len(self.centroids))
+        probes = np.argpartition(-self.centroids.dot(vector), num_probes - 1)[:num_probes]
+        ids = np.sort(np.concatenate([self.cluster_ids[self.cluster_offsets[c]:self.cluster_offsets[c + 1]]
+                                      for c in probes]))
+        scores = np.asarray(self.embeddings[ids], dtype=np.float32).dot(vector)
+        top = np.argsort(-scores)[:k]
+        return list(zip(ids[top].tolist(), scores[top].tolist()))
+
+    def nearest_queries(self, vectors, k, num_probes=0):
+        """Returns the (query, cosine similarity) pairs of the k nearest queries of each vector."""
+        return [[(self.queries[query_id], score) for query_id, score in neighbors]
+                for neighbors in self.search(vectors, k, num_probes)]
+
@@ -0,0 +1,103 @@
+###############################################################################
+# Author: agent
+# Project: Context-aware Query Suggestion
+# Date Created: 10/18/2026
+#
+# File Description: This script contains the inference weights format of both
+# models, which only keeps the model parameters as raw tensors after a JSON
+# header, so that inference workers memory-map them instead of unpickling.
+###############################################################################
+
+import os, json, warnings, torch
+import numpy as np
+from collections import OrderedDict
+
+
+WEIGHTS_MAGIC = b'QSWEIGHT'
+WEIGHTS_ALIGNMENT = 64
+
+
+def save_inference_weights(state_dict, filename):
+    """Writes the tensors of a state dict as raw, aligned arrays after a JSON header, for load_inference_weights.
+    The layout is the magic bytes, the header length as 8 little-endian bytes, the header and the tensor data."""
+    arrays, entries, offset, names = [], OrderedDict(), 0, {}
+    for name, tensor in state_dict.items():
+        key = (tensor.data_ptr(), tuple(tensor.size()), tensor.dtype)
+        if key in names:
+            # tied weights are stored once and mapped as the same tensor
+            entries[name] = {'alias': names[key]}
+            continue
+        names[key] = name
+        array = np.ascontiguousarray(tensor.detach().cpu().numpy())
+        # every tensor starts at an aligned offset of the data section, so the mapped arrays are aligned too
+        offset = (offset + WEIGHTS_ALIGNMENT - 1) // WEIGHTS_ALIGNMENT * WEIGHTS_ALIGNMENT
+        entries[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        arrays.append((offset, array))
+        offset += array.nbytes
+    header = json.dumps(entries).encode('utf-8')
+    data_start = len(WEIGHTS_MAGIC) + 8 + len(header)
+    header += b' ' * ((-data_start) % WEIGHTS_ALIGNMENT)
+    data_start = len(WEIGHTS_MAGIC) + 8 + len(header)
+
+    with open(filename + '.tmp', 'wb') as f:
+        f.write(WEIGHTS_MAGIC)
+        f.write(len(header).to_bytes(8, 'little'))
+        f.write(header)
+        for array_offset, array in arrays:
+            f.seek(data_start + array_offset)
+            f.write(array.tobytes())
+        f.truncate(data_start + offset)
+    os.replace(filename + '.tmp', filename)
+
+
+def is_inference_weights(filename):
+    """Returns whether a file was written by save_inference_weights rather than torch.save."""
+    with open(filename, 'rb') as f:
+        return f.read(len(WEIGHTS_MAGIC)) == WEIGHTS_MAGIC
+
+
+def map_inference_weights(filename):
+    """Returns the tensors of a file written by save_inference_weights, backed by a read-only memory map of it.
+    The pages are only read from disk when they are touched and are shared by every process mapping the file."""
+    with open(filename, 'rb') as f:
+        assert f.read(len(WEIGHTS_MAGIC)) == WEIGHTS_MAGIC, '%s is not an inference weights file' % filename
+        header_length = int.from_bytes(f.read(8), 'little')
+        entries = json.loads(f.read(header_length).decode('utf-8'), object_pairs_hook=OrderedDict)
+    data_start = len(WEIGHTS_MAGIC) + 8 + header_length
+    buffer = np.memmap(filename, dtype=np.uint8, mode='r')
+
+    tensors = OrderedDict()
+    with warnings.catch_warnings():
+        # torch warns that the arrays are not writable; inference never writes to its weights
+        warnings.simplefilter('ignore', UserWarning)
+        for name, entry in entries.items():
+            if 'alias' in entry:
+                tensors[name] = tensors[entry['alias']]
+                continue
+            dtype = np.dtype(entry['dtype'])
+            count = int(np.prod(entry['shape'])) if entry['shape'] else 1
+            array = np.frombuffer(buffer, dtype=dtype, count=count, offset=data_start + entry['offset'])
+            tensors[name] = torch.from_numpy(array.reshape(entry['shape']))
+    return tensors
+
+
+def load_inference_weights(model, filename):
+    """Makes the parameters and buffers of a model views of a memory-mapped inference weights file. Models on a
+    GPU get a copy of the weights instead."""
+    tensors = map_inference_weights(filename)
+    if any(param.is_cuda for param in model.parameters()):
+        model.load_state_dict(tensors)
+        return
+    expected = set(model.state_dict().keys())
+    assert expected == set(tensors.keys()), 'the weights in %s do not match the model' % filename
+    parameters = {}
+    for name, tensor in tensors.items():
+        module_name, _, attribute = name.rpartition('.')
+        module = model.get_submodule(module_name) if module_name else model
+        if attribute in module._parameters:
+            # the parameters are frozen since they are views of read-only memory, tied ones stay tied
+            if id(tensor) not in parameters:
+                parameters[id(tensor)] = torch.nn.Parameter(tensor, requires_grad=False)
+            setattr(module, attribute, parameters[id(tensor)])
+        else:
+            module._buffers[attribute] = tensor
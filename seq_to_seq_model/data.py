@@ -8,12 +8,15 @@
 ###############################################################################
 
 import os, helper
+from common import normalizer
 
 
 class Dictionary(object):
-    def __init__(self):
+    def __init__(self, normalizer_mode='split'):
         self.word2idx = {}
         self.idx2word = []
+        # the normalizer mode of the queries, which inference uses as well, see normalizer.for_dictionary
+        self.normalizer = normalizer_mode
         # Create and store three special tokens
         self.pad_token = '<PAD>'
         self.start_token = '<SOS>'
@@ -46,13 +49,16 @@ class Instance(object):
         self.sentence1 = []
         self.sentence2 = []
 
-    def add_sentence(self, sentence, sentence_no, dictionary, max_length, is_test_instance=False):
+    def add_sentence(self, sentence, sentence_no, dictionary, max_length, is_test_instance=False, terms=None):
+        # the terms of the sentence, if already normalized
+        if terms is None:
+            terms = sentence.split()
         if sentence_no == 1:
-            words = sentence.split() + [dictionary.end_token]
+            words = terms + [dictionary.end_token]
             if len(words) > (max_length + 1):
                 return -1
         else:
-            words = [dictionary.start_token] + sentence.split() + [dictionary.end_token]
+            words = [dictionary.start_token] + terms + [dictionary.end_token]
             if len(words) > (max_length + 2):
                 return -1
 
@@ -73,8 +79,9 @@ class Instance(object):
 
 
 class Corpus(object):
-    def __init__(self, path, filename, dictionary, max_length, is_test_corpus=False):
+    def __init__(self, path, filename, dictionary, max_length, is_test_corpus=False, normalizer_cache_size=100000):
         self.max_sent_length = 0
+        self.normalizer = normalizer.for_dictionary(dictionary, normalizer_cache_size)
         self.data = self.parse(os.path.join(path, filename), dictionary, max_length, is_test_corpus)
 
     def parse(self, path, dictionary, max_length, is_test_corpus):
@@ -84,21 +91,24 @@ class Corpus(object):
         samples = []
         with open(path, 'r') as f:
             for line in f:
-                queries = line.strip().split(':::')
-                for i in range(1, len(queries)):
-                    instance = Instance()
-                    length = instance.add_sentence(queries[i - 1], 1, dictionary, max_length, is_test_corpus)
-                    if length == -1:
-                        continue
-                    elif length > self.max_sent_length:
-                        self.max_sent_length = length
-
-                    length = instance.add_sentence(queries[i], 2, dictionary, max_length, is_test_corpus)
-                    if length == -1:
-                        continue
-                    elif length > self.max_sent_length:
-                        self.max_sent_length = length
-
-                    samples.append(instance)
+                instances = query_pairs(line, dictionary, max_length, is_test_corpus, self.normalizer)
+                for instance in instances:
+                    self.max_sent_length = max(self.max_sent_length, len(instance.sentence1), len(instance.sentence2))
+                samples.extend(instances)
 
         return samples
+
+
+def query_pairs(line, dictionary, max_length, is_test_corpus, query_normalizer):
+    """Returns an instance for every pair of consecutive queries of a session line whose queries are not too long."""
+    queries = line.strip().split(':::')
+    terms = query_normalizer.normalize_batch(queries)
+    instances = []
+    for i in range(1, len(queries)):
+        instance = Instance()
+        if instance.add_sentence(queries[i - 1], 1, dictionary, max_length, is_test_corpus, terms[i - 1]) == -1:
+            continue
+        if instance.add_sentence(queries[i], 2, dictionary, max_length, is_test_corpus, terms[i]) == -1:
+            continue
+        instances.append(instance)
+    return instances
@@ -0,0 +1,206 @@
+###############################################################################
+# Author: agent
+# Project: Context-aware Query Suggestion
+# Date Created: 10/18/2026
+#
+# File Description: This script distills a trained model into a smaller
+# student, trained on the output distributions of the teacher at every target
+# position, and reports the latency and the quality of both models.
+###############################################################################
+
+import util, helper, data, train, os, copy, json, time, numpy
+import torch
+import torch.nn.functional as F
+from torch import optim
+from seq2seq import Sequence2Sequence
+
+
+def distillation_token_loss(student_output, teacher_output, target, seq_idx, length, config):
+    """Returns the summed loss of the target tokens at position seq_idx and their number. The loss mixes the
+    divergence of the softened student distribution from the teacher one, given as log-probabilities or as the
+    (log-probabilities, indices) of its top-k tokens, with the negative log-likelihood of the target."""
+    temperature = config.distill_temperature
+    student_log_probs = F.log_softmax(student_output / temperature, 1)
+    if torch.is_tensor(teacher_output):
+        teacher_log_probs = F.log_softmax(teacher_output / temperature, 1)
+    else:
+        teacher_values, indices = teacher_output
+        # the kept tokens are renormalized and the student is only matched on them
+        teacher_log_probs = F.log_softmax(teacher_values.float() / temperature, 1)
+        student_log_probs = torch.gather(student_log_probs, dim=1, index=indices.long())
+    # scaled by the squared temperature, so that its gradients keep their size when the temperature changes
+    divergence = (teacher_log_probs.exp() * (teacher_log_probs - student_log_probs)).sum(1) * temperature ** 2
+    nll = -torch.gather(student_output, dim=1, index=target.unsqueeze(1)).squeeze(1)
+    mask = helper.mask(length, seq_idx).float()
+    losses = config.distill_alpha * divergence + (1 - config.distill_alpha) * nll
+    return (losses * mask).sum(), mask.sum()
+
+
+class DistillTrain(train.Train):
+    """Train class of a student, whose loss is computed against the outputs of a frozen teacher."""
+
+    def __init__(self, model, teacher, optimizer, dictionary, config):
+        super(DistillTrain, self).__init__(model, optimizer, dictionary, None, config, -1)
+        self.teacher = teacher
+        # top-k teacher outputs of every training batch, keyed by the batch, which lives as long as training
+        self.teacher_cache = {}
+
+    def teacher_outputs(self, batch, train_sentences1, train_sentences2):
+        """Yields the output of the teacher at every target position of a batch: its log-probabilities or, with
+        --distill_topk, the log-probabilities and indices of its top-k tokens, computed on the first visit only."""
+        if self.config.distill_topk <= 0:
+            outputs = self.teacher.decoder_outputs(train_sentences1, train_sentences2)
+            for _ in range(train_sentences2.size(1) - 1):
+                with torch.no_grad():
+                    output = next(outputs)
+                yield output
+            return
+
+        if id(batch) not in self.teacher_cache:
+            with torch.no_grad():
+                steps = [output.topk(self.config.distill_topk, 1) for output in
+                         self.teacher.decoder_outputs(train_sentences1, train_sentences2)]
+            # kept in half precision on the CPU, batch x position x k
+            self.teacher_cache[id(batch)] = (torch.stack([values for values, _ in steps], 1).half().cpu(),
+                                             torch.stack([indices for _, indices in steps], 1).int().cpu())
+        values, indices = self.teacher_cache[id(batch)]
+        for idx in range(values.size(1)):
+            yield values[:, idx].to(train_sentences1.device), indices[:, idx].to(train_sentences1.device)
+
+    def forward_batch(self, batch, token_sum=False):
+        """Returns the distillation loss of a batch, summed over the target tokens along with their number if
+        token_sum, averaged over the target tokens otherwise."""
+        train_sentences1, train_sentences2, length = self.batch_to_tensors(batch)
+        loss, num_tokens = 0, 0
+        with self.telemetry.stage('forward'):
+            teacher_outputs = self.teacher_outputs(batch, train_sentences1, train_sentences2)
+            for idx, output in enumerate(self.model.decoder_outputs(train_sentences1, train_sentences2)):
+                target_variable = train_sentences2[:, idx + 1]
+                token_loss, tokens = distillation_token_loss(output, next(teacher_outputs), target_variable, idx,
+                                                             length, self.config)
+                loss, num_tokens = loss + token_loss, num_tokens + tokens
+        if token_sum:
+            return loss, num_tokens
+        return loss / num_tokens.clamp(min=1)
+
+
+def build_student(teacher, dictionary, config):
+    """Returns a student with the architecture of the student arguments and the frozen embeddings of the teacher."""
+    student = Sequence2Sequence(dictionary, None, config)
+    # copied in place, so that a tied output layer still shares the embedding matrix
+    student.embedding.embedding.weight.data.copy_(teacher.embedding.embedding.weight.data)
+    if config.cuda:
+        student = student.cuda()
+    return student
+
+
+def dev_perplexity(model, dev_batches, dictionary, config):
+    """Returns the perplexity of a model on the target tokens of the dev batches."""
+    model.eval()
+    loss, num_tokens = 0, 0
+    with torch.no_grad():
+        for batch in dev_batches:
+            dev_sentences1, dev_sentences2, length = helper.queries_to_tensors(batch, dictionary)
+            if config.cuda:
+                dev_sentences1, dev_sentences2, length = dev_sentences1.cuda(), dev_sentences2.cuda(), length.cuda()
+            batch_loss, tokens = model(dev_sentences1, dev_sentences2, length, True)
+            loss, num_tokens = loss + batch_loss.item(), num_tokens + tokens.item()
+    return float(numpy.exp(loss / max(num_tokens, 1)))
+
+
+def measure_latency(model, dev_batches, dictionary, config):
+    """Returns latency percentiles in milliseconds of scoring dev query pairs one at a time, and the number of
+    query pairs scored per second in batches."""
+    model.eval()
+    instances = [instance for batch in dev_batches for instance in batch][:config.latency_samples]
+    times = []
+    with torch.no_grad():
+        for instance in instances:
+            tensors = helper.queries_to_tensors([instance], dictionary)
+            if config.cuda:
+                tensors = [tensor.cuda() for tensor in tensors]
+            start = time.perf_counter()
+            model(*tensors)
+            if config.cuda:
+                torch.cuda.synchronize()
+            times.append((time.perf_counter() - start) * 1000)
+
+        start, num_pairs = time.perf_counter(), 0
+        for batch in dev_batches[:10]:
+            tensors = helper.queries_to_tensors(batch, dictionary)
+            if config.cuda:
+                tensors = [tensor.cuda() for tensor in tensors]
+            model(*tensors)
+            num_pairs += len(batch)
+        if config.cuda:
+            torch.cuda.synchronize()
+        elapsed = time.perf_counter() - start
+
+    return {'p50_ms': float(numpy.percentile(times, 50)), 'p99_ms': float(numpy.percentile(times, 99)),
+            'pairs_per_sec': num_pairs / elapsed}
+
+
+def report(models, dev_batches, dictionary, config, filename):
+    """Prints the size, the dev perplexity and the latency of every model and writes them to a JSON file."""
+    results = {}
+    for name, model in models:
+        results[name] = {'parameters': sum(param.numel() for param in model.parameters()),
+                         'perplexity': dev_perplexity(model, dev_batches, dictionary, config)}
+        results[name].update(measure_latency(model, dev_batches, dictionary, config))
+    with open(filename, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    print('%-10s %12s %12s %10s %10s %12s' % ('model', 'parameters', 'perplexity', 'p50 (ms)', 'p99 (ms)',
+                                              'pairs/sec'))
+    for name, result in results.items():
+        print('%-10s %12d %12.2f %10.2f %10.2f %12.1f' % (name, result['parameters'], result['perplexity'],
+                                                          result['p50_ms'], result['p99_ms'], result['pairs_per_sec']))
+
+
+if __name__ == '__main__':
+    args = util.get_args()
+    args.rank, args.world_size, args.distributed = 0, 1, False
+    numpy.random.seed(args.seed)
+    torch.manual_seed(args.seed)
+    if args.cuda:
+        torch.cuda.manual_seed(args.seed)
+
+    # the teacher vocabulary, which the training and dev sessions are read with
+    dictionary = helper.load_object(args.save_path + 'dictionary.p')
+    train_corpus = data.Corpus(args.data, 'session_train.txt', dictionary, args.max_length,
+                               normalizer_cache_size=args.normalizer_cache_size)
+    dev_corpus = data.Corpus(args.data, 'session_dev.txt', dictionary, args.max_length,
+                             normalizer_cache_size=args.normalizer_cache_size)
+    print('Train set size = ', len(train_corpus.data))
+    print('Dev set size = ', len(dev_corpus.data))
+    train_batches = helper.batchify(train_corpus.data, args.batch_size)
+    dev_batches = helper.batchify(dev_corpus.data, args.batch_size)
+
+    teacher = Sequence2Sequence(dictionary, None, args)
+    if args.cuda:
+        teacher = teacher.cuda()
+    helper.load_model_weights(teacher, args.teacher_checkpoint or args.save_path + 'model_best.pth.tar')
+    teacher.eval()
+    for param in teacher.parameters():
+        param.requires_grad = False
+
+    student_config = copy.copy(args)
+    student_config.model = args.student_model
+    student_config.nhid = args.student_nhid
+    student_config.attention = args.student_attention
+    student_config.save_path = os.path.join(args.save_path, 'student') + '/'
+    if not os.path.isdir(student_config.save_path):
+        os.makedirs(student_config.save_path)
+    # evaluate.py and the other inference scripts load the student with --save_path set to its directory
+    helper.save_object(dictionary, student_config.save_path + 'dictionary.p')
+
+    student = build_student(teacher, dictionary, student_config)
+    optimizer = optim.Adam(filter(lambda p: p.requires_grad, student.parameters()), args.lr)
+    trainer = DistillTrain(student, teacher, optimizer, dictionary, student_config)
+    trainer.train_epochs(train_batches, dev_batches, 0, args.epochs)
+
+    best_checkpoint = student_config.save_path + 'model_best.pth.tar'
+    if os.path.isfile(best_checkpoint):
+        helper.load_model_weights(student, best_checkpoint)
+    report([('teacher', teacher), ('student', student)], dev_batches, dictionary, args,
+           student_config.save_path + 'distill_report.json')
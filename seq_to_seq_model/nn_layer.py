@@ -13,6 +13,7 @@ import numpy as np
 from torch.nn import init
 from torch.autograd import Variable
 import torch.nn.functional as F
+from common import step_profiler
 
 
 class EmbeddingLayer(nn.Module):
@@ -86,19 +87,56 @@ class RNN(nn.Module):
                 weight.new(self.nlayers * self.num_directions, bsz, self.nhid).zero_()), Variable(
                 weight.new(self.nlayers * self.num_directions, bsz, self.nhid).zero_())
         else:
-            return Variable(weight.new(self.n_layers * self.num_directions, bsz, self.nhid).zero_())
+            return Variable(weight.new(self.nlayers * self.num_directions, bsz, self.nhid).zero_())
+
+
+class OutputLayer(nn.Module):
+    """Projection of hidden states to vocabulary logits. The full layout is a linear layer (nhid x V); the tied
+    layout projects to the embedding size and reuses the input embedding matrix as output weights, which are frozen
+    with the embeddings (see EmbeddingLayer), so that only the projection and the bias train; the factorized layout
+    goes through a rank dimensional bottleneck, so that the vocabulary matrix is V x rank."""
+
+    def __init__(self, hidden_size, output_size, config, embedding=None):
+        """"Constructor of the class"""
+        super(OutputLayer, self).__init__()
+        self.layout = config.output_layer
+        self.projection = None
+        if self.layout == 'tied':
+            assert embedding is not None, 'the tied output layer needs the input embedding'
+            self.projection = nn.Linear(hidden_size, embedding.embedding_dim)
+            # the same parameter as the input embedding, so it is stored and updated once (or, frozen, never)
+            self.weight = embedding.weight
+        elif self.layout == 'factorized':
+            self.projection = nn.Linear(hidden_size, config.output_rank, bias=False)
+            self.weight = nn.Parameter(torch.Tensor(output_size, config.output_rank))
+        else:
+            # the parameters are named as the ones of nn.Linear, so that earlier checkpoints still load
+            self.weight = nn.Parameter(torch.Tensor(output_size, hidden_size))
+        self.bias = nn.Parameter(torch.zeros(output_size))
+        if self.layout != 'tied':
+            # the initialization of nn.Linear
+            bound = 1 / self.weight.size(1) ** 0.5
+            nn.init.uniform_(self.weight, -bound, bound)
+            nn.init.uniform_(self.bias, -bound, bound)
+
+    def forward(self, input):
+        """"Defines the forward computation of the output layer"""
+        with step_profiler.record('output_layer'):
+            if self.projection is not None:
+                input = self.projection(input)
+            return F.linear(input, self.weight, self.bias)
 
 
 class ApplyAttention(nn.Module):
     """Decoder class of a sequence-to-sequence network"""
 
-    def __init__(self, output_size, hidden_size, method='general', attention_type='global'):
+    def __init__(self, output_size, hidden_size, method='general', attention_type='global', output_layer=None):
         """"Constructor of the class"""
         super(ApplyAttention, self).__init__()
         self.nhid = hidden_size
         self.method = method
         self.attn_combine = nn.Linear(self.nhid * 2, self.nhid)
-        self.out = nn.Linear(self.nhid, output_size)
+        self.out = output_layer if output_layer is not None else nn.Linear(self.nhid, output_size)
         if attention_type == 'global':
             """global attention mechanism described in paper - http://aclweb.org/anthology/D15-1166"""
             if self.method == 'general':
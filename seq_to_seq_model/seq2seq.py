@@ -10,6 +10,7 @@
 import torch, helper, nn_layer
 import torch.nn as nn
 from torch.autograd import Variable
+from common import step_profiler
 
 
 class Sequence2Sequence(nn.Module):
@@ -26,16 +27,19 @@ class Sequence2Sequence(nn.Module):
                                     self.config.dropout, True)
         self.decoder = nn_layer.RNN(self.config.model, self.config.emsize + self.config.nhid, self.config.nhid,
                                     self.config.nlayers, self.config.dropout)
-        self.attention = nn_layer.ApplyAttention(len(dictionary), self.config.nhid)
+        output_layer = nn_layer.OutputLayer(self.config.nhid, len(dictionary), self.config, self.embedding.embedding)
+        self.attention = nn_layer.ApplyAttention(len(dictionary), self.config.nhid, self.config.attention,
+                                                 output_layer=output_layer)
 
-        # Initializing the weight parameters for the embedding layer.
-        self.embedding.init_embedding_weights(self.dictionary, self.embedding_index, self.config.emsize)
+        # Initializing the weight parameters for the embedding layer, unless the caller sets them (no index given).
+        if self.embedding_index is not None:
+            self.embedding.init_embedding_weights(self.dictionary, self.embedding_index, self.config.emsize)
 
     @staticmethod
     def compute_loss(logits, target, seq_idx, length, regularization_param=None):
         # logits: batch x vocab_size, target: batch x 1
-        losses = -torch.gather(logits, dim=1, index=target.unsqueeze(1))
-        # mask: batch x 1
+        losses = -torch.gather(logits, dim=1, index=target.unsqueeze(1)).squeeze(1)
+        # losses, mask: batch
         mask = helper.mask(length, seq_idx)
         losses = losses * mask.float()
         num_non_zero_elem = torch.nonzero(mask.data).size()
@@ -48,38 +52,124 @@ class Sequence2Sequence(nn.Module):
             loss += regularized_loss.mean()
         return loss
 
-    def forward(self, batch_sentence1, batch_sentence2, length):
-        """"Defines the forward computation of the question classifier."""
-        embedded = self.embedding(batch_sentence1)
-        if self.config.model == 'LSTM':
-            init_hidden, init_cell = self.encoder.init_weights(batch_sentence1.size(0))
-            encoder_output, encoder_hidden = self.encoder(embedded, (init_hidden, init_cell))
-        else:
-            init_hidden = self.encoder.init_weights(batch_sentence1.size(0))
-            encoder_output, encoder_hidden = self.encoder(embedded, init_hidden)
+    def encode(self, batch_sentence1):
+        """Encodes a batch of source queries and returns the encoder outputs and the initial decoder states."""
+        with step_profiler.record('embedding'):
+            embedded = self.embedding(batch_sentence1)
+        with step_profiler.record('encoder'):
+            if self.config.model == 'LSTM':
+                init_hidden, init_cell = self.encoder.init_weights(batch_sentence1.size(0))
+                encoder_output, encoder_hidden = self.encoder(embedded, (init_hidden, init_cell))
+            else:
+                init_hidden = self.encoder.init_weights(batch_sentence1.size(0))
+                encoder_output, encoder_hidden = self.encoder(embedded, init_hidden)
 
         if self.config.bidirection:
-            encoder_hidden = torch.mean(encoder_hidden[0], 0), torch.mean(encoder_hidden[1], 0)
+            # the two directions are averaged, keeping the layer dimension of the decoder states
+            if torch.is_tensor(encoder_hidden):
+                encoder_hidden = torch.mean(encoder_hidden, 0, keepdim=True)
+            else:
+                encoder_hidden = torch.mean(encoder_hidden[0], 0, keepdim=True), torch.mean(encoder_hidden[1], 0,
+                                                                                            keepdim=True)
             encoder_output = torch.div(
                 torch.add(encoder_output[:, :, 0:self.config.nhid],
                           encoder_output[:, :, self.config.nhid:2 * self.config.nhid]), 2)
 
-        # Initialize hidden states of decoder with the last hidden states of the encoder
-        decoder_hidden = encoder_hidden
-        context_vector = Variable(torch.zeros(batch_sentence2.size(0), 1, self.config.nhid))
+        return encoder_output, encoder_hidden
+
+    def encode_unique(self, batch_sentence1, encoding_cache=None):
+        """Like encode, but every distinct source query of the batch is encoded once and repeated queries share the
+        encoding, so their gradients add up; with encoding_cache, cached queries are not encoded at all."""
+        if encoding_cache is not None:
+            encodings = encoding_cache.encode(batch_sentence1, self.encode_rows)
+            return encodings[0], self.rows_to_states(encodings[1:])
+        unique_queries, inverse = torch.unique(batch_sentence1, dim=0, return_inverse=True)
+        if unique_queries.size(0) == batch_sentence1.size(0):
+            return self.encode(batch_sentence1)
+        encoder_output, encoder_hidden = self.encode(unique_queries)
+        return encoder_output.index_select(0, inverse), self.select_states(encoder_hidden, inverse)
+
+    @staticmethod
+    def select_states(encoder_hidden, index):
+        """Returns the rows of the encoder states, a tensor or an (hidden, cell) pair, of the given batch indices."""
+        # the batch is the second to last dimension of the encoder states
+        if torch.is_tensor(encoder_hidden):
+            return encoder_hidden.index_select(encoder_hidden.dim() - 2, index)
+        return tuple(state.index_select(state.dim() - 2, index) for state in encoder_hidden)
+
+    def encode_rows(self, batch_sentence1):
+        """Returns the encoder outputs and states of a batch of source queries with the queries as first dimension."""
+        encoder_output, encoder_hidden = self.encode(batch_sentence1)
+        states = (encoder_hidden,) if torch.is_tensor(encoder_hidden) else encoder_hidden
+        return (encoder_output,) + tuple(state.transpose(0, state.dim() - 2) for state in states)
+
+    def rows_to_states(self, rows):
+        """Inverse of encode_rows for the encoder states."""
+        states = tuple(state.transpose(0, state.dim() - 2).contiguous() for state in rows)
+        return states[0] if len(states) == 1 else states
+
+    def init_context_vector(self, bsz):
+        context_vector = Variable(torch.zeros(bsz, 1, self.config.nhid))
         if self.config.cuda:
             context_vector = context_vector.cuda()
+        return context_vector
 
-        loss = 0
-        for idx in range(batch_sentence2.size(1) - 1):
-            # Use the real target outputs as each next input (teacher forcing)
-            input_variable = batch_sentence2[:, idx]
-            target_variable = batch_sentence2[:, idx + 1]
-
+    def decode_step(self, input_variable, decoder_hidden, context_vector, encoder_output):
+        """Feeds one token per sequence to the attentive decoder and returns the log-probabilities of the next token."""
+        with step_profiler.record('embedding'):
             embedded_input = self.embedding(input_variable).unsqueeze(1)
-            embedded_input = torch.cat((embedded_input, context_vector), 2)
+        embedded_input = torch.cat((embedded_input, context_vector), 2)
+        with step_profiler.record('decoder'):
             decoder_output, decoder_hidden = self.decoder(embedded_input, decoder_hidden)
+        with step_profiler.record('attention'):
             output, context_vector, attn_weights = self.attention(decoder_output, encoder_output)
-            loss += self.compute_loss(output, target_variable, idx, length)
+        return output, decoder_hidden, context_vector
+
+    def score_queries(self, encoder_output, decoder_hidden, queries, length):
+        """Returns the log-likelihood of each target query given the encoding of its source query."""
+        context_vector = self.init_context_vector(queries.size(0))
+        log_likelihood = 0
+        for idx in range(queries.size(1) - 1):
+            output, decoder_hidden, context_vector = self.decode_step(queries[:, idx], decoder_hidden, context_vector,
+                                                                      encoder_output)
+            log_probs = torch.gather(output, dim=1, index=queries[:, idx + 1].unsqueeze(1)).squeeze(1)
+            log_likelihood += log_probs * helper.mask(length, idx).float()
+        return log_likelihood
+
+    @staticmethod
+    def compute_token_loss(logits, target, seq_idx, length):
+        """Returns the summed loss of the target tokens at position seq_idx and their number."""
+        losses = -torch.gather(logits, dim=1, index=target.unsqueeze(1)).squeeze(1)
+        mask = helper.mask(length, seq_idx).float()
+        return (losses * mask).sum(), mask.sum()
+
+    def decoder_outputs(self, batch_sentence1, batch_sentence2):
+        """Yields the log-probabilities of the next token at every position of the target queries, the previous
+        target token being fed to the decoder (teacher forcing)."""
+        encoder_output, encoder_hidden = self.encode_unique(batch_sentence1)
+
+        # Initialize hidden states of decoder with the last hidden states of the encoder
+        decoder_hidden = encoder_hidden
+        context_vector = self.init_context_vector(batch_sentence2.size(0))
+        for idx in range(batch_sentence2.size(1) - 1):
+            output, decoder_hidden, context_vector = self.decode_step(batch_sentence2[:, idx], decoder_hidden,
+                                                                      context_vector, encoder_output)
+            yield output
+
+    def forward(self, batch_sentence1, batch_sentence2, length, token_sum=False):
+        """"Defines the forward computation of the question classifier. With token_sum, returns the summed loss of
+        the target tokens and their number instead of the sum of the per position mean losses."""
+        loss, num_tokens = 0, 0
+        with step_profiler.record('decoder_loop'):
+            for idx, output in enumerate(self.decoder_outputs(batch_sentence1, batch_sentence2)):
+                target_variable = batch_sentence2[:, idx + 1]
+                with step_profiler.record('loss'):
+                    if token_sum:
+                        token_loss, tokens = self.compute_token_loss(output, target_variable, idx, length)
+                        loss, num_tokens = loss + token_loss, num_tokens + tokens
+                    else:
+                        loss += self.compute_loss(output, target_variable, idx, length)
 
+        if token_sum:
+            return loss, num_tokens
         return loss
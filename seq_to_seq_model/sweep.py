@@ -0,0 +1,186 @@
+###############################################################################
+# Author: agent
+# Project: Context-aware Query Suggestion
+# Date Created: 10/18/2026
+#
+# File Description: This script runs a hyperparameter sweep. The corpus, the
+# dictionary and the embedding matrix are loaded once and shared with a pool
+# of forked trainers, unpromising runs are stopped early and the results are
+# collected into one summary table.
+###############################################################################
+
+import util, helper, data, train, nn_layer, os, sys, copy, json, time, itertools, statistics
+import multiprocessing as mp
+import torch
+import torch.nn as nn
+from torch import optim
+from seq2seq import Sequence2Sequence
+
+# set by the main process before the pool is forked, the trainers share them
+dictionary, train_batches, dev_batches, embedding_weights, dev_curves, free_cores = None, None, None, None, None, None
+
+
+def cast_value(choice, default):
+    """Converts a swept value to the type of the default value of its argument."""
+    if isinstance(default, bool):
+        # bool('False') is True, so the flags are parsed by name
+        assert choice.lower() in ('true', 'false'), 'the values of a flag are true or false, not %s' % choice
+        return choice.lower() == 'true'
+    return type(default)(choice)
+
+
+def parse_sweep(args):
+    """Returns the configurations of the cartesian product of the values of every swept argument."""
+    # the runs are trained in daemonic pool processes, which cannot start the validation process
+    assert not args.async_validation, 'a sweep cannot use --async_validation'
+    names, values = [], []
+    for spec in args.sweep:
+        name, choices = spec.split('=', 1)
+        assert hasattr(args, name), 'unknown argument %s' % name
+        # the frozen embedding matrix is shared by every run, so its size is fixed
+        assert name != 'emsize', 'emsize cannot be swept'
+        assert name != 'async_validation', 'async_validation cannot be swept'
+        names.append(name)
+        values.append([cast_value(choice, getattr(args, name)) for choice in choices.split(',')])
+    return [dict(zip(names, combination)) for combination in itertools.product(*values)]
+
+
+def is_unpromising(dev_losses, other_curves, min_runs, warmup_checks):
+    """Median stopping rule: a run is unpromising when its best dev loss is worse than the median of the best dev
+    losses the other runs had after the same number of checks."""
+    num_checks = len(dev_losses)
+    if num_checks < warmup_checks:
+        return False
+    others = [min(curve[:num_checks]) for curve in other_curves if len(curve) >= num_checks]
+    if len(others) < min_runs:
+        return False
+    return min(dev_losses) > statistics.median(others)
+
+
+class SweepTrain(train.Train):
+    """Train class of a sweep run, which also stops when its dev losses fall behind those of the other runs."""
+
+    def __init__(self, run_id, model, optimizer, config):
+        super(SweepTrain, self).__init__(model, optimizer, dictionary, None, config, -1)
+        self.run_id = run_id
+        self.pruned = False
+
+    def record_validation(self, dev_loss, epoch_no=None, batch_no=None, state=None):
+        super(SweepTrain, self).record_validation(dev_loss, epoch_no, batch_no, state)
+        dev_curves[self.run_id] = list(self.dev_losses)
+        other_curves = [curve for run_id, curve in dev_curves.items() if run_id != self.run_id]
+        if not self.stop and is_unpromising(self.dev_losses, other_curves, self.config.sweep_min_runs,
+                                            self.config.sweep_warmup_checks):
+            print('stopped as unpromising after %d checks' % len(self.dev_losses))
+            self.stop = True
+            self.pruned = True
+
+
+def run_trial(trial):
+    """Trains one configuration in a pool process, pinned to its own cores, and returns its summary."""
+    run_id, params, config = trial
+    cores = free_cores.get()
+    start = time.time()
+    try:
+        if hasattr(os, 'sched_setaffinity'):
+            os.sched_setaffinity(0, cores)
+        torch.set_num_threads(len(cores))
+        if not os.path.isdir(config.save_path):
+            os.makedirs(config.save_path)
+        sys.stdout = open(os.path.join(config.save_path, 'train.log'), 'w', buffering=1)
+        print(json.dumps(params))
+
+        torch.manual_seed(config.seed)
+        model = Sequence2Sequence(dictionary, None, config)
+        # every run reads the same frozen embedding matrix, which is never copied
+        model.embedding.embedding.weight = nn.Parameter(embedding_weights, requires_grad=False)
+        if config.output_layer == 'tied':
+            model.attention.out.weight = model.embedding.embedding.weight
+        if config.cuda:
+            model = model.cuda()
+        optimizer = optim.Adam(filter(lambda p: p.requires_grad, model.parameters()), config.lr)
+        trainer = SweepTrain(run_id, model, optimizer, config)
+        trainer.train_epochs(train_batches, dev_batches, 0, config.epochs)
+        status = 'pruned' if trainer.pruned else 'done'
+        best_loss = trainer.best_dev_loss
+        num_checks = len(trainer.dev_losses)
+    except Exception as e:
+        print('failed: %r' % e)
+        status, best_loss, num_checks = 'failed', -1, 0
+    finally:
+        free_cores.put(cores)
+    return {'run': run_id, 'params': params, 'status': status, 'best_loss': best_loss, 'checks': num_checks,
+            'minutes': (time.time() - start) / 60, 'save_path': config.save_path}
+
+
+def summarize(results, filename):
+    """Prints the runs sorted by best dev loss and writes them to a JSON file."""
+    # runs that were never validated have a best loss of -1
+    results = sorted(results, key=lambda r: (r['status'] == 'failed', r['best_loss'] if r['best_loss'] >= 0 else
+                                             float('inf')))
+    print('%5s %-8s %10s %7s %8s  %s' % ('run', 'status', 'best loss', 'checks', 'minutes', 'params'))
+    for result in results:
+        print('%5d %-8s %10.4f %7d %8.1f  %s' % (result['run'], result['status'], result['best_loss'],
+                                                 result['checks'], result['minutes'],
+                                                 ' '.join('%s=%s' % item for item in sorted(result['params'].items()))))
+    with open(filename, 'w') as f:
+        json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    args = util.get_args()
+    args.rank, args.world_size, args.distributed = 0, 1, False
+    trials = parse_sweep(args)
+    print('Number of runs = ', len(trials))
+
+    dictionary = data.Dictionary(args.normalizer)
+    train_corpus = data.Corpus(args.data, 'session_train.txt', dictionary, args.max_length,
+                               normalizer_cache_size=args.normalizer_cache_size)
+    dev_corpus = data.Corpus(args.data, 'session_dev.txt', dictionary, args.max_length,
+                             normalizer_cache_size=args.normalizer_cache_size)
+    print('Train set size = ', len(train_corpus.data))
+    print('Dev set size = ', len(dev_corpus.data))
+    print('Vocabulary size = ', len(dictionary))
+    train_batches = helper.batchify(train_corpus.data, args.batch_size)
+    dev_batches = helper.batchify(dev_corpus.data, args.batch_size)
+
+    embeddings_index = helper.load_word_embeddings(args.word_vectors_directory, 'glove.840B.300d.q2q.txt')
+    embedding_layer = nn_layer.EmbeddingLayer(len(dictionary), args.emsize, 0)
+    embedding_layer.init_embedding_weights(dictionary, embeddings_index, args.emsize)
+    embedding_weights = embedding_layer.embedding.weight.data.share_memory_()
+    del embeddings_index, embedding_layer
+
+    # the trainers are forked so that they inherit the corpus and the embedding matrix instead of loading them again
+    context = mp.get_context('fork')
+    manager = context.Manager()
+    dev_curves = manager.dict()
+    free_cores = context.Queue()
+    available_cores = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else list(
+        range(os.cpu_count()))
+    for worker in range(args.num_workers):
+        free_cores.put(set(available_cores[worker * args.num_threads:(worker + 1) * args.num_threads]) or
+                       set(available_cores))
+
+    sweep_dir = os.path.join(args.save_path, 'sweep')
+    run_configs = []
+    for run_id, params in enumerate(trials):
+        config = copy.copy(args)
+        for name, value in params.items():
+            setattr(config, name, value)
+        config.save_path = os.path.join(sweep_dir, 'run_%03d' % run_id) + '/'
+        if args.telemetry_file:
+            config.telemetry_file = config.save_path + 'telemetry.jsonl'
+        run_configs.append((run_id, params, config))
+
+    start = time.time()
+    results = []
+    # every run gets a fresh process, which releases its memory when the run ends
+    pool = context.Pool(args.num_workers, maxtasksperchild=1)
+    for result in pool.imap_unordered(run_trial, run_configs):
+        results.append(result)
+        print('run %d %s, best loss = %.4f (%d of %d runs, %s)' % (
+            result['run'], result['status'], result['best_loss'], len(results), len(run_configs),
+            helper.convert_to_minutes(time.time() - start)))
+    pool.close()
+    pool.join()
+    summarize(results, os.path.join(sweep_dir, 'summary.json'))
@@ -0,0 +1,87 @@
+import copy, glob, helper, os, random, torch
+from conftest import create_trainer
+from seq2seq import Sequence2Sequence
+
+
+def test_checkpoints_are_copied_then_written_and_only_the_last_are_kept(tmp_path):
+    writer = helper.CheckpointWriter(keep_last=2)
+    weight = torch.zeros(2)
+    for step in range(3):
+        writer.save({'weight': weight, 'step': step}, str(tmp_path / ('checkpoint_%d.pth.tar' % step)),
+                    str(tmp_path / 'checkpoint_*.pth.tar'))
+        # the snapshot was copied when queued, later updates do not reach it
+        weight += 1
+    writer.wait()
+    assert sorted(os.listdir(str(tmp_path))) == ['checkpoint_1.pth.tar', 'checkpoint_2.pth.tar']
+    state = torch.load(str(tmp_path / 'checkpoint_2.pth.tar'))
+    assert state['step'] == 2 and torch.equal(state['weight'], torch.full((2,), 2.))
+
+
+def test_random_number_generators_are_restored(tmp_path):
+    helper.save_checkpoint({'rng_states': helper.get_rng_states()}, str(tmp_path / 'rng.pth.tar'))
+    draws = random.random(), helper.np.random.rand(), torch.rand(1)
+    helper.set_rng_states(torch.load(str(tmp_path / 'rng.pth.tar'))['rng_states'])
+    assert draws == (random.random(), helper.np.random.rand(), torch.rand(1))
+
+
+def run(trainer, batches, checkpoint=None):
+    start_epoch, start_batch = 0, 0
+    if checkpoint:
+        trainer.local_model.load_state_dict(checkpoint['state_dict'])
+        trainer.optimizer.load_state_dict(checkpoint['optimizer'])
+        start_epoch, start_batch = trainer.load_state(checkpoint)
+    trainer.train_epochs(batches, batches[:1], start_epoch, 1, start_batch)
+    return trainer.local_model.state_dict()
+
+
+def test_resuming_from_a_checkpoint_continues_after_its_batch(trainer, corpus, config, dictionary):
+    config.print_every, config.plot_every, config.dev_every, config.save_every = 1, 1, 2, 1
+    batches = helper.batchify(corpus.data, 3)
+    expected = run(trainer, batches)
+    assert len(batches) > config.keep_checkpoints
+    assert len(glob.glob(config.save_path + 'checkpoint_*.pth.tar')) == config.keep_checkpoints
+    checkpoint = torch.load(config.save_path + 'checkpoint_001_%07d.pth.tar' % (len(batches) - 1))
+    assert checkpoint['batch'] == len(batches) - 1 and checkpoint['epoch'] == 0
+    train_losses = list(checkpoint['train_losses'])
+    assert len(train_losses) == len(batches) - 1
+
+    resumed_trainer = create_trainer(Sequence2Sequence(dictionary, {}, config), dictionary, config)
+    resumed = run(resumed_trainer, batches, checkpoint)
+    assert resumed_trainer.train_losses[:-1] == train_losses
+    for key, value in expected.items():
+        assert torch.allclose(resumed[key], value, atol=1e-6), key
+
+
+def test_warm_start_keeps_the_states_of_the_old_words(trainer, corpus, config, dictionary):
+    batches = helper.batchify(corpus.data, 3)[:1]
+    trainer.train_step(batches)
+    old_size = len(dictionary)
+    state_dict = {key: value.clone() for key, value in trainer.local_model.state_dict().items()}
+    optimizer_state = copy.deepcopy(trainer.optimizer.state_dict())
+
+    for word in ['rome', 'berlin']:
+        dictionary.add_word(word)
+    warm_trainer = create_trainer(Sequence2Sequence(dictionary, {}, config), dictionary, config)
+    grown = helper.grow_state_dict(warm_trainer.local_model, dict(state_dict), old_size)
+    assert grown and any(name.endswith('out.bias') for name in grown)
+    new_state = warm_trainer.local_model.state_dict()
+    for name in grown:
+        assert new_state[name].size(0) == old_size + 2
+        assert torch.equal(new_state[name][:old_size], state_dict[name])
+        if name.endswith('out.bias'):
+            # the new words are not favored before fine-tuning
+            assert (new_state[name][old_size:] == state_dict[name].min()).all()
+
+    warm_trainer.optimizer.load_state_dict(optimizer_state)
+    helper.grow_optimizer_state(warm_trainer.optimizer)
+    num_grown = 0
+    for inner_optimizer in getattr(warm_trainer.optimizer, 'optimizers', [warm_trainer.optimizer]):
+        for param, state in inner_optimizer.state.items():
+            for value in state.values():
+                if torch.is_tensor(value) and value.dim() > 0:
+                    assert value.size() == param.size()
+                    if param.size(0) == old_size + 2:
+                        assert not value[old_size:].any()
+                        num_grown += 1
+    assert num_grown > 0
+    assert warm_trainer.train_step(batches) > 0
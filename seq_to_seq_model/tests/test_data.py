@@ -0,0 +1,12 @@
+import data
+
+
+def test_the_corpus_uses_the_normalizer_of_the_dictionary(data_dir, config):
+    dictionary = data.Dictionary(normalizer_mode='wordpunct')
+    with open(data_dir + '/session_train.txt', 'a') as f:
+        f.write('Cheap Flights!:::PARIS, hotels\n')
+    corpus = data.Corpus(data_dir, 'session_train.txt', dictionary, config.max_length, normalizer_cache_size=3)
+    assert corpus.normalizer.mode == 'wordpunct'
+    assert corpus.normalizer.cache_size == 3
+    assert corpus.data[-1].sentence1 == ['cheap', 'flights', dictionary.end_token]
+    assert corpus.data[-1].sentence2 == [dictionary.start_token, 'paris', 'hotels', dictionary.end_token]
@@ -0,0 +1,34 @@
+import distill, helper, torch
+from conftest import get_config
+
+
+def test_matching_the_teacher_exactly_leaves_the_likelihood_term(config):
+    torch.manual_seed(config.seed)
+    output = torch.log_softmax(torch.randn(3, 7), 1)
+    target, length = torch.LongTensor([1, 2, 3]), torch.LongTensor([2, 2, 1])
+    loss, num_tokens = distill.distillation_token_loss(output, output.clone(), target, 0, length, config)
+    nll = -output.gather(1, target.unsqueeze(1)).sum()
+    assert num_tokens.item() == 3
+    assert torch.allclose(loss, (1 - config.distill_alpha) * nll, atol=1e-5)
+
+
+def test_topk_teacher_outputs_only_match_the_kept_tokens(config):
+    torch.manual_seed(config.seed)
+    student, teacher = torch.log_softmax(torch.randn(2, 7), 1), torch.log_softmax(torch.randn(2, 7), 1)
+    target, length = torch.LongTensor([1, 2]), torch.LongTensor([2, 2])
+    config.distill_alpha = 1
+    values, indices = teacher.topk(7, 1)
+    full, _ = distill.distillation_token_loss(student, teacher, target, 0, length, config)
+    topk, _ = distill.distillation_token_loss(student, (values.half(), indices.int()), target, 0, length, config)
+    # with every token kept, only the precision of the cached teacher outputs differs
+    assert torch.allclose(full, topk, atol=1e-2)
+
+
+def test_student_is_smaller_and_keeps_the_teacher_embeddings(corpus, dictionary, model):
+    config = get_config('--model', 'GRU', '--nhid', '4')
+    student = distill.build_student(model, dictionary, config)
+    assert sum(p.numel() for p in student.parameters()) < sum(p.numel() for p in model.parameters())
+    assert torch.equal(student.embedding.embedding.weight, model.embedding.embedding.weight)
+    batch_sentence1, batch_sentence2, length = helper.queries_to_tensors(corpus.data[:4], dictionary)
+    loss, num_tokens = student(batch_sentence1, batch_sentence2, length, True)
+    assert num_tokens.item() == length.sum().item()
@@ -0,0 +1,54 @@
+import helper, pytest, torch
+from conftest import get_config
+from seq2seq import Sequence2Sequence
+
+
+def build(dictionary, *argv):
+    config = get_config(*argv)
+    torch.manual_seed(config.seed)
+    return Sequence2Sequence(dictionary, {}, config), config
+
+
+def output_layer(model):
+    return model.attention.out
+
+
+def test_the_full_layout_has_the_parameters_of_a_linear_layer(corpus, dictionary):
+    model, config = build(dictionary)
+    layer = output_layer(model)
+    assert sorted(name for name, _ in layer.named_parameters()) == ['bias', 'weight']
+    assert layer.weight.size() == (len(dictionary), config.nhid)
+    linear = torch.nn.Linear(config.nhid, len(dictionary))
+    # checkpoints of the linear output layer still load
+    layer.load_state_dict(linear.state_dict())
+    hidden = torch.randn(3, config.nhid)
+    assert torch.allclose(layer(hidden), linear(hidden), atol=1e-6)
+
+
+def test_the_tied_layout_reuses_the_input_embeddings(corpus, dictionary):
+    model, config = build(dictionary, '--output_layer', 'tied')
+    full_model, _ = build(dictionary)
+    assert output_layer(model).weight is model.embedding.embedding.weight
+    assert sum(param.numel() for param in model.parameters()) < sum(param.numel() for param in full_model.parameters())
+    loss = model(*helper.queries_to_tensors(corpus.data[:4], dictionary))
+    loss.backward()
+    # the pretrained embeddings are frozen, so only the projection to the embedding size is trained
+    assert not model.embedding.embedding.weight.requires_grad
+    assert output_layer(model).projection.weight.grad is not None
+
+
+def test_the_factorized_layout_has_a_rank_bottleneck(corpus, dictionary):
+    model, config = build(dictionary, '--output_layer', 'factorized', '--output_rank', '4')
+    layer = output_layer(model)
+    assert layer.weight.size() == (len(dictionary), 4)
+    assert layer.projection.weight.size() == (4, config.nhid)
+    assert layer.projection.bias is None
+
+
+@pytest.mark.parametrize('layout', ['full', 'tied', 'factorized'])
+def test_every_layout_trains(corpus, dictionary, layout):
+    model, config = build(dictionary, '--output_layer', layout, '--output_rank', '4')
+    loss = model(*helper.queries_to_tensors(corpus.data[:4], dictionary))
+    loss.backward()
+    assert output_layer(model).bias.grad is not None
+    assert torch.isfinite(loss).item()
@@ -0,0 +1,67 @@
+import helper, pytest, torch
+from conftest import get_config
+from seq2seq import Sequence2Sequence
+
+
+@pytest.mark.parametrize('model_type', ['LSTM', 'GRU'])
+def test_encoder_directions_are_averaged(corpus, dictionary, model_type):
+    config = get_config('--model', model_type)
+    model = Sequence2Sequence(dictionary, {}, config)
+    batch_sentence1, batch_sentence2, length = helper.queries_to_tensors(corpus.data[:4], dictionary)
+    encoder_output, encoder_hidden = model.encode(batch_sentence1)
+    assert encoder_output.size() == (4, batch_sentence1.size(1), config.nhid)
+    states = (encoder_hidden,) if model_type == 'GRU' else encoder_hidden
+    for state in states:
+        assert state.size() == (1, 4, config.nhid)
+
+    loss, num_tokens = model(batch_sentence1, batch_sentence2, length, True)
+    assert num_tokens.item() == length.sum().item()
+    loss.backward()
+    assert all(param.grad is not None for param in model.encoder.parameters())
+
+
+@pytest.mark.parametrize('model_type', ['LSTM', 'GRU'])
+def test_repeated_queries_share_their_encoding(corpus, dictionary, model_type):
+    config = get_config('--model', model_type)
+    model = Sequence2Sequence(dictionary, {}, config)
+    model.eval()
+    instances = [corpus.data[0], corpus.data[1], corpus.data[0]]
+    batch_sentence1 = helper.queries_to_tensors(instances, dictionary)[0]
+    with torch.no_grad():
+        expected_output, expected_hidden = model.encode(batch_sentence1)
+        encoder_output, encoder_hidden = model.encode_unique(batch_sentence1)
+    assert torch.allclose(encoder_output, expected_output, atol=1e-6)
+    for state, expected in zip(encoder_hidden, expected_hidden):
+        assert torch.allclose(state, expected, atol=1e-6)
+
+
+def test_a_model_loaded_from_inference_weights_has_the_same_loss(corpus, dictionary, config, model, tmp_path):
+    filename = str(tmp_path / 'model.weights')
+    helper.save_inference_weights(model.state_dict(), filename)
+    torch.manual_seed(config.seed + 1)
+    loaded = Sequence2Sequence(dictionary, {}, config)
+    helper.load_model_weights(loaded, filename)
+    model.eval()
+    loaded.eval()
+    batch = helper.queries_to_tensors(corpus.data[:4], dictionary)
+    assert torch.allclose(loaded(*batch), model(*batch))
+
+
+@pytest.mark.parametrize('model_type', ['LSTM', 'GRU'])
+def test_cached_encodings_match_the_encoder(corpus, dictionary, model_type):
+    config = get_config('--model', model_type)
+    model = Sequence2Sequence(dictionary, {}, config)
+    model.eval()
+    cache = helper.EncodingCache(10)
+    batch_sentence1 = helper.queries_to_tensors(corpus.data[:4], dictionary)[0]
+    with torch.no_grad():
+        expected_output, expected_hidden = model.encode(batch_sentence1)
+        model.encode_unique(batch_sentence1[:2], cache)
+        encoder_output, encoder_hidden = model.encode_unique(batch_sentence1, cache)
+    assert cache.hits == 2
+    assert torch.allclose(encoder_output, expected_output, atol=1e-6)
+    if model_type == 'GRU':
+        encoder_hidden, expected_hidden = (encoder_hidden,), (expected_hidden,)
+    for state, expected in zip(encoder_hidden, expected_hidden):
+        assert state.size() == expected.size()
+        assert torch.allclose(state, expected, atol=1e-6)
@@ -0,0 +1,33 @@
+import pytest, sweep
+from conftest import get_config
+
+
+def test_the_sweep_is_the_product_of_the_swept_values():
+    args = get_config('--sweep', 'nhid=8,16', 'model=LSTM,GRU', 'lr=0.01')
+    trials = sweep.parse_sweep(args)
+    assert trials == [{'nhid': 8, 'model': 'LSTM', 'lr': 0.01}, {'nhid': 8, 'model': 'GRU', 'lr': 0.01},
+                      {'nhid': 16, 'model': 'LSTM', 'lr': 0.01}, {'nhid': 16, 'model': 'GRU', 'lr': 0.01}]
+
+
+def test_flags_are_swept_by_name():
+    args = get_config('--sweep', 'bidirection=True,false')
+    assert sweep.parse_sweep(args) == [{'bidirection': True}, {'bidirection': False}]
+    with pytest.raises(AssertionError):
+        sweep.parse_sweep(get_config('--sweep', 'bidirection=0'))
+
+
+@pytest.mark.parametrize('argv', [['--sweep', 'emsize=8,16'], ['--sweep', 'async_validation=true'],
+                                  ['--sweep', 'nhid=8,16', '--async_validation'], ['--sweep', 'unknown=1']])
+def test_unsupported_sweeps_are_rejected(argv):
+    with pytest.raises(AssertionError):
+        sweep.parse_sweep(get_config(*argv))
+
+
+def test_a_run_is_unpromising_when_worse_than_the_median_of_the_others():
+    others = [[3.0, 2.0, 1.0], [3.0, 2.5], [4.0, 3.0, 2.0], [5.0]]
+    # after two checks, the best losses of the other runs are 2.0, 2.5 and 3.0
+    assert sweep.is_unpromising([3.0, 2.6], others, 3, 2)
+    assert not sweep.is_unpromising([3.0, 2.4], others, 3, 2)
+    # before the warmup checks and with too few other runs, a run is never stopped
+    assert not sweep.is_unpromising([9.0], others, 1, 2)
+    assert not sweep.is_unpromising([3.0, 2.6, 2.5], others, 3, 2)
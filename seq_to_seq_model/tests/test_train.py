@@ -0,0 +1,50 @@
+import helper, torch, train
+
+
+def gradients(model):
+    return [param.grad.clone() for param in model.parameters() if param.grad is not None]
+
+
+def same_shape_pairs(corpus):
+    """Returns the query pairs whose queries have the most common lengths, so that batching them adds no padding."""
+    shapes = [(len(instance.sentence1), len(instance.sentence2)) for instance in corpus.data]
+    shape = max(set(shapes), key=shapes.count)
+    return [instance for instance, instance_shape in zip(corpus.data, shapes) if instance_shape == shape]
+
+
+def test_the_loss_of_a_step_is_the_mean_over_the_target_tokens(trainer, corpus, model, dictionary):
+    batch = corpus.data[:6]
+    loss, num_tokens = model(*helper.queries_to_tensors(batch, dictionary), token_sum=True)
+    assert num_tokens.item() == sum(len(instance.sentence2) - 1 for instance in batch)
+    assert abs(trainer.train_step([batch]) - loss.item() / num_tokens.item()) < 1e-5
+
+
+def test_accumulated_batches_have_the_gradients_of_one_batch(trainer, corpus, model):
+    batch = same_shape_pairs(corpus)
+    model.zero_grad()
+    single = trainer.accumulate_gradients([batch])
+    expected = gradients(model)
+    model.zero_grad()
+    assert abs(trainer.accumulate_gradients([batch[:1], batch[1:]]) - single) < 1e-5
+    for grad, expected_grad in zip(gradients(model), expected):
+        assert torch.allclose(grad, expected_grad, atol=1e-6)
+
+
+def test_the_dev_loss_is_the_mean_over_the_target_tokens(corpus, model, dictionary, config):
+    batch = same_shape_pairs(corpus)
+    dev_loss = train.compute_dev_loss(model, [batch], dictionary, config)
+    assert abs(train.compute_dev_loss(model, [batch[:1], batch[1:]], dictionary, config) - dev_loss) < 1e-5
+    assert model.training
+
+
+def test_the_validation_process_computes_the_dev_loss(trainer, corpus, model, dictionary, config):
+    batches = [corpus.data[:6], corpus.data[6:12]]
+    dev_loss = train.compute_dev_loss(model, batches, dictionary, config)
+    process = train.ValidationProcess(model, batches, dictionary, config)
+    try:
+        process.submit(trainer.training_state(1, 1))
+        result, state = process.collect()
+    finally:
+        process.close()
+    assert abs(result - dev_loss) < 1e-5
+    assert state['batch'] == 1
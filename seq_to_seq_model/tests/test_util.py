@@ -0,0 +1,13 @@
+import json
+from conftest import get_config
+
+
+def test_a_tuned_config_replaces_the_defaults_only(tmp_path):
+    filename = str(tmp_path / 'tuned_config.json')
+    with open(filename, 'w') as f:
+        json.dump({'model': 'seq2seq', 'settings': {'batch_size': 48, 'num_threads': 3, 'num_interop_threads': 2}}, f)
+    config = get_config('--tuned_config', filename)
+    assert (config.batch_size, config.num_threads, config.num_interop_threads) == (48, 3, 2)
+    # the arguments given on the command line take precedence
+    config = get_config('--tuned_config', filename, '--batch_size', '16')
+    assert (config.batch_size, config.num_threads) == (16, 3)
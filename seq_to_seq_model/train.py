@@ -6,12 +6,90 @@
 # File Description: This script contains code to train the model.
 ###############################################################################
 
-import time, helper, torch, numpy
+import util, time, helper, torch, contextlib, glob, multiprocessing, queue, numpy
+from common import step_profiler, telemetry
 
 import torch.nn as nn
 from torch.nn.utils import clip_grad_norm
 
 
+def compute_dev_loss(model, dev_batches, dictionary, config):
+    """Returns the mean loss of a model over the target tokens of dev batches, computed without gradients."""
+    # Turn on evaluation mode which disables dropout.
+    model.eval()
+
+    dev_loss, num_tokens = 0, 0
+    with torch.no_grad():
+        for batch in dev_batches:
+            dev_sentences1, dev_sentences2, length = helper.queries_to_tensors(batch, dictionary)
+            if config.cuda:
+                dev_sentences1 = dev_sentences1.cuda()
+                dev_sentences2 = dev_sentences2.cuda()
+                length = length.cuda()
+
+            loss, tokens = model(dev_sentences1, dev_sentences2, length, True)
+            # sums the per replica values if we are using nn.DataParallel()
+            dev_loss += loss.sum().item()
+            num_tokens += tokens.sum().item()
+
+    # Turn on training mode at the end of validation.
+    model.train()
+
+    return dev_loss / max(num_tokens, 1)
+
+
+def validation_worker(model, dev_batches, dictionary, config, requests, results):
+    """Computes the dev loss of every weight snapshot received until None."""
+    torch.set_num_threads(config.num_threads)
+    state_dict = requests.get()
+    while state_dict is not None:
+        # the keys of models wrapped in nn.DataParallel start with module.
+        model.load_state_dict({key[7:] if key.startswith('module.') else key: value
+                               for key, value in state_dict.items()})
+        results.put(compute_dev_loss(model, dev_batches, dictionary, config))
+        state_dict = requests.get()
+
+
+class ValidationProcess(object):
+    """Validates weight snapshots in a separate process while training continues, one snapshot at a time."""
+
+    def __init__(self, model, dev_batches, dictionary, config):
+        assert not config.cuda, 'out-of-process validation runs on CPU'
+        # spawned rather than forked, since the training process already runs threads (the plots, the checkpoint
+        # writer and the thread pools of torch), which a fork does not copy
+        context = multiprocessing.get_context('spawn')
+        self.requests = context.Queue()
+        self.results = context.Queue()
+        self.process = context.Process(target=validation_worker,
+                                       args=(model, dev_batches, dictionary, config, self.requests, self.results))
+        self.process.daemon = True
+        self.process.start()
+        self.pending = None
+
+    def submit(self, state):
+        """Sends the weights of a training state to be validated, the state is kept until its loss is collected."""
+        self.pending = helper.cpu_copy(state)
+        self.requests.put(self.pending['state_dict'])
+
+    def collect(self):
+        """Waits for the loss of the pending snapshot and returns it with the training state, None if there is none."""
+        if self.pending is None:
+            return None
+        while True:
+            try:
+                dev_loss = self.results.get(timeout=1)
+                break
+            except queue.Empty:
+                if not self.process.is_alive():
+                    raise RuntimeError('validation process exited unexpectedly')
+        state, self.pending = self.pending, None
+        return dev_loss, state
+
+    def close(self):
+        self.requests.put(None)
+        self.process.join()
+
+
 class Train:
     """Train class that encapsulate all functionalities of the training procedure."""
 
@@ -29,18 +107,64 @@ class Train:
         self.stop = False
         self.train_losses = []
         self.dev_losses = []
+        self.full_dev_losses = []
+        self.validation_process = None
+        # in distributed training, only rank 0 validates, saves checkpoints and plots, using the unwrapped model
+        self.is_master = config.rank == 0
+        self.local_model = model.module if config.distributed else model
+        self.checkpoint_writer = helper.CheckpointWriter(config.keep_checkpoints)
+        self.plot_writer = helper.PlotWriter() if config.plot_mode == 'async' else None
+        self.telemetry = telemetry.Telemetry(config.telemetry_file if self.is_master else '', config.telemetry_interval,
+                                             config.cuda)
+        # optimizer steps over all epochs, which --profile_steps counts
+        self.steps_done = 0
+        self.profiler = step_profiler.StepProfiler(config.profile_steps, config.profile_dir,
+                                                   'train_rank%d' % config.rank, config.cuda)
+
+    def train_epochs(self, train_batches, dev_batches, start_epoch, n_epochs, start_batch=0):
+        """Trains model for n_epochs epochs, the first one resuming after its first start_batch batches"""
+        # the validation checks during an epoch use a fixed stratified sample of the dev batches, if requested
+        check_batches = dev_batches
+        if self.config.dev_sample > 0:
+            check_batches = helper.stratified_sample(dev_batches, self.config.dev_sample, self.batch_stratum,
+                                                     self.config.seed)
+        if self.config.async_validation and self.is_master:
+            self.validation_process = ValidationProcess(self.local_model, check_batches, self.dictionary, self.config)
 
-    def train_epochs(self, train_batches, dev_batches, start_epoch, n_epochs):
-        """Trains model for n_epochs epochs"""
         for epoch in range(start_epoch, start_epoch + n_epochs):
             if not self.stop:
-                self.train(train_batches, dev_batches, (epoch + 1))
-                helper.save_plot(self.train_losses, self.config.save_path, 'training', epoch + 1)
-                helper.save_plot(self.dev_losses, self.config.save_path, 'dev', epoch + 1)
+                self.train(train_batches, check_batches, (epoch + 1), start_batch if epoch == start_epoch else 0)
+                if self.is_master and self.config.dev_sample > 0:
+                    with self.telemetry.stage('validate'):
+                        full_dev_loss = self.validate(dev_batches)
+                    self.full_dev_losses.append(full_dev_loss)
+                    print('full validation loss = %.4f' % full_dev_loss)
+                    self.save_plot(self.full_dev_losses, 'full_dev', epoch + 1)
+                if self.is_master:
+                    self.save_plot(self.train_losses, 'training', epoch + 1)
+                    self.save_plot(self.dev_losses, 'dev', epoch + 1)
             else:
                 break
+        if self.validation_process:
+            result = self.validation_process.collect()
+            if result:
+                self.record_validation(result[0], state=result[1])
+            self.validation_process.close()
+        # the last checkpoints and plots are written before the process exits
+        self.checkpoint_writer.wait()
+        if self.plot_writer:
+            self.plot_writer.wait()
+        # written here if training stopped before the last profiled step
+        self.profiler.finish()
+
+    def save_plot(self, points, filetag, epoch):
+        """Saves a loss plot in the background or right away, as set by --plot_mode."""
+        if self.config.plot_mode == 'async':
+            self.plot_writer.save(points, self.config.save_path, filetag, epoch)
+        elif self.config.plot_mode == 'sync':
+            helper.save_plot(points, self.config.save_path, filetag, epoch)
 
-    def train(self, train_batches, dev_batches, epoch_no):
+    def train(self, train_batches, dev_batches, epoch_no, start_batch=0):
         # Turn on training mode which enables dropout.
         self.model.train()
 
@@ -48,31 +172,19 @@ class Train:
         print_loss_total = 0
         plot_loss_total = 0
 
-        num_batches = len(train_batches)
+        # with gradient accumulation, a batch is a group of accumulate_steps micro-batches and one optimizer step
+        accumulate_steps = self.config.accumulate_steps
+        num_batches = (len(train_batches) + accumulate_steps - 1) // accumulate_steps
         print('epoch %d started' % epoch_no)
 
-        for batch_no in range(1, num_batches + 1):
-            # Clearing out all previous gradient computations.
-            self.optimizer.zero_grad()
-            train_sentences1, train_sentences2, length = helper.queries_to_tensors(train_batches[batch_no - 1],
-                                                                                   self.dictionary)
-            if self.config.cuda:
-                train_sentences1 = train_sentences1.cuda()
-                train_sentences2 = train_sentences2.cuda()
-                length = length.cuda()
-
-            loss = self.model(train_sentences1, train_sentences2, length)
-            # Important if we are using nn.DataParallel()
-            if loss.size(0) > 1:
-                loss = torch.mean(loss)
-            loss.backward()
-
-            # `clip_grad_norm` helps prevent the exploding gradient problem in RNNs.
-            # clip_grad_norm(self.model.parameters(), self.config.clip)
-            self.optimizer.step()
+        for batch_no in range(start_batch + 1, num_batches + 1):
+            self.steps_done += 1
+            self.profiler.begin(self.steps_done)
+            batch_loss = self.train_step(train_batches[(batch_no - 1) * accumulate_steps:batch_no * accumulate_steps])
+            self.profiler.end(self.steps_done)
 
-            print_loss_total += loss.data[0]
-            plot_loss_total += loss.data[0]
+            print_loss_total += batch_loss
+            plot_loss_total += batch_loss
 
             if batch_no % self.config.print_every == 0:
                 print_loss_avg = print_loss_total / self.config.print_every
@@ -87,44 +199,145 @@ class Train:
                 plot_loss_total = 0
 
             if batch_no % self.config.dev_every == 0:
-                dev_loss = self.validate(dev_batches)
-                self.dev_losses.append(dev_loss)
-                print('validation loss = %.4f' % dev_loss)
-                if self.best_dev_loss == -1 or self.best_dev_loss > dev_loss:
-                    self.best_dev_loss = dev_loss
-                    helper.save_checkpoint({
-                        'epoch': epoch_no,
-                        'state_dict': self.model.state_dict(),
-                        'best_loss': self.best_dev_loss,
-                        'optimizer': self.optimizer.state_dict(),
-                    }, self.config.save_path + 'model_best.pth.tar')
-                else:
-                    self.times_no_improvement += 1
-                    # no improvement in validation loss for last n times, so stop training
-                    if self.times_no_improvement == 10:
-                        self.stop = True
-                        break
+                if self.is_master and self.validation_process:
+                    # the loss of the previous snapshot is collected before the next one is sent
+                    result = self.validation_process.collect()
+                    if result:
+                        self.record_validation(result[0], state=result[1])
+                    if not self.stop:
+                        with self.telemetry.stage('validate'):
+                            self.validation_process.submit(self.training_state(epoch_no, batch_no))
+                elif self.is_master:
+                    with self.telemetry.stage('validate'):
+                        dev_loss = self.validate(dev_batches)
+                    self.record_validation(dev_loss, epoch_no, batch_no)
+                if self.config.distributed:
+                    # every rank stops at the same batch, as decided by rank 0
+                    self.stop = helper.broadcast_flag(self.stop)
+                if self.stop:
+                    break
 
-    def validate(self, dev_batches):
-        # Turn on evaluation mode which disables dropout.
-        self.model.eval()
-
-        dev_loss = 0
-        num_batches = len(dev_batches)
-        for batch_no in range(1, num_batches + 1):
-            dev_sentences1, dev_sentences2, length = helper.queries_to_tensors(dev_batches[batch_no - 1],
-                                                                               self.dictionary)
+            if self.is_master and batch_no % self.config.save_every == 0:
+                # only the last keep_checkpoints periodic checkpoints are kept
+                with self.telemetry.stage('checkpoint'):
+                    self.checkpoint_writer.save(self.training_state(epoch_no, batch_no),
+                                                self.config.save_path + 'checkpoint_%03d_%07d.pth.tar' % (
+                                                    epoch_no, batch_no),
+                                                glob.escape(self.config.save_path) + 'checkpoint_*.pth.tar')
+
+            self.telemetry.step(epoch_no, batch_no, batch_loss)
+
+    def train_step(self, batches):
+        """Runs one optimizer step on a group of accumulate_steps batches and returns its loss."""
+        # Clearing out all previous gradient computations.
+        self.optimizer.zero_grad()
+        # a single batch is a group of one, so that the loss is the mean over the target tokens on every path
+        batch_loss = self.accumulate_gradients(batches)
+
+        # `clip_grad_norm` helps prevent the exploding gradient problem in RNNs.
+        # clip_grad_norm(self.model.parameters(), self.config.clip)
+        with self.telemetry.stage('step'), step_profiler.record('optimizer'):
+            self.optimizer.step()
+        return batch_loss
+
+    def record_validation(self, dev_loss, epoch_no=None, batch_no=None, state=None):
+        """Updates the early stopping state with a validation loss and saves the best checkpoint. The checkpoint is
+        the state of the validated snapshot if given, the current training state otherwise."""
+        self.dev_losses.append(dev_loss)
+        print('validation loss = %.4f' % dev_loss)
+        if self.best_dev_loss == -1 or self.best_dev_loss > dev_loss:
+            self.best_dev_loss = dev_loss
+            if state is None:
+                state = self.training_state(epoch_no, batch_no)
+            else:
+                state.update(best_loss=self.best_dev_loss, times_no_improvement=self.times_no_improvement,
+                             dev_losses=self.dev_losses)
+            with self.telemetry.stage('checkpoint'):
+                self.checkpoint_writer.save(state, self.config.save_path + 'model_best.pth.tar')
+        else:
+            self.times_no_improvement += 1
+            # no improvement in validation loss for last n times, so stop training
+            if self.times_no_improvement == 10:
+                self.stop = True
+
+    @staticmethod
+    def batch_stratum(batch):
+        # the cost of a batch grows with the length of its longest target query
+        return max(len(instance.sentence2) for instance in batch)
+
+    def training_state(self, epoch_no, batch_no):
+        """Returns the state needed to resume training right after batch batch_no of epoch epoch_no."""
+        return {
+            'epoch': epoch_no - 1,
+            'batch': batch_no,
+            'accumulate_steps': self.config.accumulate_steps,
+            'state_dict': self.local_model.state_dict(),
+            'best_loss': self.best_dev_loss,
+            'optimizer': self.optimizer.state_dict(),
+            'times_no_improvement': self.times_no_improvement,
+            'train_losses': self.train_losses,
+            'dev_losses': self.dev_losses,
+            'full_dev_losses': self.full_dev_losses,
+            'rng_states': helper.get_rng_states(),
+        }
+
+    def load_state(self, checkpoint):
+        """Restores the training state of a checkpoint and returns the epoch and the batch training resumes after."""
+        self.best_dev_loss = checkpoint['best_loss']
+        if 'batch' not in checkpoint:
+            # earlier checkpoints only record the epoch, training resumes at the start of the next one
+            return checkpoint['epoch'], 0
+        self.times_no_improvement = checkpoint['times_no_improvement']
+        self.train_losses = checkpoint['train_losses']
+        self.dev_losses = checkpoint['dev_losses']
+        self.full_dev_losses = checkpoint.get('full_dev_losses', [])
+        helper.set_rng_states(checkpoint['rng_states'])
+        # the batch cursor counts optimizer steps, which depend on the number of accumulated batches
+        return checkpoint['epoch'], checkpoint['batch'] * checkpoint['accumulate_steps'] // self.config.accumulate_steps
+
+    def batch_to_tensors(self, batch):
+        """Returns the source queries, the target queries and the target lengths of a batch on the training device."""
+        with self.telemetry.stage('collate'):
+            train_sentences1, train_sentences2, length = helper.queries_to_tensors(batch, self.dictionary)
+        if self.telemetry.enabled:
+            self.telemetry.count(len(batch), length.data.sum().item())
+        with self.telemetry.stage('to_device'):
             if self.config.cuda:
-                dev_sentences1 = dev_sentences1.cuda()
-                dev_sentences2 = dev_sentences2.cuda()
+                train_sentences1 = train_sentences1.cuda()
+                train_sentences2 = train_sentences2.cuda()
                 length = length.cuda()
+        return train_sentences1, train_sentences2, length
 
-            loss = self.model(dev_sentences1, dev_sentences2, length)
-            if loss.size(0) > 1:
-                loss = torch.mean(loss)
-            dev_loss += loss.data[0]
+    def forward_batch(self, batch, token_sum=False):
+        """Returns the training loss of a batch, see Sequence2Sequence.forward."""
+        train_sentences1, train_sentences2, length = self.batch_to_tensors(batch)
+        with self.telemetry.stage('forward'):
+            return self.model(train_sentences1, train_sentences2, length, token_sum)
 
-        # Turn on training mode at the end of validation.
-        self.model.train()
+    def accumulate_gradients(self, batches):
+        """Accumulates the gradients of the summed token losses of micro-batches, normalizes them by the number of
+        target tokens of all the micro-batches and returns the loss per target token."""
+        loss_total, num_tokens = 0, 0
+        for i, batch in enumerate(batches):
+            # processes only synchronize their gradients after the last micro-batch
+            sync = not self.config.distributed or i == len(batches) - 1
+            with contextlib.nullcontext() if sync else self.model.no_sync():
+                loss, tokens = self.forward_batch(batch, True)
+                # sums the per replica values if we are using nn.DataParallel()
+                loss, tokens = loss.sum(), tokens.sum()
+                with self.telemetry.stage('backward'), step_profiler.record('backward'):
+                    loss.backward()
+            loss_total += loss.item()
+            num_tokens += tokens.item()
 
-        return dev_loss / num_batches
+        normalizer = num_tokens
+        if self.config.distributed:
+            # DistributedDataParallel averages the gradients, so they are divided by the mean token count per process
+            normalizer = helper.all_reduce_sum(num_tokens) / self.config.world_size
+        for param in self.model.parameters():
+            if param.grad is not None:
+                param.grad.data.div_(max(normalizer, 1))
+        return loss_total / max(num_tokens, 1)
+
+    def validate(self, dev_batches):
+        return compute_dev_loss(self.local_model, dev_batches, self.dictionary, self.config)
@@ -6,8 +6,12 @@
 # File Description: This script contains all the command line arguments.
 ###############################################################################
 
+import os, sys, json
 from argparse import ArgumentParser
 
+# the scripts import util first, which makes the modules shared by both models importable as the common package
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
 
 def get_args():
     parser = ArgumentParser(description='seq2seq_language_model')
@@ -61,6 +65,133 @@ def get_args():
                         help='GloVe word embedding version')
     parser.add_argument('--word_vectors_directory', type=str, default='../data/glove/',
                         help='Path of GloVe word embeddings')
+    parser.add_argument('--checkpoint', type=str, default='',
+                        help='checkpoint or inference weights file used for inference (default: model_best.pth.tar '
+                             'under save_path)')
+    parser.add_argument('--test_file', type=str, default='session_test.txt',
+                        help='session file used for evaluation')
+    parser.add_argument('--num_workers', type=int, default=1,
+                        help='number of worker processes, each one loads the model once')
+    parser.add_argument('--num_threads', type=int, default=1,
+                        help='number of intra-op threads of each worker process')
+    parser.add_argument('--num_interop_threads', type=int, default=0,
+                        help='number of inter-op threads of the training process (0 = PyTorch default)')
+    parser.add_argument('--num_shards', type=int, default=64,
+                        help='number of shards the session file is split into')
+    parser.add_argument('--candidates', type=str, default='mined', choices=['mined', 'sampled'],
+                        help='negative candidates used to rank the next query during evaluation')
+    parser.add_argument('--num_candidates', type=int, default=19,
+                        help='number of negative candidates ranked along with the next query')
+    parser.add_argument('--candidate_pool', type=int, default=50000,
+                        help='number of most frequent training queries negative candidates are sampled from')
+    parser.add_argument('--recall_at', type=int, nargs='+', default=[1, 5, 10],
+                        help='cutoffs of the recall of the next query')
+    parser.add_argument('--index_dir', type=str, default='../output/query_index/',
+                        help='directory of the query embedding index')
+    parser.add_argument('--index_dtype', type=str, default='float32', choices=['float32', 'float16'],
+                        help='data type of the stored query embeddings')
+    parser.add_argument('--encode_batch_size', type=int, default=2048,
+                        help='number of queries encoded at once while building the query index')
+    parser.add_argument('--num_clusters', type=int, default=0,
+                        help='number of clusters of the coarse query index (0 = exact search only)')
+    parser.add_argument('--kmeans_iterations', type=int, default=10,
+                        help='number of k-means iterations used to build the coarse query index')
+    parser.add_argument('--num_probes', type=int, default=8,
+                        help='number of clusters searched by the coarse query index')
+    parser.add_argument('--distributed', action='store_true',
+                        help='train with one process per worker, launched by torchrun')
+    parser.add_argument('--dist_backend', type=str, default='gloo',
+                        help='backend of distributed training (gloo for CPU, nccl for GPU)')
+    parser.add_argument('--accumulate_steps', type=int, default=1,
+                        help='number of batches whose gradients are accumulated before an optimizer step')
+    parser.add_argument('--keep_checkpoints', type=int, default=3,
+                        help='number of periodic checkpoints kept, saved every save_every batches (0 = keep all)')
+    parser.add_argument('--telemetry_file', type=str, default='',
+                        help='JSON lines file of the training stage timings and throughput (default: disabled)')
+    parser.add_argument('--telemetry_interval', type=int, default=100,
+                        help='number of batches summarized by a telemetry record')
+    parser.add_argument('--dev_sample', type=int, default=0,
+                        help='number of dev batches of the stratified sample used by the validation checks (0 = all)')
+    parser.add_argument('--async_validation', action='store_true',
+                        help='validate weight snapshots in a separate process while training continues (CPU only)')
+    parser.add_argument('--plot_mode', type=str, default='async', choices=['async', 'sync', 'none'],
+                        help='save the loss plots on a background thread, in the training loop or not at all')
+    parser.add_argument('--sweep', type=str, nargs='+', default=[],
+                        help='swept arguments and their values, e.g. nhid=256,512 dropout=0.1,0.3')
+    parser.add_argument('--sweep_min_runs', type=int, default=3,
+                        help='number of other runs a sweep run is compared with before it can be stopped early')
+    parser.add_argument('--sweep_warmup_checks', type=int, default=2,
+                        help='number of validation checks before a sweep run can be stopped early')
+    parser.add_argument('--encoding_cache_size', type=int, default=10000,
+                        help='number of source query encodings cached during evaluation, each one holds the encoder '
+                             'outputs of every position (0 = no cache)')
+    parser.add_argument('--output_layer', type=str, default='full', choices=['full', 'tied', 'factorized'],
+                        help='vocabulary projection: a full matrix, tied to the input embeddings through a projection '
+                             'to emsize (the embeddings are frozen, so only the projection and the biases train), or '
+                             'factorized through a rank output_rank bottleneck')
+    parser.add_argument('--output_rank', type=int, default=128,
+                        help='rank of the factorized output layer')
+    parser.add_argument('--normalizer', type=str, default='split', choices=['split', 'wordpunct'],
+                        help='how queries are split into terms when the dictionary is built, which inference follows: '
+                             'on whitespace, or lowercased and split into words without punctuation')
+    parser.add_argument('--normalizer_cache_size', type=int, default=100000,
+                        help='number of distinct raw queries whose terms are cached by the normalizer')
+    parser.add_argument('--profile_steps', type=str, default='',
+                        help='steps profiled, e.g. 100-120: optimizer steps in training, batches of a worker in '
+                             'evaluation (default: no profiling)')
+    parser.add_argument('--profile_dir', type=str, default='../output/profile/',
+                        help='directory the profiler traces and operator tables are written to')
+    parser.add_argument('--attention', type=str, default='general', choices=['general', 'dot', 'concat'],
+                        help='score function of the global attention')
+    parser.add_argument('--teacher_checkpoint', type=str, default='',
+                        help='checkpoint or inference weights file of the teacher distilled by distill.py (default: '
+                             'model_best.pth.tar under save_path)')
+    parser.add_argument('--student_model', type=str, default='GRU',
+                        help='type of recurrent net of the student (RNN_TANH, RNN_RELU, LSTM, GRU)')
+    parser.add_argument('--student_nhid', type=int, default=256,
+                        help='number of hidden units per layer of the student encoder/decoder')
+    parser.add_argument('--student_attention', type=str, default='dot', choices=['general', 'dot', 'concat'],
+                        help='score function of the global attention of the student')
+    parser.add_argument('--distill_alpha', type=float, default=0.5,
+                        help='weight of the distillation loss, the loss of the target tokens has weight 1 - alpha')
+    parser.add_argument('--distill_temperature', type=float, default=2.0,
+                        help='temperature the teacher and student distributions are softened with')
+    parser.add_argument('--distill_topk', type=int, default=0,
+                        help='keep only the k most likely tokens of every teacher distribution and cache them after '
+                             'the first epoch (0 = full distributions, computed at every step)')
+    parser.add_argument('--latency_samples', type=int, default=200,
+                        help='number of dev query pairs scored one at a time to measure the latency in the '
+                             'distillation report')
+    parser.add_argument('--warm_start', default='', type=str, metavar='PATH',
+                        help='start a new training run from a checkpoint and the dictionary.p next to it, growing '
+                             'the vocabulary with the new words of the corpus (default: none)')
+    parser.add_argument('--stream', type=str, default='',
+                        help='session log file, or directory of rotating session log shards, tailed by '
+                             'online_train.py (default: none)')
+    parser.add_argument('--online_dir', type=str, default='',
+                        help='directory of the online checkpoint and the published weights (default: online under '
+                             'save_path)')
+    parser.add_argument('--replay_size', type=int, default=100000,
+                        help='number of past training examples kept in the replay buffer of online training')
+    parser.add_argument('--replay_ratio', type=float, default=0.5,
+                        help='share of every online batch drawn from the replay buffer')
+    parser.add_argument('--replay_file', type=str, default='',
+                        help='session file the replay buffer is seeded with, e.g. session_train.txt (default: none)')
+    parser.add_argument('--online_max_steps', type=int, default=10,
+                        help='number of optimizer steps taken at most after every poll of the session logs')
+    parser.add_argument('--online_max_pending', type=int, default=50000,
+                        help='number of new examples waiting to be trained on, older ones go to the replay buffer')
+    parser.add_argument('--poll_interval', type=float, default=5,
+                        help='seconds waited before polling the session logs again when nothing new was read')
+    parser.add_argument('--publish_every', type=float, default=600,
+                        help='seconds between two publications of the online weights and checkpoint')
+    parser.add_argument('--tuned_config', type=str, default='',
+                        help='config file written by benchmarks/autotune.py, whose batch size and thread counts '
+                             'replace the defaults; arguments given on the command line still take precedence')
 
     args = parser.parse_args()
+    if args.tuned_config:
+        with open(args.tuned_config, 'r') as f:
+            parser.set_defaults(**json.load(f)['settings'])
+        args = parser.parse_args()
     return args